@@ -25,7 +25,7 @@ def upgrade() -> None:
         sa.Column(
             "created_at",
             sa.DateTime(timezone=True),
-            server_default=sa.text("now()"),
+            server_default=sa.func.now(),
             nullable=True,
         ),
         sa.PrimaryKeyConstraint("id"),
@@ -47,7 +47,7 @@ def upgrade() -> None:
         sa.Column(
             "created_at",
             sa.DateTime(timezone=True),
-            server_default=sa.text("now()"),
+            server_default=sa.func.now(),
             nullable=True,
         ),
         sa.ForeignKeyConstraint(["uploaded_by_user_id"], ["users.id"]),
@@ -64,7 +64,7 @@ def upgrade() -> None:
         sa.Column(
             "created_at",
             sa.DateTime(timezone=True),
-            server_default=sa.text("now()"),
+            server_default=sa.func.now(),
             nullable=True,
         ),
         sa.ForeignKeyConstraint(["loser_photo_id"], ["photos.id"]),
@@ -0,0 +1,30 @@
+"""Leaderboard keyset index and photos uploader index
+
+Revision ID: 0002_leaderboard_keyset_index
+Revises: 0001_initial
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_leaderboard_keyset_index"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_photos_elo_rating_id",
+        "photos",
+        [sa.text("elo_rating DESC"), "id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_photos_uploaded_by_user_id"), "photos", ["uploaded_by_user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_photos_uploaded_by_user_id"), table_name="photos")
+    op.drop_index("ix_photos_elo_rating_id", table_name="photos")
@@ -0,0 +1,34 @@
+"""Perceptual hash and duplicate link on photos
+
+Revision ID: 0003_photo_phash
+Revises: 0002_leaderboard_keyset_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_photo_phash"
+down_revision = "0002_leaderboard_keyset_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Batch mode so SQLite, which cannot ALTER in a foreign key, rebuilds the table
+    with op.batch_alter_table("photos") as batch_op:
+        batch_op.add_column(sa.Column("phash", sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column("duplicate_of_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            "fk_photos_duplicate_of_id",
+            "photos",
+            ["duplicate_of_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("photos") as batch_op:
+        batch_op.drop_constraint("fk_photos_duplicate_of_id", type_="foreignkey")
+        batch_op.drop_column("duplicate_of_id")
+        batch_op.drop_column("phash")
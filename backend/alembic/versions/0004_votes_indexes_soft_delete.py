@@ -0,0 +1,45 @@
+"""Indexes on votes foreign keys and created_at, soft delete for photos
+
+Revision ID: 0004_votes_indexes_soft_delete
+Revises: 0003_photo_phash
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_votes_indexes_soft_delete"
+down_revision = "0003_photo_phash"
+branch_labels = None
+depends_on = None
+
+VOTE_INDEXES = ["winner_photo_id", "loser_photo_id", "voter_user_id", "created_at"]
+
+
+def upgrade() -> None:
+    op.add_column("photos", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index(
+        "ix_photos_deleted_at",
+        "photos",
+        ["deleted_at"],
+        unique=False,
+        postgresql_where=sa.text("deleted_at IS NOT NULL"),
+    )
+
+    # votes is the largest table; build its indexes without blocking writes
+    with op.get_context().autocommit_block():
+        for column in VOTE_INDEXES:
+            op.create_index(
+                op.f(f"ix_votes_{column}"),
+                "votes",
+                [column],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    for column in reversed(VOTE_INDEXES):
+        op.drop_index(op.f(f"ix_votes_{column}"), table_name="votes")
+    op.drop_index("ix_photos_deleted_at", table_name="photos")
+    op.drop_column("photos", "deleted_at")
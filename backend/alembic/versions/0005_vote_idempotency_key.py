@@ -0,0 +1,32 @@
+"""Per-voter idempotency keys on votes
+
+Revision ID: 0005_vote_idempotency_key
+Revises: 0004_votes_indexes_soft_delete
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_vote_idempotency_key"
+down_revision = "0004_votes_indexes_soft_delete"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("votes", sa.Column("idempotency_key", sa.String(64), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_votes_voter_idempotency_key",
+            "votes",
+            ["voter_user_id", "idempotency_key"],
+            unique=True,
+            postgresql_where=sa.text("idempotency_key IS NOT NULL"),
+            sqlite_where=sa.text("idempotency_key IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_votes_voter_idempotency_key", table_name="votes")
+    op.drop_column("votes", "idempotency_key")
@@ -0,0 +1,42 @@
+"""Glicko-2 rating state on photos and the rating_periods log
+
+Revision ID: 0006_glicko2_ratings
+Revises: 0005_vote_idempotency_key
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_glicko2_ratings"
+down_revision = "0005_vote_idempotency_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable without defaults, so adding them does not rewrite the table
+    op.add_column("photos", sa.Column("rating_deviation", sa.Float(), nullable=True))
+    op.add_column("photos", sa.Column("volatility", sa.Float(), nullable=True))
+    op.add_column("photos", sa.Column("rating_period", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "rating_periods",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("last_vote_id", sa.Integer(), nullable=False),
+        sa.Column("votes", sa.Integer(), nullable=False),
+        sa.Column("photos", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rating_periods")
+    op.drop_column("photos", "rating_period")
+    op.drop_column("photos", "volatility")
+    op.drop_column("photos", "rating_deviation")
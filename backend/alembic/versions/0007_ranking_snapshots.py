@@ -0,0 +1,55 @@
+"""Bradley-Terry ranking snapshots
+
+Revision ID: 0007_ranking_snapshots
+Revises: 0006_glicko2_ratings
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_ranking_snapshots"
+down_revision = "0006_glicko2_ratings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ranking_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=True,
+        ),
+        sa.Column("votes", sa.Integer(), nullable=False),
+        sa.Column("photos", sa.Integer(), nullable=False),
+        sa.Column("iterations", sa.Integer(), nullable=False),
+        sa.Column("converged", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_ranking_snapshots_id"), "ranking_snapshots", ["id"], unique=False)
+
+    op.create_table(
+        "ranking_scores",
+        sa.Column("snapshot_id", sa.Integer(), nullable=False),
+        sa.Column("photo_id", sa.Integer(), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("ci_low", sa.Float(), nullable=False),
+        sa.Column("ci_high", sa.Float(), nullable=False),
+        sa.Column("wins", sa.Integer(), nullable=False),
+        sa.Column("losses", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["snapshot_id"], ["ranking_snapshots.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["photo_id"], ["photos.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("snapshot_id", "photo_id"),
+    )
+    op.create_index("ix_ranking_scores_snapshot_rank", "ranking_scores", ["snapshot_id", "rank"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ranking_scores_snapshot_rank", table_name="ranking_scores")
+    op.drop_table("ranking_scores")
+    op.drop_index(op.f("ix_ranking_snapshots_id"), table_name="ranking_snapshots")
+    op.drop_table("ranking_snapshots")
@@ -0,0 +1,152 @@
+"""Partition votes by month on Postgres, add photo_daily_stats
+
+Revision ID: 0008_partition_votes
+Revises: 0007_ranking_snapshots
+Create Date: 2026-10-18 00:00:00.000000
+
+votes is copied into a new table range-partitioned by created_at, with one
+partition per month from the oldest vote to MONTHS_AHEAD months from now.
+The copy holds an exclusive lock on votes, so run this in a maintenance
+window. Other dialects keep votes as a plain table.
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_partition_votes"
+down_revision = "0007_ranking_snapshots"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+VOTE_INDEXES = ["id", "winner_photo_id", "loser_photo_id", "voter_user_id", "created_at"]
+VOTE_COLUMNS = "id, voter_user_id, winner_photo_id, loser_photo_id, created_at, idempotency_key"
+VOTE_REFERENCES = """
+    CONSTRAINT votes_voter_user_id_fkey FOREIGN KEY (voter_user_id) REFERENCES users (id) ON DELETE CASCADE,
+    CONSTRAINT votes_winner_photo_id_fkey FOREIGN KEY (winner_photo_id) REFERENCES photos (id) ON DELETE CASCADE,
+    CONSTRAINT votes_loser_photo_id_fkey FOREIGN KEY (loser_photo_id) REFERENCES photos (id) ON DELETE CASCADE
+"""
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_vote_indexes() -> None:
+    for column in VOTE_INDEXES:
+        op.create_index(op.f(f"ix_votes_{column}"), "votes", [column], unique=False)
+
+
+def _drop_vote_indexes() -> None:
+    for column in VOTE_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS ix_votes_{column}")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "photo_daily_stats",
+        sa.Column("photo_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("wins", sa.Integer(), nullable=False),
+        sa.Column("losses", sa.Integer(), nullable=False),
+        sa.Column("closing_rating", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(["photo_id"], ["photos.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("photo_id", "day"),
+    )
+    op.create_index("ix_photo_daily_stats_day", "photo_daily_stats", ["day"])
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("LOCK TABLE votes IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE votes RENAME TO votes_unpartitioned")
+    op.execute("ALTER TABLE votes_unpartitioned RENAME CONSTRAINT votes_pkey TO votes_unpartitioned_pkey")
+    _drop_vote_indexes()
+    op.execute("DROP INDEX IF EXISTS uq_votes_voter_idempotency_key")
+    for fk in ("voter_user_id", "winner_photo_id", "loser_photo_id"):
+        op.execute(f"ALTER TABLE votes_unpartitioned DROP CONSTRAINT votes_{fk}_fkey")
+
+    op.execute(f"""
+        CREATE TABLE votes (
+            id integer NOT NULL DEFAULT nextval('votes_id_seq'::regclass),
+            voter_user_id integer NOT NULL,
+            winner_photo_id integer NOT NULL,
+            loser_photo_id integer NOT NULL,
+            created_at timestamp with time zone NOT NULL DEFAULT now(),
+            idempotency_key varchar(64),
+            CONSTRAINT votes_pkey PRIMARY KEY (id, created_at),
+            {VOTE_REFERENCES}
+        ) PARTITION BY RANGE (created_at)
+    """)
+    partitions = ["votes_default"]
+    op.execute("CREATE TABLE votes_default PARTITION OF votes DEFAULT")
+
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM votes_unpartitioned")).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        name = f"votes_y{month.year}m{month.month:02d}"
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE {name} PARTITION OF votes "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+        partitions.append(name)
+        month = end
+
+    op.execute(
+        f"INSERT INTO votes ({VOTE_COLUMNS}) "
+        f"SELECT id, voter_user_id, winner_photo_id, loser_photo_id, COALESCE(created_at, now()), idempotency_key "
+        f"FROM votes_unpartitioned"
+    )
+    # The sequence belongs to the old table; move it before that is dropped
+    op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes.id")
+    op.execute("DROP TABLE votes_unpartitioned")
+
+    _create_vote_indexes()
+    for name in partitions:
+        op.execute(
+            f"CREATE UNIQUE INDEX {name}_voter_idempotency_key "
+            f"ON {name} (voter_user_id, idempotency_key) WHERE idempotency_key IS NOT NULL"
+        )
+    op.execute("ANALYZE votes")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("LOCK TABLE votes IN ACCESS EXCLUSIVE MODE")
+        op.execute("ALTER TABLE votes RENAME TO votes_partitioned")
+        op.execute("ALTER TABLE votes_partitioned RENAME CONSTRAINT votes_pkey TO votes_partitioned_pkey")
+        _drop_vote_indexes()
+        for fk in ("voter_user_id", "winner_photo_id", "loser_photo_id"):
+            op.execute(f"ALTER TABLE votes_partitioned DROP CONSTRAINT votes_{fk}_fkey")
+        op.execute(f"""
+            CREATE TABLE votes (
+                id integer NOT NULL DEFAULT nextval('votes_id_seq'::regclass),
+                voter_user_id integer NOT NULL,
+                winner_photo_id integer NOT NULL,
+                loser_photo_id integer NOT NULL,
+                created_at timestamp with time zone DEFAULT now(),
+                idempotency_key varchar(64),
+                CONSTRAINT votes_pkey PRIMARY KEY (id),
+                {VOTE_REFERENCES}
+            )
+        """)
+        op.execute(f"INSERT INTO votes ({VOTE_COLUMNS}) SELECT {VOTE_COLUMNS} FROM votes_partitioned")
+        op.execute("ALTER SEQUENCE votes_id_seq OWNED BY votes.id")
+        op.execute("DROP TABLE votes_partitioned")
+        _create_vote_indexes()
+        op.create_index(
+            "uq_votes_voter_idempotency_key",
+            "votes",
+            ["voter_user_id", "idempotency_key"],
+            unique=True,
+            postgresql_where=sa.text("idempotency_key IS NOT NULL"),
+        )
+
+    op.drop_index("ix_photo_daily_stats_day", table_name="photo_daily_stats")
+    op.drop_table("photo_daily_stats")
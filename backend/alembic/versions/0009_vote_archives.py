@@ -0,0 +1,38 @@
+"""Record archived vote months
+
+Revision ID: 0009_vote_archives
+Revises: 0008_partition_votes
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_vote_archives"
+down_revision = "0008_partition_votes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vote_archives",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("votes", sa.Integer(), nullable=False),
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_vote_archives_id"), "vote_archives", ["id"], unique=False)
+    op.create_index(op.f("ix_vote_archives_month"), "vote_archives", ["month"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_vote_archives_month"), table_name="vote_archives")
+    op.drop_index(op.f("ix_vote_archives_id"), table_name="vote_archives")
+    op.drop_table("vote_archives")
@@ -0,0 +1,84 @@
+"""Per-voter idempotency keys in their own table
+
+Revision ID: 0010_vote_idempotency_keys
+Revises: 0009_vote_archives
+Create Date: 2026-10-18 00:00:00.000000
+
+Partitioned votes can only enforce key uniqueness within a month, and
+archiving drops old keys with their votes. The keys move to a plain table
+that enforces them across all months and outlives the archive. The copy on
+votes.idempotency_key stays; the unique indexes on votes go, per partition
+on a partitioned table and uq_votes_voter_idempotency_key otherwise. The
+photo columns are indexed for the photo purge.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_vote_idempotency_keys"
+down_revision = "0009_vote_archives"
+branch_labels = None
+depends_on = None
+
+
+def _partitions(bind) -> list[str]:
+    return bind.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'votes'::regclass"
+    )).scalars().all()
+
+
+def _partitioned(bind) -> bool:
+    if bind.dialect.name != "postgresql":
+        return False
+    kind = bind.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('votes')")).scalar()
+    return kind == "p"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vote_idempotency_keys",
+        sa.Column("voter_user_id", sa.Integer(), nullable=False),
+        sa.Column("idempotency_key", sa.String(64), nullable=False),
+        sa.Column("vote_id", sa.Integer(), nullable=False),
+        sa.Column("winner_photo_id", sa.Integer(), nullable=False),
+        sa.Column("loser_photo_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["voter_user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("voter_user_id", "idempotency_key"),
+    )
+    op.create_index("ix_vote_idempotency_keys_winner_photo_id", "vote_idempotency_keys", ["winner_photo_id"])
+    op.create_index("ix_vote_idempotency_keys_loser_photo_id", "vote_idempotency_keys", ["loser_photo_id"])
+    op.execute(
+        "INSERT INTO vote_idempotency_keys "
+        "(voter_user_id, idempotency_key, vote_id, winner_photo_id, loser_photo_id, created_at) "
+        "SELECT voter_user_id, idempotency_key, id, winner_photo_id, loser_photo_id, "
+        "COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "FROM votes WHERE idempotency_key IS NOT NULL"
+    )
+
+    bind = op.get_bind()
+    if _partitioned(bind):
+        for name in _partitions(bind):
+            op.execute(f"DROP INDEX IF EXISTS {name}_voter_idempotency_key")
+    else:
+        op.execute("DROP INDEX IF EXISTS uq_votes_voter_idempotency_key")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if _partitioned(bind):
+        for name in _partitions(bind):
+            op.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_voter_idempotency_key "
+                f"ON {name} (voter_user_id, idempotency_key) WHERE idempotency_key IS NOT NULL"
+            )
+    else:
+        op.create_index(
+            "uq_votes_voter_idempotency_key",
+            "votes",
+            ["voter_user_id", "idempotency_key"],
+            unique=True,
+            postgresql_where=sa.text("idempotency_key IS NOT NULL"),
+            sqlite_where=sa.text("idempotency_key IS NOT NULL"),
+        )
+    op.drop_table("vote_idempotency_keys")
@@ -1,10 +1,94 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Callable, Union
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import URL, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 from app.config import settings
+from app.utils.db_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.utils.metrics import instrument_engine
+
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _pool_options(url: str, poolclass) -> dict:
+    # In-memory SQLite needs SQLAlchemy's single-connection pools, which take
+    # no sizing options and are not instrumented
+    if _is_memory_sqlite(make_url(url)):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def _with_driver(url: str, driver: str) -> str:
+    """Swap the scheme, leaving the rest of the URL exactly as given."""
+    return driver + url[url.index("://"):]
+
+
+def database_url(url: str) -> str:
+    """Accept the postgres:// scheme some hosts hand out, which SQLAlchemy does not."""
+    if make_url(url).drivername == "postgres":
+        return _with_driver(url, "postgresql")
+    return url
+
+
+def async_database_url(url: str) -> str:
+    """The async driver's URL for a sync DATABASE_URL; other URLs are returned unchanged."""
+    driver = ASYNC_DRIVERS.get(make_url(url).drivername)
+    return _with_driver(url, driver) if driver else url
+
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+_sync_url = database_url(settings.DATABASE_URL)
+engine = create_engine(
+    _sync_url,
+    pool_pre_ping=True,
+    **_pool_options(_sync_url, InstrumentedQueuePool),
+)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Opt-in async engine (ASYNC_DB=true): asyncpg on Postgres, aiosqlite on SQLite
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB:
+    _async_url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(
+        _async_url,
+        pool_pre_ping=True,
+        **_pool_options(_async_url, InstrumentedAsyncQueuePool),
+    )
+    instrument_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+AnySession = Union[Session, AsyncSession]
+
+# Threads that may block on a pool checkout, capped at the pool's capacity.
+# Uncapped, every threadpool worker can end up waiting for a connection while
+# the sessions holding connections wait for a free thread to close them.
+_pool_waiters = anyio.CapacityLimiter(settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
 
 class Base(DeclarativeBase):
     pass
@@ -15,4 +99,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@asynccontextmanager
+async def open_db_session():
+    """AsyncSession when ASYNC_DB is on, otherwise a regular Session.
+
+    Callers pass their database work to run_db, so the same code runs either
+    in the threadpool or on the async driver.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def get_db_session():
+    async with open_db_session() as db:
+        yield db
+
+
+async def run_db(db: AnySession, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call fn(session, *args, **kwargs) without blocking the event loop."""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    if db.in_transaction():
+        # Already holds a connection, so it cannot block on the pool
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await anyio.to_thread.run_sync(partial(fn, db, *args, **kwargs), limiter=_pool_waiters)
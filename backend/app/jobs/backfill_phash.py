@@ -0,0 +1,98 @@
+"""
+Compute perceptual hashes for photos uploaded before dedup existed.
+
+    python -m app.jobs.backfill_phash --workers 8
+
+Photos with a NULL phash are read in id-ordered batches. Their images are
+fetched from the storage backend and hashed on a thread pool (the work is
+mostly network bound), and the hashes are written back with one bulk
+update per batch. Images that cannot be fetched or decoded are reported
+and left NULL, so a later run retries them. Existing duplicates are only
+hashed, not linked; --link also points each near-duplicate at the closest
+(smallest Hamming distance) photo within --max-distance, as uploads do.
+Photos are visited in id order and only unlinked ones are indexed, so a
+duplicate always points at an original, never at another duplicate.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.utils.phash import PhashIndex, dhash, to_signed
+from app.utils.storage import storage
+
+
+def _hash_one(row) -> tuple[int, int | None, str | None]:
+    photo_id, public_id, url = row
+    try:
+        return photo_id, dhash(storage.read(public_id, url)), None
+    except Exception as e:
+        return photo_id, None, str(e)
+
+
+def backfill(batch_size: int = 500, workers: int = 8, link: bool = False, max_distance: int = 6) -> None:
+    db = SessionLocal()
+    index = PhashIndex(max_distance=max_distance, refresh_seconds=0)
+    if link:
+        index.load_from_db(db)
+
+    last_id = 0
+    hashed = failed = linked = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = db.execute(
+                select(Photo.id, Photo.cloudinary_public_id, Photo.image_url)
+                .where(Photo.phash.is_(None), Photo.deleted_at.is_(None), Photo.id > last_id)
+                .order_by(Photo.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for photo_id, value, error in pool.map(_hash_one, rows):
+                if value is None:
+                    failed += 1
+                    print(f"photo {photo_id}: {error}")
+                    continue
+                item = {"id": photo_id, "phash": to_signed(value)}
+                if link:
+                    match = index.nearest(value)
+                    if match is not None:
+                        item["duplicate_of_id"] = match[0]
+                        linked += 1
+                    else:
+                        index.add(photo_id, value)
+                updates.append(item)
+
+            # Rows with and without duplicate_of_id go in separate executemany calls
+            for has_link in (False, True):
+                part = [u for u in updates if ("duplicate_of_id" in u) == has_link]
+                if part:
+                    db.execute(update(Photo), part)
+            db.commit()
+            hashed += len(updates)
+            print(f"up to id {last_id}: {hashed} hashed, {failed} failed, {linked} linked")
+
+    db.close()
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill perceptual hashes for existing photos")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--link", action="store_true", help="link near-duplicates to the closest match")
+    parser.add_argument("--max-distance", type=int, default=settings.PHASH_MAX_DISTANCE)
+    args = parser.parse_args()
+    backfill(args.batch_size, args.workers, args.link, args.max_distance)
+
+
+if __name__ == "__main__":
+    main()
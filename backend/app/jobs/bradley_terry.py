@@ -0,0 +1,232 @@
+"""
+Fit a Bradley-Terry model to the whole vote history and store a ranking snapshot.
+
+    python -m app.jobs.bradley_terry --dry-run
+    python -m app.jobs.bradley_terry --keep 8
+
+Unlike the Elo ratings, the fit does not depend on vote order: every vote
+counts the same however long ago it was cast. Votes are streamed in
+chunks, as in recompute_ratings, and summed into a sparse photos x photos
+win matrix W. W[i, j] is the number of times photo i beat photo j. The
+strengths p are then fitted with Hunter's MM iteration:
+
+    p_i <- wins_i / sum_j N_ij / (p_i + p_j)        N = W + W^T
+
+Each pass is a few array operations over the nonzero pairs, and SQUAREM
+extrapolation cuts the number of passes several times over. A weak prior
+keeps the fit finite for photos that never won or never lost: every photo
+gets `prior` extra wins and `prior` extra losses against a reference photo
+whose strength is fixed at 1. The reference also pins the scale, so no
+renormalisation is needed.
+
+Scores are reported on the Elo scale, 1000 + 400 * log10(p). The 95%
+interval uses the diagonal of the Fisher information in log p. That
+ignores the covariance between photos, so treat it as approximate. Only
+photos with at least --min-votes votes are ranked. The snapshot is written
+in one transaction, and only the newest --keep snapshots are kept.
+
+Months removed by the vote archive job (app/jobs/vote_partitions.py) are no
+longer in votes, so after archiving the fit covers the retained months only.
+"""
+import argparse
+import math
+import time
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.ranking import RankingScore, RankingSnapshot
+from app.models.vote import Vote
+
+RATING_CENTER = 1000.0
+ELO_SCALE = 400 / math.log(10)
+Z_95 = 1.959964
+
+
+def load_wins(db: Session, chunk_size: int = 200_000) -> tuple[np.ndarray, sparse.csr_matrix, int]:
+    """Return live photo ids, the sparse win matrix over them and the number of votes counted."""
+    photo_ids = np.array(
+        db.execute(select(Photo.id).where(Photo.deleted_at.is_(None)).order_by(Photo.id)).scalars().all(),
+        dtype=np.int64,
+    )
+    n = len(photo_ids)
+    wins = sparse.csr_matrix((n, n), dtype=np.float64)
+    counted = 0
+    if n == 0:
+        return photo_ids, wins, counted
+
+    # Options on the statement, not the connection: the snapshot insert reuses the connection
+    result = db.connection().execute(
+        select(Vote.winner_photo_id, Vote.loser_photo_id).execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for rows in result.partitions():
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        chunk = flat.reshape(-1, 2)
+        w = np.searchsorted(photo_ids, chunk[:, 0])
+        l = np.searchsorted(photo_ids, chunk[:, 1])
+        # Drop votes on deleted photos
+        keep = (
+            (w < n) & (photo_ids[np.minimum(w, n - 1)] == chunk[:, 0])
+            & (l < n) & (photo_ids[np.minimum(l, n - 1)] == chunk[:, 1])
+        )
+        w, l = w[keep], l[keep]
+        # Duplicate (w, l) entries are summed on conversion
+        wins = wins + sparse.csr_matrix((np.ones(len(w)), (w, l)), shape=(n, n))
+        counted += len(w)
+    return photo_ids, wins, counted
+
+
+def _pair_sums(values: np.ndarray, i: np.ndarray, j: np.ndarray, starts: np.ndarray, n: int) -> np.ndarray:
+    """Per photo sum of a value given for each unordered pair (i < j, sorted by i)."""
+    total = np.bincount(j, weights=values, minlength=n)
+    if len(values):
+        total[i[starts]] += np.add.reduceat(values, starts)
+    return total
+
+
+def fit(wins: sparse.csr_matrix, prior: float = 1.0, tol: float = 1e-6, max_iter: int = 10_000) -> dict:
+    """Fit strengths by MM, accelerated with SQUAREM. Returns scores, interval bounds and convergence info."""
+    n = wins.shape[0]
+    won = np.asarray(wins.sum(axis=1)).ravel()
+    lost = np.asarray(wins.sum(axis=0)).ravel()
+    # Games per unordered pair: the upper triangle of W + W^T, rows sorted
+    games = sparse.triu(wins + wins.T, k=1).tocsr()
+    counts = games.data
+    j = games.indices
+    i = np.repeat(np.arange(n, dtype=j.dtype), np.diff(games.indptr))
+    starts = np.flatnonzero(np.r_[True, i[1:] != i[:-1]]) if len(i) else i
+
+    def mm_step(theta: np.ndarray) -> np.ndarray:
+        p = np.exp(theta)
+        denom = _pair_sums(counts / (p[i] + p[j]), i, j, starts, n) + 2 * prior / (p + 1)
+        return np.log((won + prior) / denom)
+
+    # SQUAREM (Varadhan and Roland, scheme S3) on log strengths: two MM steps
+    # give an extrapolated point, then one more MM step stabilises it. The fit
+    # is unique, and a step that would overflow falls back to plain MM.
+    theta = np.zeros(n)
+    converged = False
+    iterations = 0
+    while iterations < max_iter and n:
+        theta1 = mm_step(theta)
+        r = theta1 - theta
+        iterations += 1
+        if np.max(np.abs(r)) < tol:
+            theta = theta1
+            converged = True
+            break
+        theta2 = mm_step(theta1)
+        v = theta2 - 2 * theta1 + theta
+        alpha = min(-1.0, -math.sqrt(r @ r / (v @ v))) if v @ v > 0 else -1.0
+        extrapolated = theta - 2 * alpha * r + alpha ** 2 * v
+        theta = mm_step(extrapolated) if np.all(np.isfinite(extrapolated)) else theta2
+        if not np.all(np.isfinite(theta)):
+            theta = theta2
+        iterations += 2
+
+    p = np.exp(theta)
+    pair = counts * p[i] * p[j] / (p[i] + p[j]) ** 2
+    information = _pair_sums(pair, i, j, starts, n) + 2 * prior * p / (p + 1) ** 2
+    half_width = Z_95 * ELO_SCALE / np.sqrt(information)
+    score = RATING_CENTER + ELO_SCALE * theta
+    return {
+        "score": score,
+        "ci_low": score - half_width,
+        "ci_high": score + half_width,
+        "wins": won.astype(np.int64),
+        "losses": lost.astype(np.int64),
+        "iterations": iterations,
+        "converged": converged,
+    }
+
+
+def ranked_order(result: dict, min_votes: int) -> np.ndarray:
+    """Slots of ranked photos, best first; ties broken by photo id (slot order)."""
+    eligible = np.flatnonzero(result["wins"] + result["losses"] >= max(1, min_votes))
+    return eligible[np.lexsort((eligible, -result["score"][eligible]))]
+
+
+def print_top(photo_ids: np.ndarray, result: dict, order: np.ndarray, top: int = 20) -> None:
+    print(f"{'rank':>6} {'photo_id':>10} {'score':>9} {'95% interval':>21} {'wins':>7} {'losses':>7}")
+    for rank, i in enumerate(order[:top], start=1):
+        print(
+            f"{rank:>6} {photo_ids[i]:>10} {result['score'][i]:>9.1f} "
+            f"[{result['ci_low'][i]:>8.1f}, {result['ci_high'][i]:>8.1f}] "
+            f"{result['wins'][i]:>7} {result['losses'][i]:>7}"
+        )
+
+
+def write_snapshot(
+    db: Session, photo_ids: np.ndarray, result: dict, order: np.ndarray, votes: int,
+    keep: int = 4, batch_size: int = 5000,
+) -> int:
+    snapshot = RankingSnapshot(
+        votes=votes, photos=len(order), iterations=result["iterations"], converged=result["converged"],
+    )
+    db.add(snapshot)
+    db.flush()
+    for start in range(0, len(order), batch_size):
+        db.execute(
+            insert(RankingScore),
+            [
+                {
+                    "snapshot_id": snapshot.id,
+                    "photo_id": int(photo_ids[i]),
+                    "rank": rank,
+                    "score": round(float(result["score"][i]), 2),
+                    "ci_low": round(float(result["ci_low"][i]), 2),
+                    "ci_high": round(float(result["ci_high"][i]), 2),
+                    "wins": int(result["wins"][i]),
+                    "losses": int(result["losses"][i]),
+                }
+                for rank, i in enumerate(order[start:start + batch_size], start=start + 1)
+            ],
+        )
+
+    stale = db.execute(
+        select(RankingSnapshot.id).order_by(RankingSnapshot.id.desc()).offset(max(1, keep))
+    ).scalars().all()
+    if stale:
+        db.execute(delete(RankingScore).where(RankingScore.snapshot_id.in_(stale)))
+        db.execute(delete(RankingSnapshot).where(RankingSnapshot.id.in_(stale)))
+    db.commit()
+    return snapshot.id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit Bradley-Terry scores and store a ranking snapshot")
+    parser.add_argument("--prior", type=float, default=1.0, help="pseudo wins and losses per photo")
+    parser.add_argument("--tol", type=float, default=1e-6, help="max change in log strength to stop at")
+    parser.add_argument("--max-iter", type=int, default=10_000)
+    parser.add_argument("--min-votes", type=int, default=1, help="votes a photo needs to be ranked")
+    parser.add_argument("--keep", type=int, default=4, help="snapshots to keep, this one included")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--dry-run", action="store_true", help="print the ranking without writing")
+    parser.add_argument("--top", type=int, default=20, help="rows to show")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        photo_ids, wins, votes = load_wins(db, chunk_size=args.chunk_size)
+        loaded = time.perf_counter()
+        print(f"loaded {votes} votes over {len(photo_ids)} photos ({wins.nnz} pairs) in {loaded - started:.2f}s")
+        result = fit(wins, prior=args.prior, tol=args.tol, max_iter=args.max_iter)
+        state = "converged" if result["converged"] else "did NOT converge"
+        print(f"fit {state} after {result['iterations']} iterations in {time.perf_counter() - loaded:.2f}s")
+        order = ranked_order(result, args.min_votes)
+        print_top(photo_ids, result, order, top=args.top)
+        if not args.dry_run:
+            snapshot_id = write_snapshot(db, photo_ids, result, order, votes, keep=args.keep)
+            print(f"wrote snapshot {snapshot_id} with {len(order)} photos")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
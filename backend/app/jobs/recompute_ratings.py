@@ -0,0 +1,202 @@
+"""
+Recompute every photo's rating by replaying the full vote history.
+
+    python -m app.jobs.recompute_ratings --dry-run
+    python -m app.jobs.recompute_ratings --k-factor 24
+
+Votes are streamed in id order through a server-side cursor in chunks of
+NumPy arrays. The id is assigned while the photo rows are locked, so it is
+the order the votes were actually applied in; created_at is the
+transaction start time and can disagree under concurrency. Photo ids are
+mapped to dense array slots with one searchsorted per chunk, and
+wins/losses/total_votes are counted with bincount. ELO itself is order
+dependent (each vote reads the ratings the previous one wrote), so the
+rating recurrence runs as a tight scalar loop over the chunk. It
+reproduces calculate_elo exactly, rounding included. Changed rows are
+written back with a bulk update in one transaction. Votes cast while the
+job runs are overwritten, so run it in a quiet window.
+
+The job runs in its own process and cannot reach the workers' memory.
+Running workers keep serving their leaderboard index and nearby
+matchmaking snapshot until those reload, after LEADERBOARD_REFRESH_SECONDS
+and MATCHMAKING_REFRESH_SECONDS. Clients keep their cached pages until
+ETAG_TTL_SECONDS has passed. Restart the workers to serve the new ratings
+at once.
+
+Only Elo ratings can be rebuilt this way. Under RATING_ENGINE=glicko2 the
+ratings come from rating periods (app/utils/rating_periods.py), and the
+job refuses to run rather than overwrite them with Elo values. It also
+refuses once old months have been archived (app/jobs/vote_partitions.py):
+the remaining votes are only part of the history, and replaying them would
+reset every photo's counters and rating.
+"""
+import argparse
+import time
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.vote import Vote
+from app.models.vote_archive import VoteArchive
+from app.utils.elo import K_FACTOR
+from app.utils.rating_engine import rating_engine
+
+INITIAL_RATING = 1000.0
+
+
+def _replay_chunk(ratings: list, winners: list, losers: list, k: float) -> None:
+    for w, l in zip(winners, losers):
+        rw = ratings[w]
+        rl = ratings[l]
+        ew = 1 / (1 + 10 ** ((rl - rw) / 400))
+        el = 1 / (1 + 10 ** ((rw - rl) / 400))
+        ratings[w] = round(rw + k * (1 - ew), 2)
+        ratings[l] = round(rl + k * (0 - el), 2)
+
+
+def replay(db: Session, k: float = K_FACTOR, chunk_size: int = 200_000) -> dict:
+    """Replay all votes and return arrays of ids, current and recomputed values."""
+    if rating_engine.name != "elo":
+        raise RuntimeError(f"ratings are kept by the {rating_engine.name} engine; the replay only rebuilds Elo")
+    archived = db.execute(select(func.max(VoteArchive.month))).scalar()
+    if archived is not None:
+        raise RuntimeError(f"votes up to {archived:%Y-%m} are archived; a replay would drop them from every photo")
+    current = db.execute(
+        select(Photo.id, Photo.elo_rating, Photo.wins, Photo.losses, Photo.total_votes)
+        .order_by(Photo.id)
+    ).all()
+    photo_ids = np.fromiter((r[0] for r in current), dtype=np.int64, count=len(current))
+    n = len(photo_ids)
+
+    ratings = [INITIAL_RATING] * n
+    wins = np.zeros(n, dtype=np.int64)
+    losses = np.zeros(n, dtype=np.int64)
+    replayed = 0
+
+    # Core connection rather than ORM execute: rows stay plain tuples.
+    result = db.connection().execution_options(stream_results=True, yield_per=chunk_size).execute(
+        select(Vote.winner_photo_id, Vote.loser_photo_id).order_by(Vote.id)
+    )
+    for rows in result.partitions():
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+        chunk = flat.reshape(-1, 2)
+        w = np.searchsorted(photo_ids, chunk[:, 0])
+        l = np.searchsorted(photo_ids, chunk[:, 1])
+        # Drop votes whose photo no longer exists
+        w_ok = (w < n) & (photo_ids[np.minimum(w, n - 1)] == chunk[:, 0])
+        l_ok = (l < n) & (photo_ids[np.minimum(l, n - 1)] == chunk[:, 1])
+        keep = w_ok & l_ok
+        w, l = w[keep], l[keep]
+
+        wins += np.bincount(w, minlength=n)
+        losses += np.bincount(l, minlength=n)
+        _replay_chunk(ratings, w.tolist(), l.tolist(), float(k))
+        replayed += len(w)
+
+    return {
+        "photo_ids": photo_ids,
+        "old_elo": np.array([INITIAL_RATING if r[1] is None else r[1] for r in current], dtype=np.float64),
+        "old_wins": np.array([r[2] or 0 for r in current], dtype=np.int64),
+        "old_losses": np.array([r[3] or 0 for r in current], dtype=np.int64),
+        "old_total": np.array([r[4] or 0 for r in current], dtype=np.int64),
+        "elo": np.array(ratings, dtype=np.float64),
+        "wins": wins,
+        "losses": losses,
+        "total": wins + losses,
+        "votes": replayed,
+    }
+
+
+def changed_mask(r: dict) -> np.ndarray:
+    return (
+        (r["elo"] != r["old_elo"])
+        | (r["wins"] != r["old_wins"])
+        | (r["losses"] != r["old_losses"])
+        | (r["total"] != r["old_total"])
+    )
+
+
+def print_diff(r: dict, top: int = 20) -> None:
+    mask = changed_mask(r)
+    delta = r["elo"] - r["old_elo"]
+    print(f"photos: {len(r['photo_ids'])}  votes replayed: {r['votes']}  rows changed: {int(mask.sum())}")
+    if not mask.any():
+        return
+    abs_delta = np.abs(delta)
+    print(f"rating delta: mean |d|={abs_delta[mask].mean():.2f}  max |d|={abs_delta.max():.2f}")
+    print(f"{'photo_id':>10} {'old_elo':>10} {'new_elo':>10} {'delta':>9} {'old_votes':>10} {'new_votes':>10}")
+    for i in np.argsort(-abs_delta)[:top]:
+        if not mask[i]:
+            break
+        print(
+            f"{r['photo_ids'][i]:>10} {r['old_elo'][i]:>10.2f} {r['elo'][i]:>10.2f} "
+            f"{delta[i]:>+9.2f} {r['old_total'][i]:>10} {r['total'][i]:>10}"
+        )
+
+
+def write_back(db: Session, r: dict, batch_size: int = 5000) -> int:
+    idx = np.flatnonzero(changed_mask(r))
+    for start in range(0, len(idx), batch_size):
+        part = idx[start:start + batch_size]
+        db.execute(
+            update(Photo),
+            [
+                {
+                    "id": int(r["photo_ids"][i]),
+                    "elo_rating": float(r["elo"][i]),
+                    "wins": int(r["wins"][i]),
+                    "losses": int(r["losses"][i]),
+                    "total_votes": int(r["total"][i]),
+                }
+                for i in part
+            ],
+        )
+    db.commit()
+    return len(idx)
+
+
+def refresh_window() -> Optional[int]:
+    """Seconds until every running worker has reloaded the ratings it serves; None if some never reload."""
+    refreshes = (settings.LEADERBOARD_REFRESH_SECONDS, settings.MATCHMAKING_REFRESH_SECONDS)
+    if min(refreshes) <= 0:
+        return None
+    return max(*refreshes, settings.ETAG_TTL_SECONDS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute photo ratings from the votes table")
+    parser.add_argument("--k-factor", type=float, default=K_FACTOR)
+    parser.add_argument("--dry-run", action="store_true", help="print the diff without writing")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--top", type=int, default=20, help="rows to show in the diff")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        try:
+            result = replay(db, k=args.k_factor, chunk_size=args.chunk_size)
+        except RuntimeError as exc:
+            raise SystemExit(f"recompute_ratings: {exc}")
+        print(f"replayed in {time.perf_counter() - started:.2f}s")
+        print_diff(result, top=args.top)
+        if not args.dry_run:
+            written = write_back(db, result)
+            print(f"updated {written} photos")
+            window = refresh_window()
+            if written and window is None:
+                print("index refresh is disabled: restart the workers to serve the new ratings")
+            elif written:
+                print(f"workers serve the new ratings within {window}s; restart them to serve them now")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
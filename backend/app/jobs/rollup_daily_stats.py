@@ -0,0 +1,116 @@
+"""
+Roll votes up into photo_daily_stats: wins, losses and closing rating per photo per UTC day.
+
+    python -m app.jobs.rollup_daily_stats
+    python -m app.jobs.rollup_daily_stats --since 2026-01-01
+
+Each run recomputes the days from the day before the newest rolled-up day
+onwards, with one GROUP BY over that range of votes. On Postgres that
+range only touches the latest monthly partitions. The extra day catches
+votes that committed after the previous run had passed their day.
+Recomputed rows replace the stored counts, so runs can overlap or repeat.
+The first run starts at the oldest vote; --since rebuilds from a given day.
+
+closing_rating is the photo's rating when its latest day was last rolled
+up. Run the job often (every 15 minutes, say) so it tracks the end of each
+day. Days first rolled up after the fact keep NULL, because the votes
+table does not record past ratings.
+
+Run it before archiving old vote partitions (app/jobs/vote_partitions.py);
+the archive job refuses months that are not rolled up yet.
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Date, cast, func, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.photo_daily_stats import PhotoDailyStats
+from app.models.vote import Vote
+
+
+def vote_day(dialect: str):
+    """The UTC calendar day of Vote.created_at."""
+    if dialect == "postgresql":
+        return cast(func.timezone("UTC", Vote.created_at), Date)
+    return func.date(Vote.created_at)
+
+
+def resume_day(db: Session) -> Optional[date]:
+    latest = db.execute(select(func.max(PhotoDailyStats.day))).scalar()
+    if latest is not None:
+        return latest - timedelta(days=1)
+    oldest = db.execute(select(func.min(Vote.created_at))).scalar()
+    return oldest.date() if oldest is not None else None
+
+
+def rollup(db: Session, since: Optional[date] = None) -> int:
+    """Recompute daily stats from `since` (default: resume_day) onwards. Returns rows written."""
+    since = since or resume_day(db)
+    if since is None:
+        return 0
+    dialect = db.get_bind().dialect.name
+    start = datetime(since.year, since.month, since.day, tzinfo=timezone.utc)
+    day = vote_day(dialect)
+
+    results = union_all(
+        select(Vote.winner_photo_id.label("photo_id"), day.label("day"),
+               literal(1).label("won"), literal(0).label("lost"))
+        .where(Vote.created_at >= start),
+        select(Vote.loser_photo_id, day, literal(0), literal(1))
+        .where(Vote.created_at >= start),
+    ).subquery()
+    totals = (
+        select(results.c.photo_id, results.c.day, func.sum(results.c.won), func.sum(results.c.lost))
+        .group_by(results.c.photo_id, results.c.day)
+    )
+
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert(PhotoDailyStats).from_select(["photo_id", "day", "wins", "losses"], totals)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PhotoDailyStats.photo_id, PhotoDailyStats.day],
+        set_={"wins": stmt.excluded.wins, "losses": stmt.excluded.losses},
+    )
+    written = db.execute(stmt).rowcount
+
+    # Closing rating on each photo's newest day in the range
+    later = aliased(PhotoDailyStats)
+    db.execute(
+        update(PhotoDailyStats)
+        .where(
+            PhotoDailyStats.day >= since,
+            ~select(later.day)
+            .where(later.photo_id == PhotoDailyStats.photo_id, later.day > PhotoDailyStats.day)
+            .exists(),
+        )
+        .values(
+            closing_rating=select(Photo.elo_rating).where(Photo.id == PhotoDailyStats.photo_id).scalar_subquery()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Roll votes up into photo_daily_stats")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="recompute from this day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        since = args.since or resume_day(db)
+        written = rollup(db, since)
+        print(f"rolled up {written} photo-days from {since} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
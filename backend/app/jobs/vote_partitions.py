@@ -0,0 +1,184 @@
+"""
+Maintain the monthly vote partitions and archive old months.
+
+    python -m app.jobs.vote_partitions ensure
+    python -m app.jobs.vote_partitions archive --dry-run
+    python -m app.jobs.vote_partitions archive --before 2026-01
+
+ensure creates the partitions for the current month and the next
+VOTES_PARTITION_MONTHS_AHEAD months (see app/utils/vote_partitions.py).
+Run it daily from cron; it does nothing on an unpartitioned table.
+
+archive writes every month before the cutoff (default: VOTES_RETENTION_MONTHS
+ago) to VOTES_ARCHIVE_DIR/votes_YYYY-MM.ndjson.gz, in the admin export
+format, and checks the row count before removing the month. On a
+partitioned table the month's partition is detached and dropped; otherwise
+(SQLite, or rows that landed in votes_default) its rows are deleted in
+batches. Idempotency keys are not exported; they stay in vote_idempotency_keys.
+
+Photo counters and ratings are not touched, and photo_daily_stats keeps the
+history. A month is only archived once app.jobs.rollup_daily_stats has
+rolled up past its end; --force skips that check.
+
+Each archive file is recorded in vote_archives before its month is removed.
+Once any month is archived, votes no longer hold the full history, so
+app.jobs.recompute_ratings refuses to run: a replay of the remaining votes
+would reset every photo's counters and rating. Votes that reach an already
+archived month later (from votes_default) go to a new numbered file.
+"""
+import argparse
+import gzip
+import os
+import time
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo_daily_stats import PhotoDailyStats
+from app.models.vote import Vote
+from app.models.vote_archive import VoteArchive
+from app.utils.export import stream_export
+from app.utils.vote_partitions import (
+    add_months,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_bounds,
+    month_start,
+    partition_name,
+)
+
+
+def parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def months_before(db: Session, cutoff: date) -> list[date]:
+    """Months before `cutoff` that still hold votes or have a partition, oldest first."""
+    conn = db.connection()
+    months = set(m for m in list_partitions(conn) if m < cutoff) if is_partitioned(conn) else set()
+    oldest = db.execute(select(func.min(Vote.created_at))).scalar()
+    if oldest is not None:
+        month = month_start(oldest.date())
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+    return sorted(months)
+
+
+def count_month(db: Session, month: date) -> int:
+    start, end = month_bounds(month)
+    return db.execute(
+        select(func.count()).select_from(Vote).where(Vote.created_at >= start, Vote.created_at < end)
+    ).scalar()
+
+
+def export_month(month: date, directory: str) -> tuple[str, int]:
+    """Write one month to a gzipped NDJSON file. Returns its path and row count."""
+    start, end = month_bounds(month)
+    path = os.path.join(directory, f"votes_{month:%Y-%m}.ndjson.gz")
+    copy = 1
+    while os.path.exists(path):
+        copy += 1
+        path = os.path.join(directory, f"votes_{month:%Y-%m}.{copy}.ndjson.gz")
+    partial = path + ".partial"
+    rows = 0
+    with gzip.open(partial, "wb") as out:
+        for chunk in stream_export("votes", "ndjson", since=start, until=end):
+            rows += chunk.count(b"\n")
+            out.write(chunk)
+    os.replace(partial, path)
+    return path, rows
+
+
+def remove_month(db: Session, month: date, partitioned: set[date], batch_size: int = 5000) -> None:
+    if month in partitioned:
+        name = partition_name(month)
+        db.execute(text(f"ALTER TABLE votes DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        return
+    start, end = month_bounds(month)
+    while True:
+        ids = db.execute(
+            select(Vote.id).where(Vote.created_at >= start, Vote.created_at < end).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(Vote).where(Vote.id.in_(ids), Vote.created_at >= start, Vote.created_at < end))
+        db.commit()
+
+
+def archive(
+    db: Session, cutoff: date, directory: str, dry_run: bool = False, force: bool = False,
+    batch_size: int = 5000,
+) -> int:
+    """Archive and remove every month before `cutoff`. Returns the number of votes archived."""
+    conn = db.connection()
+    partitioned = set(list_partitions(conn)) if is_partitioned(conn) else set()
+    rolled_up: Optional[date] = db.execute(select(func.max(PhotoDailyStats.day))).scalar()
+    if not dry_run:
+        os.makedirs(directory, exist_ok=True)
+
+    archived = 0
+    for month in months_before(db, cutoff):
+        next_month = add_months(month, 1)
+        if not force and (rolled_up is None or rolled_up < next_month):
+            print(f"{month:%Y-%m}: not rolled up yet, stopping (run app.jobs.rollup_daily_stats or pass --force)")
+            break
+        expected = count_month(db, month)
+        db.rollback()
+        if expected == 0 and month not in partitioned:
+            continue
+        if dry_run:
+            print(f"{month:%Y-%m}: would archive {expected} votes")
+            continue
+        path, rows = export_month(month, directory)
+        if rows != expected:
+            print(f"{month:%Y-%m}: exported {rows} rows but counted {expected}, leaving the month in place")
+            break
+        db.add(VoteArchive(month=month, votes=rows, path=path))
+        db.commit()
+        remove_month(db, month, partitioned, batch_size=batch_size)
+        archived += rows
+        print(f"{month:%Y-%m}: archived {rows} votes to {path}")
+    return archived
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain monthly vote partitions and archive old months")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ensure = commands.add_parser("ensure", help="create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=settings.VOTES_PARTITION_MONTHS_AHEAD)
+
+    arch = commands.add_parser("archive", help="export and drop months before a cutoff")
+    arch.add_argument("--before", type=parse_month, default=None, help="first month to keep (YYYY-MM)")
+    arch.add_argument("--dir", default=settings.VOTES_ARCHIVE_DIR, help="where to write the archives")
+    arch.add_argument("--batch-size", type=int, default=5000, help="rows per DELETE without partitions")
+    arch.add_argument("--dry-run", action="store_true", help="list the months without touching them")
+    arch.add_argument("--force", action="store_true", help="archive months that are not rolled up")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        if args.command == "ensure":
+            created = ensure_partitions(db.connection(), args.months_ahead)
+            db.commit()
+            print(f"created {len(created)} partitions {created} in {time.perf_counter() - started:.2f}s")
+        else:
+            current = month_start(datetime.now(timezone.utc).date())
+            cutoff = args.before or add_months(current, -settings.VOTES_RETENTION_MONTHS)
+            archived = archive(db, cutoff, args.dir, dry_run=args.dry_run, force=args.force, batch_size=args.batch_size)
+            print(f"archived {archived} votes before {cutoff:%Y-%m} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
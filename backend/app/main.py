@@ -1,24 +1,59 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 
 from app.config import settings
-from app.routes import auth, photos, vote, leaderboard, admin
+from app.database import SessionLocal
+from app.routes import auth, photos, vote, leaderboard, admin, media, metrics
+from app.utils.fast_json import FastJSONResponse
+from app.utils.upload_limit import BodySizeLimitMiddleware
+from app.utils.leaderboard_feed import leaderboard_feed
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.metrics import RequestMetricsMiddleware
+from app.utils.password_pool import password_pool
+from app.utils.photo_purge import photo_purger
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.rating_engine import rating_engine
+from app.utils.rating_periods import rating_period_worker
+from app.utils.vote_queue import vote_writer
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Warm the in-memory indexes before taking traffic
+    db = SessionLocal()
+    try:
+        matchmaking.load_from_db(db)
+        leaderboard_index.load_from_db(db)
+    finally:
+        db.close()
+
+    if settings.VOTE_INGEST_MODE == "queued":
+        vote_writer.start()
+    if rating_engine.periodic:
+        rating_period_worker.start()
+    photo_purger.start()
+    leaderboard_feed.start()
+    yield
+    await leaderboard_feed.stop()
+    photo_purger.stop()
+    rating_period_worker.stop()
+    vote_writer.stop()
+    password_pool.shutdown()
 
-# Rate limiter setup
-limiter = Limiter(key_func=get_remote_address, default_limits=["200/minute"])
 
 app = FastAPI(
     title="SRM FaceRank API",
     description="Campus swipe voting game — FaceMash for SRM",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
-# Rate limiting middleware
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Reject oversized uploads before the multipart body is buffered
+app.add_middleware(BodySizeLimitMiddleware, limits={"/photos/upload": photos.MAX_UPLOAD_BODY})
 
 # CORS
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",")]
@@ -28,8 +63,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "ETag", "X-Profile-Report"],
 )
 
+if settings.PROFILE_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=settings.PROFILE_TOKEN,
+        directory=settings.PROFILE_DIR,
+        interval_ms=settings.PROFILE_INTERVAL_MS,
+    )
+
+# Outermost, so its timings cover the whole stack
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(photos.router)
@@ -37,6 +85,12 @@ app.include_router(vote.router)
 app.include_router(leaderboard.router)
 app.include_router(admin.router)
 
+if settings.STORAGE_BACKEND == "local":
+    app.include_router(media.router)
+
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
 
 @app.get("/health")
 def health():
@@ -1,3 +1,8 @@
 from .user import User
 from .photo import Photo
 from .vote import Vote
+from .rating_period import RatingPeriod
+from .ranking import RankingSnapshot, RankingScore
+from .photo_daily_stats import PhotoDailyStats
+from .vote_archive import VoteArchive
+from .vote_idempotency_key import VoteIdempotencyKey
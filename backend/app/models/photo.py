@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import BigInteger, Column, Integer, String, Float, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -9,11 +9,27 @@ class Photo(Base):
     id = Column(Integer, primary_key=True, index=True)
     cloudinary_public_id = Column(String(255), nullable=False)
     image_url = Column(String(512), nullable=False)
-    uploaded_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    uploaded_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     elo_rating = Column(Float, default=1000.0)
     wins = Column(Integer, default=0)
     losses = Column(Integer, default=0)
     total_votes = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 64-bit dHash stored signed; see app/utils/phash.py
+    phash = Column(BigInteger, nullable=True)
+    duplicate_of_id = Column(Integer, ForeignKey("photos.id", ondelete="SET NULL"), nullable=True)
+    # Set on delete; the purge worker removes votes, the file and the row later
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Glicko-2 state (RATING_ENGINE=glicko2); NULL means the initial values.
+    # rating_period is the last period the photo played in.
+    rating_deviation = Column(Float, nullable=True)
+    volatility = Column(Float, nullable=True)
+    rating_period = Column(Integer, nullable=True)
 
-    uploader = relationship("User", backref="photos")
\ No newline at end of file
+    uploader = relationship("User", backref="photos")
+
+    __table_args__ = (
+        # Leaderboard keyset order: elo_rating DESC, id ASC
+        Index("ix_photos_elo_rating_id", elo_rating.desc(), id),
+        Index("ix_photos_deleted_at", deleted_at, postgresql_where=deleted_at.isnot(None)),
+    )
\ No newline at end of file
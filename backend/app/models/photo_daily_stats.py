@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Index, Integer
+from app.database import Base
+
+
+class PhotoDailyStats(Base):
+    """Per photo, per UTC day vote counts, kept by app/jobs/rollup_daily_stats.py."""
+    __tablename__ = "photo_daily_stats"
+
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    # Rating when the day was last rolled up; NULL for days backfilled later
+    closing_rating = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_photo_daily_stats_day", day),
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Boolean, Column, Integer, Float, ForeignKey, DateTime, Index, func
+from app.database import Base
+
+
+class RankingSnapshot(Base):
+    """One run of the Bradley-Terry ranking job (app/jobs/bradley_terry.py)."""
+    __tablename__ = "ranking_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    votes = Column(Integer, nullable=False)
+    photos = Column(Integer, nullable=False)
+    iterations = Column(Integer, nullable=False)
+    converged = Column(Boolean, nullable=False)
+
+
+class RankingScore(Base):
+    __tablename__ = "ranking_scores"
+
+    snapshot_id = Column(Integer, ForeignKey("ranking_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, nullable=False)
+    # Bradley-Terry strength on the Elo scale, with a 95% interval
+    score = Column(Float, nullable=False)
+    ci_low = Column(Float, nullable=False)
+    ci_high = Column(Float, nullable=False)
+    wins = Column(Integer, nullable=False)
+    losses = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_ranking_scores_snapshot_rank", snapshot_id, rank),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, func
+from app.database import Base
+
+
+class RatingPeriod(Base):
+    """A closed Glicko-2 rating period: it rated the votes after the previous period's last_vote_id."""
+    __tablename__ = "rating_periods"
+
+    # Period number; inserting it is how a worker claims the period
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    last_vote_id = Column(Integer, nullable=False)
+    votes = Column(Integer, nullable=False, default=0)
+    photos = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,12 +1,17 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, func
 from app.database import Base
 
 
 class Vote(Base):
+    # On Postgres this is range-partitioned by created_at (migration 0008,
+    # app/utils/vote_partitions.py) with primary key (id, created_at)
     __tablename__ = "votes"
 
     id = Column(Integer, primary_key=True, index=True)
-    voter_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    winner_photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False)
-    loser_photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    voter_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    winner_photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False, index=True)
+    loser_photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Client-chosen key from POST /vote/batch; vote_idempotency_keys enforces it
+    idempotency_key = Column(String(64), nullable=True)
+
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Date, DateTime, Integer, String, func
+from app.database import Base
+
+
+class VoteArchive(Base):
+    """An archive file of one month's votes, written by app/jobs/vote_partitions.py before they were removed."""
+    __tablename__ = "vote_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(Date, nullable=False, index=True)
+    votes = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from app.database import Base
+
+
+class VoteIdempotencyKey(Base):
+    """An idempotency key from POST /vote/batch and the vote it produced.
+
+    Kept outside the partitioned votes table, so a key is unique per voter
+    across every month and still answers retries after its month is archived.
+    """
+    __tablename__ = "vote_idempotency_keys"
+
+    voter_user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    idempotency_key = Column(String(64), primary_key=True)
+    # No foreign key: votes' primary key is (id, created_at), and archived votes are gone
+    vote_id = Column(Integer, nullable=False)
+    # Indexed so the photo purge can remove a deleted photo's keys
+    winner_photo_id = Column(Integer, nullable=False, index=True)
+    loser_photo_id = Column(Integer, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_engine, engine, get_db
 from app.models.user import User
 from app.models.photo import Photo
 from app.utils.auth import require_admin
-from app.utils.cloudinary_helper import delete_image
+from app.utils.ban_version import ban_version
+from app.utils.db_metrics import async_pool_stats, sync_pool_stats
+from app.utils.export import MEDIA_TYPES, stream_export
+from app.utils.fast_json import FastJSONResponse, rows_to_dicts
+from app.utils.photo_purge import soft_delete_photo
+from app.utils.user_cache import Principal, user_cache
+from app.utils.vote_abuse import abuse_detector
+from app.utils.versions import versions
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -14,22 +25,20 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 def admin_delete_photo(
     photo_id: int,
     db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin),
 ):
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = db.query(Photo).filter(Photo.id == photo_id, Photo.deleted_at.is_(None)).first()
     if not photo:
         raise HTTPException(404, "Photo not found")
 
-    delete_image(photo.cloudinary_public_id)
-    db.delete(photo)
-    db.commit()
+    soft_delete_photo(db, photo)
 
 
 @router.post("/ban-user/{user_id}", status_code=200)
 def ban_user(
     user_id: int,
     db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     if user_id == admin.id:
         raise HTTPException(400, "Cannot ban yourself")
@@ -40,6 +49,10 @@ def ban_user(
 
     user.is_banned = True
     db.commit()
+    user_cache.invalidate(user_id)
+    ban_version.bump()
+    abuse_detector.forget(user_id)
+    versions.bump(f"user:{user_id}")
     return {"message": f"User {user.username} has been banned"}
 
 
@@ -47,7 +60,7 @@ def ban_user(
 def unban_user(
     user_id: int,
     db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin),
 ):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -55,23 +68,65 @@ def unban_user(
 
     user.is_banned = False
     db.commit()
+    user_cache.invalidate(user_id)
+    ban_version.bump()
+    versions.bump(f"user:{user_id}")
     return {"message": f"User {user.username} has been unbanned"}
 
 
 @router.get("/users")
 def list_users(
     db: Session = Depends(get_db),
-    _admin: User = Depends(require_admin),
+    _admin: Principal = Depends(require_admin),
 ):
-    users = db.query(User).all()
-    return [
-        {
-            "id": u.id,
-            "username": u.username,
-            "email": u.email,
-            "is_admin": u.is_admin,
-            "is_banned": u.is_banned,
-            "created_at": u.created_at,
-        }
-        for u in users
-    ]
\ No newline at end of file
+    columns = (User.id, User.username, User.email, User.is_admin, User.is_banned, User.created_at)
+    rows = db.query(*columns).all()
+    return FastJSONResponse(rows_to_dicts([c.key for c in columns], rows))
+
+
+@router.get("/suspicious-voters")
+def suspicious_voters(
+    limit: int = Query(default=50, ge=1, le=500),
+    min_score: float = Query(default=1.0, ge=0),
+    db: Session = Depends(get_db),
+    _admin: Principal = Depends(require_admin),
+):
+    """Voters this worker's abuse detector scores highest, from their recent votes."""
+    voters = abuse_detector.suspicious(limit=limit, min_score=min_score)
+    ids = [v["user_id"] for v in voters]
+    names = dict(db.query(User.id, User.username).filter(User.id.in_(ids)).all()) if ids else {}
+    for v in voters:
+        v["username"] = names.get(v["user_id"])
+    return FastJSONResponse(voters)
+
+
+@router.get("/export/{table}")
+def export_table(
+    table: Literal["votes", "photos", "users"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_id: Optional[int] = Query(default=None, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1),
+    _admin: Principal = Depends(require_admin),
+):
+    """Stream a table in id order; resume an interrupted export with after_id=<last id>."""
+    body = stream_export(table, format, since=since, until=until, after_id=after_id, limit=limit)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'},
+    )
+
+
+@router.get("/cache-stats")
+def cache_stats(_admin: Principal = Depends(require_admin)):
+    return {"user_cache": user_cache.stats()}
+
+
+@router.get("/db-pool")
+def db_pool_stats(_admin: Principal = Depends(require_admin)):
+    return {
+        "sync": sync_pool_stats.snapshot(engine.pool),
+        "async": async_pool_stats.snapshot(async_engine.pool) if async_engine is not None else None,
+    }
@@ -1,36 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import AnySession, get_db, get_db_session, run_db
 from app.models.user import User
 from app.schemas import UserRegister, UserLogin, Token, UserOut
-from app.utils.auth import hash_password, verify_password, create_access_token, get_current_user
+from app.utils.auth import create_access_token, get_current_user
+from app.utils.password_pool import password_pool
+from app.utils.rate_limit import ip_rate_limit
+from app.utils.user_cache import Principal
+from app.utils.versions import not_modified, versions
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+auth_rate_limit = ip_rate_limit("auth", settings.RATE_LIMIT_AUTH)
+
+
+def _find_user(db: Session, **filters) -> Optional[User]:
+    return db.query(User).filter_by(**filters).first()
+
+
+def _save(db: Session, user: User) -> User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
 
-@router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: UserRegister, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == payload.username).first():
+# register and login are async so that waiting on the hashing pool does not
+# hold a threadpool worker; their short queries go through run_db.
+@router.post("/register", response_model=UserOut, status_code=201, dependencies=[Depends(auth_rate_limit)])
+async def register(payload: UserRegister, db: AnySession = Depends(get_db_session)):
+    if await run_db(db, _find_user, username=payload.username):
         raise HTTPException(400, "Username already taken")
-    if db.query(User).filter(User.email == payload.email).first():
+    if await run_db(db, _find_user, email=payload.email):
         raise HTTPException(400, "Email already registered")
 
     user = User(
         username=payload.username,
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=await password_pool.hash(payload.password),
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_db(db, _save, user)
 
 
-@router.post("/login", response_model=Token)
-def login(payload: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == payload.username).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+@router.post("/login", response_model=Token, dependencies=[Depends(auth_rate_limit)])
+async def login(payload: UserLogin, db: AnySession = Depends(get_db_session)):
+    user = await run_db(db, _find_user, username=payload.username)
+    if not user or not await password_pool.verify(payload.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -38,10 +57,27 @@ def login(payload: UserLogin, db: Session = Depends(get_db)):
     if user.is_banned:
         raise HTTPException(status_code=403, detail="Account has been banned")
 
+    if password_pool.needs_rehash(user.hashed_password):
+        user.hashed_password = await password_pool.hash(payload.password)
+        await run_db(db, _save, user)
+
     token = create_access_token({"sub": str(user.id)})
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
-    return current_user
\ No newline at end of file
+def me(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    etag = versions.etag(versions.current(f"user:{current_user.id}"))
+    unchanged = not_modified(request, response, etag)
+    if unchanged is not None:
+        return unchanged
+
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(404, "User not found")
+    return user
\ No newline at end of file
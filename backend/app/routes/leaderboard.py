@@ -1,40 +1,208 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import AnySession, get_db_session, run_db
 from app.models.photo import Photo
+from app.models.ranking import RankingScore, RankingSnapshot
 from app.models.user import User
-from app.utils.auth import get_current_user
+from app.utils.auth import authenticate_token, get_current_user
+from app.utils.fast_json import FastJSONResponse
+from app.utils.leaderboard_feed import leaderboard_feed
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.rate_limit import user_rate_limit
+from app.utils.user_cache import Principal
+from app.utils.versions import not_modified, versions
 
 router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
 
+read_rate_limit = user_rate_limit("read")
+
 
-@router.get("")
-def get_leaderboard(
+# Served from the in-memory index without touching the database unless the
+# snapshot needs a reload; the DB path and reloads go through run_db.
+# An unchanged page is answered with 304 from its version alone.
+@router.get("", dependencies=[Depends(read_rate_limit)])
+async def get_leaderboard(
+    request: Request,
+    response: Response,
     limit: int = Query(default=20, le=100),
-    offset: int = Query(default=0),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None),
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
 ):
-    photos = (
-        db.query(Photo)
-        .filter(Photo.total_votes > 0)
-        .order_by(Photo.elo_rating.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    after = decode_cursor(cursor)
+    if settings.LEADERBOARD_IN_MEMORY:
+        if leaderboard_index.needs_load():
+            await run_db(db, leaderboard_index.load_from_db)
+        unchanged = not_modified(request, response, versions.etag(leaderboard_index.version))
+    else:
+        unchanged = not_modified(request, response, versions.etag(versions.current("leaderboard")))
+    if unchanged is not None:
+        return unchanged
+
+    if settings.LEADERBOARD_IN_MEMORY:
+        if after:
+            rows = leaderboard_index.page_after(*after, limit)
+        else:
+            rows = leaderboard_index.page(offset, limit)
+    else:
+        rows = await run_db(db, leaderboard_page_from_db, after, offset, limit)
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["elo_rating"], last["id"], last["rank"])
+    return FastJSONResponse(rows, headers=response.headers)
+
+
+def leaderboard_page_from_db(
+    db: Session, after: Optional[tuple[float, int, int]], offset: int, limit: int
+) -> list[dict]:
+    """One query per page: keyset on (elo_rating DESC, id) with the uploader joined in."""
+    query = (
+        db.query(
+            Photo.id, Photo.image_url, Photo.elo_rating, Photo.wins,
+            Photo.losses, Photo.total_votes, Photo.rating_deviation, User.username,
+        )
+        .outerjoin(User, User.id == Photo.uploaded_by_user_id)
+        .filter(Photo.total_votes > 0, Photo.deleted_at.is_(None))
+        .order_by(Photo.elo_rating.desc(), Photo.id)
     )
+    if after:
+        elo_rating, photo_id, rank = after
+        query = query.filter(
+            or_(
+                Photo.elo_rating < elo_rating,
+                and_(Photo.elo_rating == elo_rating, Photo.id > photo_id),
+            )
+        )
+    else:
+        rank = offset
+        query = query.offset(offset)
 
-    result = []
-    for rank, photo in enumerate(photos, start=offset + 1):
-        result.append({
+    return [
+        {
             "rank": rank,
-            "id": photo.id,
-            "image_url": photo.image_url,
-            "elo_rating": photo.elo_rating,
-            "wins": photo.wins,
-            "losses": photo.losses,
-            "total_votes": photo.total_votes,
-            "uploader_username": photo.uploader.username if photo.uploader else "unknown",
-        })
-    return result
\ No newline at end of file
+            "id": r.id,
+            "image_url": r.image_url,
+            "elo_rating": r.elo_rating,
+            "wins": r.wins,
+            "losses": r.losses,
+            "total_votes": r.total_votes,
+            "rating_deviation": r.rating_deviation,
+            "uploader_username": r.username or "unknown",
+        }
+        for rank, r in enumerate(query.limit(limit).all(), start=rank + 1)
+    ]
+
+
+@router.get("/official", dependencies=[Depends(read_rate_limit)])
+async def get_official_ranking(
+    limit: int = Query(default=20, le=100),
+    offset: int = Query(default=0, ge=0),
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """The latest Bradley-Terry snapshot (app/jobs/bradley_terry.py), by rank.
+
+    offset counts snapshot ranks: a photo deleted since the snapshot leaves
+    a gap rather than shifting later pages.
+    """
+    page = await run_db(db, official_page_from_db, offset, limit)
+    if page is None:
+        raise HTTPException(404, "No official ranking yet")
+    return FastJSONResponse(page)
+
+
+def official_page_from_db(db: Session, offset: int, limit: int) -> Optional[dict]:
+    snapshot = db.execute(
+        select(
+            RankingSnapshot.id, RankingSnapshot.created_at, RankingSnapshot.votes,
+            RankingSnapshot.photos, RankingSnapshot.converged,
+        )
+        .order_by(RankingSnapshot.id.desc())
+        .limit(1)
+    ).first()
+    if snapshot is None:
+        return None
+    rows = db.execute(
+        select(
+            RankingScore.rank, Photo.id, Photo.image_url, RankingScore.score, RankingScore.ci_low,
+            RankingScore.ci_high, RankingScore.wins, RankingScore.losses, User.username,
+        )
+        .join(Photo, Photo.id == RankingScore.photo_id)
+        .outerjoin(User, User.id == Photo.uploaded_by_user_id)
+        .where(RankingScore.snapshot_id == snapshot.id, RankingScore.rank > offset, Photo.deleted_at.is_(None))
+        .order_by(RankingScore.rank)
+        .limit(limit)
+    ).all()
+    return {
+        "snapshot": snapshot._asdict(),
+        "entries": [
+            {
+                "rank": r.rank,
+                "id": r.id,
+                "image_url": r.image_url,
+                "score": r.score,
+                "ci_low": r.ci_low,
+                "ci_high": r.ci_high,
+                "wins": r.wins,
+                "losses": r.losses,
+                "uploader_username": r.username or "unknown",
+            }
+            for r in rows
+        ],
+    }
+
+
+@router.get("/rank/{photo_id}", dependencies=[Depends(read_rate_limit)])
+async def get_photo_rank(
+    photo_id: int,
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    if leaderboard_index.needs_load():
+        await run_db(db, leaderboard_index.load_from_db)
+    entry = leaderboard_index.rank_of(photo_id)
+    if entry is None:
+        raise HTTPException(404, "Photo not ranked yet")
+    return entry
+
+
+@router.websocket("/live")
+async def live_leaderboard(websocket: WebSocket, n: int = 10, token: str = ""):
+    """Push the top-n leaderboard: a snapshot on connect, then coalesced diffs.
+
+    Browsers cannot set headers on a WebSocket, so the access token is a
+    query parameter.
+    """
+    try:
+        await authenticate_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if leaderboard_feed.subscriber_count() >= settings.LIVE_LEADERBOARD_MAX_SUBSCRIBERS:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    window, queue = leaderboard_feed.subscribe(max(1, n))
+
+    async def send_updates():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    # Reading is what notices a client that went away while nothing changed
+    sender = asyncio.create_task(send_updates())
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        leaderboard_feed.unsubscribe(window, queue)
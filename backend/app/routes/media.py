@@ -0,0 +1,39 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from app.utils.storage import LocalStorage, storage
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+class SendfileResponse(FileResponse):
+    """FileResponse that hands the file descriptor to the server when it
+    advertises the ASGI `http.response.zerocopy` extension (sendfile), and
+    streams it in chunks otherwise."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if "http.response.zerocopy" not in scope.get("extensions", {}):
+            await super().__call__(scope, receive, send)
+            return
+
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.headers["content-length"] = str(size)
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.zerocopy", "file": f, "count": size, "more_body": False})
+
+
+@router.get("/{public_id}")
+def get_media(public_id: str):
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(404, "Not found")
+    try:
+        path = storage.path(public_id)
+    except ValueError:
+        raise HTTPException(404, "Not found")
+    if not os.path.isfile(path):
+        raise HTTPException(404, "Not found")
+    return SendfileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
@@ -0,0 +1,73 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.database import async_engine, engine
+from app.utils.db_metrics import PoolStats, async_pool_stats, sync_pool_stats
+from app.utils.leaderboard_feed import leaderboard_feed
+from app.utils.metrics import format_metric, registry
+from app.utils.user_cache import user_cache
+from app.utils.vote_abuse import abuse_detector
+from app.utils.vote_queue import vote_writer
+
+router = APIRouter(tags=["metrics"])
+
+POOL_METRICS = [
+    ("db_pool_checked_out", "gauge", "Connections currently checked out.", "checked_out"),
+    ("db_pool_overflow", "gauge", "Connections open beyond pool_size.", "overflow"),
+    ("db_pool_capacity", "gauge", "pool_size + max_overflow.", "capacity"),
+    ("db_pool_saturation", "gauge", "Share of the pool capacity checked out.", "saturation"),
+    ("db_pool_wait_seconds_max", "gauge", "Longest wait for a pooled connection so far.", "wait_seconds_max"),
+    ("db_pool_checkouts_total", "counter", "Pool checkouts.", "checkouts"),
+    ("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.", "timeouts"),
+    ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.", "wait_seconds_total"),
+]
+
+
+def _pool_lines() -> list[str]:
+    pools: list[tuple[str, PoolStats, object]] = [("sync", sync_pool_stats, engine.pool)]
+    if async_engine is not None:
+        pools.append(("async", async_pool_stats, async_engine.sync_engine.pool))
+    snapshots = [(name, stats.snapshot(pool)) for name, stats, pool in pools]
+    lines = []
+    for metric, kind, help, key in POOL_METRICS:
+        samples = [({"engine": name}, snap[key]) for name, snap in snapshots if snap.get(key) is not None]
+        if samples:
+            lines += format_metric(metric, help, kind, samples)
+    return lines
+
+
+def _runtime_lines() -> list[str]:
+    cache = user_cache.stats()
+    abuse = abuse_detector.stats()
+    return [
+        *format_metric("vote_queue_depth", "Votes acknowledged but not yet written.", "gauge",
+                       [({}, vote_writer.depth())]),
+        *format_metric("live_leaderboard_subscribers", "Open /leaderboard/live connections.", "gauge",
+                       [({}, leaderboard_feed.subscriber_count())]),
+        *format_metric("user_cache_hits_total", "Principal cache hits.", "counter", [({}, cache["hits"])]),
+        *format_metric("user_cache_misses_total", "Principal cache misses.", "counter", [({}, cache["misses"])]),
+        *format_metric("vote_abuse_flagged_total", "Votes flagged as suspicious.", "counter",
+                       [({}, abuse["flagged"])]),
+        *format_metric("vote_abuse_throttled_total", "Votes rejected as suspicious.", "counter",
+                       [({}, abuse["throttled"])]),
+        *format_metric("vote_abuse_tracked_voters", "Voters with a window in the abuse detector.", "gauge",
+                       [({}, abuse["voters"])]),
+    ]
+
+
+registry.add_collector(_pool_lines)
+registry.add_collector(_runtime_lines)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(default=None)):
+    """Prometheus text exposition for this worker."""
+    if not settings.METRICS_PUBLIC:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not settings.METRICS_TOKEN or authorization is None or not hmac.compare_digest(authorization, expected):
+            raise HTTPException(401, "Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,47 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models.user import User
+from app.config import settings
+from app.database import AnySession, get_db, get_db_session, run_db
 from app.models.photo import Photo
+from app.models.user import User
 from app.schemas import PhotoOut, PhotoPair
 from app.utils.auth import get_current_user
-from app.utils.cloudinary_helper import upload_image, delete_image
+from app.utils.fast_json import FastJSONResponse, rows_to_dicts
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.phash import dhash, phash_index, to_signed
+from app.utils.photo_purge import soft_delete_photo
+from app.utils.rate_limit import user_rate_limit
+from app.utils.seen_pairs import pair_key, seen_pairs
+from app.utils.storage import storage
+from app.utils.user_cache import Principal
+from app.utils.versions import not_modified, versions
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
+PAIR_ATTEMPTS = 8
+MAX_PAIRS_PER_REQUEST = 20
+
 ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_UPLOAD_BODY = MAX_FILE_SIZE + 64 * 1024  # room for multipart framing
 
+# PhotoOut fields as plain columns, for listings that skip the ORM
+PHOTO_OUT_COLUMNS = (
+    Photo.id, Photo.image_url, Photo.uploaded_by_user_id, Photo.elo_rating,
+    Photo.wins, Photo.losses, Photo.total_votes, Photo.created_at,
+)
+PHOTO_OUT_NAMES = [c.key for c in PHOTO_OUT_COLUMNS]
 
-def photo_to_out(photo: Photo) -> PhotoOut:
+
+def photo_to_out(photo: Photo, uploader_username: Optional[str] = None) -> PhotoOut:
+    if uploader_username is None and photo.uploader:
+        uploader_username = photo.uploader.username
     return PhotoOut(
         id=photo.id,
         image_url=photo.image_url,
@@ -25,44 +51,79 @@ def photo_to_out(photo: Photo) -> PhotoOut:
         losses=photo.losses,
         total_votes=photo.total_votes,
         created_at=photo.created_at,
-        uploader_username=photo.uploader.username if photo.uploader else None,
+        uploader_username=uploader_username,
     )
 
 
-@router.post("/upload", response_model=PhotoOut, status_code=201)
+def _save_photo(db: Session, photo: Photo) -> Photo:
+    db.add(photo)
+    db.commit()
+    db.refresh(photo)
+    return photo
+
+
+@router.post(
+    "/upload",
+    response_model=PhotoOut,
+    status_code=201,
+    dependencies=[Depends(user_rate_limit("upload", settings.RATE_LIMIT_UPLOAD))],
+)
 async def upload_photo(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(400, f"Unsupported file type: {file.content_type}")
 
-    file_bytes = await file.read()
-    if len(file_bytes) > MAX_FILE_SIZE:
+    # BodySizeLimitMiddleware has already cut off anything far over the cap;
+    # this catches files that fit only because of the multipart framing.
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(400, "File too large. Max 10MB allowed.")
 
+    await file.seek(0)
+    try:
+        phash = await run_in_threadpool(dhash, file.file)
+    except ValueError:
+        raise HTTPException(400, "Could not read image")
+
+    duplicate_of = None
+    if settings.DEDUP_MODE != "off":
+        await run_in_threadpool(phash_index.ensure_loaded, db)
+        match = phash_index.nearest(phash)
+        if match is not None:
+            if settings.DEDUP_MODE == "reject":
+                raise HTTPException(409, f"This photo has already been uploaded (photo {match[0]})")
+            duplicate_of = match[0]
+
     unique_name = f"{current_user.id}_{uuid.uuid4().hex}"
-    result = upload_image(file_bytes, unique_name)
+    await file.seek(0)
+    result = await storage.asave(file.file, unique_name, file.content_type)
 
     photo = Photo(
         cloudinary_public_id=result["public_id"],
         image_url=result["url"],
         uploaded_by_user_id=current_user.id,
+        phash=to_signed(phash),
+        duplicate_of_id=duplicate_of,
     )
-    db.add(photo)
-    db.commit()
-    db.refresh(photo)
-    return photo_to_out(photo)
+    photo = await run_in_threadpool(_save_photo, db, photo)
+    if duplicate_of is None:
+        # Linked duplicates stay out of pairing so votes are not split
+        phash_index.add(photo.id, phash)
+        matchmaking.add(photo.id, photo.elo_rating)
+    leaderboard_index.add_photo(photo.id, photo.image_url, current_user.username, photo.elo_rating)
+    versions.bump("leaderboard", f"photos:{current_user.id}")
+    return photo_to_out(photo, current_user.username)
 
 
 @router.delete("/{photo_id}", status_code=204)
 def delete_photo(
     photo_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = db.query(Photo).filter(Photo.id == photo_id, Photo.deleted_at.is_(None)).first()
     if not photo:
         raise HTTPException(404, "Photo not found")
 
@@ -70,41 +131,107 @@ def delete_photo(
     if photo.uploaded_by_user_id != current_user.id:
         raise HTTPException(403, "You can only delete your own photos")
 
-    # Delete all votes referencing this photo first (FK constraint fix)
-    from app.models.vote import Vote
-    db.query(Vote).filter(
-        (Vote.winner_photo_id == photo_id) | (Vote.loser_photo_id == photo_id)
-    ).delete(synchronize_session=False)
-
-    delete_image(photo.cloudinary_public_id)
-    db.delete(photo)
-    db.commit()
+    # Votes and the stored file are removed later by the purge worker
+    soft_delete_photo(db, photo)
 
 
-@router.get("/random-pair", response_model=PhotoPair)
-def get_random_pair(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+@router.get("/random-pair", response_model=PhotoPair, dependencies=[Depends(user_rate_limit("read"))])
+async def get_random_pair(
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
 ):
-    from sqlalchemy import func
-
-    photos = (
-        db.query(Photo)
-        .order_by(func.random())
-        .limit(2)
-        .all()
-    )
-
-    if len(photos) < 2:
+    pairs = await run_db(db, _random_pairs, current_user.id, 1)
+    if not pairs:
         raise HTTPException(404, "Not enough photos for a matchup. Upload at least 2 photos!")
-
-    return PhotoPair(photo_a=photo_to_out(photos[0]), photo_b=photo_to_out(photos[1]))
+    return FastJSONResponse(pairs[0])
 
 
-@router.get("/my", response_model=list[PhotoOut])
+@router.get("/pairs", response_model=list[PhotoPair], dependencies=[Depends(user_rate_limit("read"))])
+async def get_random_pairs(
+    n: int = Query(default=5, ge=1, le=MAX_PAIRS_PER_REQUEST),
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Up to n distinct pairs in one round trip, for clients that prefetch swipes."""
+    pairs = await run_db(db, _random_pairs, current_user.id, n)
+    if not pairs:
+        raise HTTPException(404, "Not enough photos for a matchup. Upload at least 2 photos!")
+    return FastJSONResponse(pairs)
+
+
+def _draw_pairs(user_id: int, n: int, exclude: set[int]) -> list[tuple[int, int]]:
+    """Draw up to n distinct pairs whose keys are not in `exclude`."""
+    drawn: list[tuple[int, int]] = []
+    skipped = 0
+    for _ in range(n * PAIR_ATTEMPTS * 2):
+        if len(drawn) == n:
+            break
+        pair = matchmaking.sample_pair()
+        if pair is None:
+            break
+        key = pair_key(*pair)
+        if key in exclude:
+            continue
+        # Skip pairs this user has already voted on; after PAIR_ATTEMPTS skips
+        # per requested pair settle for them so heavy voters still get matchups.
+        if skipped < n * PAIR_ATTEMPTS and seen_pairs.seen(user_id, *pair):
+            skipped += 1
+            continue
+        exclude.add(key)
+        drawn.append(pair)
+    return drawn
+
+
+def _random_pairs(db: Session, user_id: int, n: int) -> list[dict]:
+    """Up to n pairs as PhotoPair-shaped dicts."""
+    matchmaking.ensure_loaded(db)
+    seen_pairs.ensure_user(db, user_id)
+
+    names = PHOTO_OUT_NAMES + ["uploader_username"]
+    pairs: list[dict] = []
+    exclude: set[int] = set()
+    # The index may hold ids deleted through another worker; drop them and redraw.
+    for _ in range(3):
+        drawn = _draw_pairs(user_id, n - len(pairs), exclude)
+        if not drawn:
+            break
+        ids = {photo_id for pair in drawn for photo_id in pair}
+        rows = (
+            db.query(*PHOTO_OUT_COLUMNS, User.username)
+            .outerjoin(User, User.id == Photo.uploaded_by_user_id)
+            .filter(Photo.id.in_(ids), Photo.deleted_at.is_(None))
+            .all()
+        )
+        photos = {p["id"]: p for p in rows_to_dicts(names, rows)}
+        for photo_id in ids - photos.keys():
+            matchmaking.remove(photo_id)
+            leaderboard_index.remove(photo_id)
+        for a, b in drawn:
+            if a in photos and b in photos:
+                pairs.append({"photo_a": photos[a], "photo_b": photos[b]})
+        if len(pairs) == n:
+            break
+    return pairs
+
+
+@router.get("/my", response_model=list[PhotoOut], dependencies=[Depends(user_rate_limit("read"))])
 def my_photos(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    photos = db.query(Photo).filter(Photo.uploaded_by_user_id == current_user.id).all()
-    return [photo_to_out(p) for p in photos]
\ No newline at end of file
+    key = f"photos:{current_user.id}"
+    unchanged = not_modified(request, response, versions.etag(versions.current(key)))
+    if unchanged is not None:
+        return unchanged
+
+    rows = (
+        db.query(*PHOTO_OUT_COLUMNS)
+        .filter(Photo.uploaded_by_user_id == current_user.id, Photo.deleted_at.is_(None))
+        .all()
+    )
+    # Votes on these photos now bump this user's version
+    versions.track_photos(current_user.id, [r.id for r in rows])
+    photos = rows_to_dicts(PHOTO_OUT_NAMES, rows, {"uploader_username": current_user.username})
+    return FastJSONResponse(photos, headers=response.headers)
\ No newline at end of file
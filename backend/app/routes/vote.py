@@ -1,49 +1,188 @@
+import queue
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models.user import User
-from app.models.photo import Photo
-from app.models.vote import Vote
-from app.schemas import VoteCreate, VoteOut
+from app.config import settings
+from app.database import AnySession, get_db_session, run_db
+from app.models.vote_idempotency_key import VoteIdempotencyKey
+from app.schemas import VoteAck, VoteBatch, VoteBatchItem, VoteBatchOut, VoteBatchResult, VoteCreate, VoteOut
 from app.utils.auth import get_current_user
-from app.utils.elo import calculate_elo
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.rate_limit import Budget, rate_limiter, user_rate_limit
+from app.utils.rating_update import AppliedVote, apply_vote
+from app.utils.seen_pairs import seen_pairs
+from app.utils.user_cache import Principal
+from app.utils.versions import versions
+from app.utils.vote_abuse import THROTTLE, abuse_detector
+from app.utils.vote_queue import PendingVote, vote_writer
 
 router = APIRouter(prefix="/vote", tags=["vote"])
 
+vote_budget = Budget.parse(settings.RATE_LIMIT_VOTE)
+
+
+def _throttled() -> HTTPException:
+    return HTTPException(429, "Too many suspicious votes, slow down", headers={"Retry-After": "60"})
+
+
+def _apply_and_commit(db: Session, voter_id: int, winner_id: int, loser_id: int) -> Optional[AppliedVote]:
+    applied = apply_vote(db, voter_id, winner_id, loser_id)
+    if applied is None:
+        return None
+    # Observed only once the photos are known to exist, and before the commit
+    if abuse_detector.observe(voter_id, winner_id, loser_id) == THROTTLE:
+        db.rollback()
+        raise _throttled()
+    db.commit()
+    return applied
+
+
+def _record_in_memory(voter_id: int, applied: AppliedVote) -> None:
+    matchmaking.update(applied.winner_photo_id, applied.winner_elo)
+    matchmaking.update(applied.loser_photo_id, applied.loser_elo)
+    leaderboard_index.record_result(applied.winner_photo_id, applied.winner_elo, won=True)
+    leaderboard_index.record_result(applied.loser_photo_id, applied.loser_elo, won=False)
+    seen_pairs.add(voter_id, applied.winner_photo_id, applied.loser_photo_id)
+    versions.bump("leaderboard")
+    versions.bump_photos((applied.winner_photo_id, applied.loser_photo_id))
+
 
-@router.post("", response_model=VoteOut, status_code=201)
-def cast_vote(
+@router.post(
+    "",
+    response_model=VoteOut,
+    status_code=201,
+    dependencies=[Depends(user_rate_limit("vote", settings.RATE_LIMIT_VOTE))],
+)
+async def cast_vote(
     payload: VoteCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
 ):
     if payload.winner_photo_id == payload.loser_photo_id:
         raise HTTPException(400, "Winner and loser must be different photos")
 
-    winner = db.query(Photo).filter(Photo.id == payload.winner_photo_id).first()
-    loser = db.query(Photo).filter(Photo.id == payload.loser_photo_id).first()
+    if settings.VOTE_INGEST_MODE == "queued":
+        return await enqueue_vote(payload, db, current_user)
 
-    if not winner or not loser:
+    applied = await run_db(
+        db, _apply_and_commit, current_user.id, payload.winner_photo_id, payload.loser_photo_id
+    )
+    if applied is None:
         raise HTTPException(404, "One or both photos not found")
 
-    # Update ELO ratings
-    new_winner_elo, new_loser_elo = calculate_elo(winner.elo_rating, loser.elo_rating)
+    _record_in_memory(current_user.id, applied)
+    return applied
+
+
+def _apply_batch_once(
+    db: Session, voter_id: int, items: list[VoteBatchItem]
+) -> tuple[list[VoteBatchResult], list[AppliedVote]]:
+    keys = {item.idempotency_key for item in items if item.idempotency_key}
+    recorded = {}
+    if keys:
+        recorded = {
+            k.idempotency_key: k
+            for k in db.query(
+                VoteIdempotencyKey.vote_id.label("id"),
+                VoteIdempotencyKey.winner_photo_id,
+                VoteIdempotencyKey.loser_photo_id,
+                VoteIdempotencyKey.created_at,
+                VoteIdempotencyKey.idempotency_key,
+            ).filter(VoteIdempotencyKey.voter_user_id == voter_id, VoteIdempotencyKey.idempotency_key.in_(keys))
+        }
 
-    winner.elo_rating = new_winner_elo
-    winner.wins += 1
-    winner.total_votes += 1
+    results, applied = [], []
+    for index, item in enumerate(items):
+        key = item.idempotency_key
+        result = VoteBatchResult(index=index, status="applied", idempotency_key=key)
+        if key in recorded:
+            result.status = "duplicate"
+            result.vote = VoteOut.model_validate(recorded[key])
+        elif item.winner_photo_id == item.loser_photo_id:
+            result.status = "invalid"
+        else:
+            vote = apply_vote(db, voter_id, item.winner_photo_id, item.loser_photo_id, key)
+            if vote is None:
+                result.status = "not_found"
+            else:
+                result.vote = VoteOut.model_validate(vote)
+                applied.append(vote)
+                if key:
+                    recorded[key] = vote
+        results.append(result)
+    # Only applied votes are observed: duplicates, invalid and missing pairs are not
+    verdicts = [abuse_detector.observe(voter_id, v.winner_photo_id, v.loser_photo_id) for v in applied]
+    if THROTTLE in verdicts:
+        db.rollback()
+        raise _throttled()
+    db.commit()
+    return results, applied
+
+
+def _apply_batch(
+    db: Session, voter_id: int, items: list[VoteBatchItem]
+) -> tuple[list[VoteBatchResult], list[AppliedVote]]:
+    try:
+        return _apply_batch_once(db, voter_id, items)
+    except IntegrityError:
+        # A concurrent request with some of the same keys committed first;
+        # on the second pass those items come back as duplicates.
+        db.rollback()
+        return _apply_batch_once(db, voter_id, items)
+
+
+@router.post("/batch", response_model=VoteBatchOut)
+async def cast_votes(
+    payload: VoteBatch,
+    db: AnySession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Apply votes in order in one transaction, reporting a result per item.
 
-    loser.elo_rating = new_loser_elo
-    loser.losses += 1
-    loser.total_votes += 1
+    Items with an idempotency_key this user already sent are not applied
+    again; they report "duplicate" with the vote recorded the first time.
+    Keys live in vote_idempotency_keys, so this holds across vote
+    partitions and after the original vote's month has been archived.
+    Batches always write synchronously, whatever VOTE_INGEST_MODE is. If
+    the abuse detector throttles any applied item, the whole batch is
+    rolled back and gets a 429.
+    """
+    await rate_limiter.check(f"vote:{current_user.id}", vote_budget, cost=len(payload.votes))
+    results, applied = await run_db(db, _apply_batch, current_user.id, payload.votes)
+    for vote in applied:
+        _record_in_memory(current_user.id, vote)
+    return VoteBatchOut(results=results)
 
-    vote = Vote(
+
+async def enqueue_vote(payload: VoteCreate, db: AnySession, current_user: Principal) -> JSONResponse:
+    # Validate against the matchmaking index instead of the photos table;
+    # the writer drops votes whose photos disappear before the flush.
+    if matchmaking.needs_load():
+        await run_db(db, matchmaking.load_from_db)
+    if payload.winner_photo_id not in matchmaking or payload.loser_photo_id not in matchmaking:
+        raise HTTPException(404, "One or both photos not found")
+    if abuse_detector.observe(current_user.id, payload.winner_photo_id, payload.loser_photo_id) == THROTTLE:
+        raise _throttled()
+
+    pending = PendingVote(
         voter_user_id=current_user.id,
         winner_photo_id=payload.winner_photo_id,
         loser_photo_id=payload.loser_photo_id,
     )
-    db.add(vote)
-    db.commit()
-    db.refresh(vote)
-    return vote
\ No newline at end of file
+    try:
+        vote_writer.submit(pending)
+    except queue.Full:
+        raise HTTPException(503, "Vote queue is full, try again shortly", headers={"Retry-After": "1"})
+
+    seen_pairs.add(current_user.id, payload.winner_photo_id, payload.loser_photo_id)
+    ack = VoteAck(
+        winner_photo_id=pending.winner_photo_id,
+        loser_photo_id=pending.loser_photo_id,
+        queued_at=pending.created_at,
+    )
+    return JSONResponse(status_code=202, content=ack.model_dump(mode="json"))
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
 from datetime import datetime
 from typing import Optional
 
@@ -66,6 +66,32 @@ class VoteOut(BaseModel):
     created_at: datetime
 
 
+class VoteBatchItem(VoteCreate):
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=64)
+
+
+class VoteBatch(BaseModel):
+    votes: list[VoteBatchItem] = Field(min_length=1, max_length=50)
+
+
+class VoteBatchResult(BaseModel):
+    index: int
+    status: str  # "applied", "duplicate", "not_found" or "invalid"
+    idempotency_key: Optional[str] = None
+    vote: Optional[VoteOut] = None
+
+
+class VoteBatchOut(BaseModel):
+    results: list[VoteBatchResult]
+
+
+class VoteAck(BaseModel):
+    status: str = "queued"
+    winner_photo_id: int
+    loser_photo_id: int
+    queued_at: datetime
+
+
 # --- Leaderboard ---
 class LeaderboardEntry(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -77,4 +103,6 @@ class LeaderboardEntry(BaseModel):
     wins: int
     losses: int
     total_votes: int
+    # Glicko-2 rating deviation; null under the Elo engine
+    rating_deviation: Optional[float] = None
     uploader_username: str
\ No newline at end of file
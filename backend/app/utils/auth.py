@@ -1,16 +1,16 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import get_db
+from app.database import AnySession, get_db_session, open_db_session, run_db
 from app.models.user import User
+from app.utils.password_pool import pwd_context
+from app.utils.user_cache import Principal, user_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
@@ -31,31 +31,76 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    row = (
+        db.query(User.id, User.username, User.is_admin, User.is_banned)
+        .filter(User.id == user_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return Principal(
+        id=row.id,
+        username=row.username,
+        is_admin=bool(row.is_admin),
+        is_banned=bool(row.is_banned),
+    )
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _user_id_from_token(token: str) -> int:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
+        return int(user_id)
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+
+async def _authenticate(token: str, db: Optional[AnySession]) -> Principal:
+    user_id = _user_id_from_token(token)
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        version = user_cache.version
+        if db is None:
+            async with open_db_session() as session:
+                user = await run_db(session, _load_principal, user_id)
+        else:
+            user = await run_db(db, _load_principal, user_id)
+        if user is None:
+            raise _credentials_exception()
+        user_cache.put(user, version)
     if user.is_banned:
         raise HTTPException(status_code=403, detail="Account has been banned")
     return user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+# Async so that a cache hit costs no threadpool hop; a miss goes through run_db.
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AnySession = Depends(get_db_session)
+) -> Principal:
+    return await _authenticate(token, db)
+
+
+async def authenticate_token(token: str) -> Principal:
+    """get_current_user for WebSocket routes.
+
+    A session is opened only on a cache miss and closed straight away rather
+    than held for the life of the connection.
+    """
+    return await _authenticate(token, None)
+
+
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
\ No newline at end of file
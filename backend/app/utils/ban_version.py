@@ -0,0 +1,99 @@
+"""
+A ban counter shared by the workers, so a ban reaches every principal cache.
+ban/unban bump one integer kept next to the rate-limit buckets
+(RATE_LIMIT_BACKEND): a `versions` row in the SQLite file, or a Redis key.
+UserCache reads it on lookups, at most every USER_CACHE_BAN_CHECK_SECONDS,
+and empties itself when it has moved. Bans are rare, so one counter for
+all users is enough. With the memory backend the counter is per worker,
+like the buckets, and other workers wait for the cache TTL.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+
+from app.config import settings
+
+
+class MemoryCounter:
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self._value = 0
+
+    def current(self) -> int:
+        return self._value
+
+    def bump(self) -> None:
+        self._value = next(self._counter)
+
+
+class SQLiteCounter:
+    def __init__(self, path: str, key: str = "bans"):
+        self.path = os.path.abspath(path)
+        self.key = key
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS versions (key TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def current(self) -> int:
+        row = self._connect().execute("SELECT version FROM versions WHERE key = ?", (self.key,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self) -> None:
+        self._connect().execute(
+            "INSERT INTO versions (key, version) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET version = version + 1",
+            (self.key,),
+        )
+
+
+class RedisCounter:
+    def __init__(self, url: str, key: str = "versions:bans"):
+        import redis
+
+        self.key = key
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def current(self) -> int:
+        return int(self._client.get(self.key) or 0)
+
+    def bump(self) -> None:
+        self._client.incr(self.key)
+
+
+class BanVersion:
+    """The shared counter, opened on first use."""
+
+    def __init__(self):
+        self._counter = None
+        self._lock = threading.Lock()
+
+    @property
+    def counter(self):
+        with self._lock:
+            if self._counter is None:
+                if settings.RATE_LIMIT_BACKEND == "sqlite":
+                    self._counter = SQLiteCounter(settings.RATE_LIMIT_SQLITE_PATH)
+                elif settings.RATE_LIMIT_BACKEND == "redis":
+                    self._counter = RedisCounter(settings.RATE_LIMIT_REDIS_URL)
+                else:
+                    self._counter = MemoryCounter()
+            return self._counter
+
+    def current(self) -> int:
+        return self.counter.current()
+
+    def bump(self) -> None:
+        self.counter.bump()
+
+
+ban_version = BanVersion()
@@ -1,3 +1,5 @@
+from typing import BinaryIO, Union
+
 import cloudinary
 import cloudinary.uploader
 from app.config import settings
@@ -9,10 +11,10 @@ cloudinary.config(
 )
 
 
-def upload_image(file_bytes: bytes, filename: str) -> dict:
-    """Upload image to Cloudinary and return result dict with public_id and secure_url."""
+def upload_image(file: Union[bytes, BinaryIO], filename: str) -> dict:
+    """Upload image bytes or file object to Cloudinary and return public_id and secure_url."""
     result = cloudinary.uploader.upload(
-        file_bytes,
+        file,
         folder="srm-facerank",
         public_id=filename,
         overwrite=True,
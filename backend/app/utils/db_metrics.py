@@ -0,0 +1,89 @@
+"""
+Connection pool instrumentation.
+The pool classes below time every checkout, including the wait for a free
+connection when the pool is exhausted, and count checkout timeouts.
+Saturation is the share of size + max_overflow currently checked out.
+Each wait also goes into the db_pool_wait_seconds histogram, and /metrics
+reads the snapshot gauges (checked out, overflow, saturation) at scrape
+time, so pool exhaustion can be alerted on as well as inspected at
+GET /admin/db-pool.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.utils.metrics import LATENCY_BUCKETS, Histogram, registry
+
+POOL_WAIT_SECONDS = registry.register(Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection, per checkout.", LATENCY_BUCKETS, ("engine",),
+))
+
+
+class PoolStats:
+    def __init__(self, engine: str):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            if waited > self.wait_seconds_max:
+                self.wait_seconds_max = waited
+        POOL_WAIT_SECONDS.observe((self.engine,), waited)
+
+    def snapshot(self, pool) -> dict:
+        if not isinstance(pool, QueuePool):
+            return {"status": pool.status()}
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            # overflow() counts down from -pool_size while the pool fills
+            "overflow": max(pool.overflow(), 0),
+            "capacity": capacity,
+            "saturation": round(checked_out / capacity, 3) if capacity else None,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
+
+class _TimedCheckout:
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    stats = sync_pool_stats
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
@@ -0,0 +1,34 @@
+"""
+orjson responses for read-only listing routes.
+A route that returns a list of dicts without a response_model goes through
+jsonable_encoder, which walks every value in Python; with a response_model,
+each row is validated into a model and dumped back out. Both are per-row
+work that a listing does not need. Those routes instead select plain
+columns, zip each row tuple into a dict, and return a FastJSONResponse,
+which FastAPI sends as is.
+
+Output matches what the pydantic path produced: datetimes are ISO 8601,
+with a trailing "Z" for UTC.
+"""
+from typing import Any, Iterable, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(names: Sequence[str], rows: Iterable[tuple], extra: Optional[dict] = None) -> list[dict]:
+    """Zip column names onto row tuples, adding `extra` to every row."""
+    if extra:
+        return [{**dict(zip(names, row)), **extra} for row in rows]
+    return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,155 @@
+"""
+Live leaderboard push.
+Subscribers join a top-N window over a WebSocket. Windows are rounded up to
+a few fixed sizes, so subscribers share them. Once per tick the feed
+reads the top rows from the in-memory leaderboard index (no query) if
+its version changed. For each window it computes one diff against the
+previous tick and serialises it once. The same text is then queued to
+every subscriber of that window, so the cost per tick depends on the
+number of windows, not the number of clients.
+
+Messages:
+  {"type": "snapshot", "seq": n, "rows": [...]}
+  {"type": "diff", "seq": n, "order": [ids], "rows": [...]}
+Diff rows are only the photos that entered the window or whose rating or
+counters changed. "order" is the window's ids in rank order, sent only
+when the order changed, so a photo climbing ten places costs one row and
+an id list rather than ten re-ranked rows. A subscriber that falls behind
+has its backlog replaced by a fresh snapshot instead of buffering without
+bound.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import SessionLocal
+from app.utils.fast_json import dumps
+from app.utils.leaderboard_index import leaderboard_index
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (10, 25, 50, 100)
+
+
+def _encode(message: dict) -> str:
+    return dumps(message).decode()
+
+
+def _state(row: dict) -> tuple:
+    return row["elo_rating"], row["rating_deviation"], row["wins"], row["losses"], row["total_votes"]
+
+
+def diff_rows(old: list[dict], new: list[dict]) -> Optional[dict]:
+    """Changes from `old` to `new` as a diff message body, or None if equal."""
+    old_state = {r["id"]: _state(r) for r in old}
+    changed = [r for r in new if old_state.get(r["id"]) != _state(r)]
+    order = [r["id"] for r in new]
+    diff = {}
+    if order != list(old_state):
+        diff["order"] = order
+    if changed:
+        diff["rows"] = changed
+    return diff or None
+
+
+def _reload_index() -> None:
+    db = SessionLocal()
+    try:
+        leaderboard_index.load_from_db(db)
+    finally:
+        db.close()
+
+
+class LeaderboardFeed:
+    def __init__(self, tick_ms: int = 500, max_backlog: int = 8):
+        self.tick = tick_ms / 1000
+        self.max_backlog = max_backlog
+        self._groups: dict[int, set[asyncio.Queue]] = {w: set() for w in WINDOWS}
+        self._rows: list[dict] = []
+        self._version: Optional[int] = None
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def window_for(n: int) -> int:
+        for window in WINDOWS:
+            if n <= window:
+                return window
+        return WINDOWS[-1]
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._groups.values())
+
+    def subscribe(self, n: int) -> tuple[int, asyncio.Queue]:
+        """Join the window covering the top n; the queue starts with a snapshot."""
+        window = self.window_for(n)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_backlog)
+        queue.put_nowait(self._snapshot(window))
+        self._groups[window].add(queue)
+        return window, queue
+
+    def unsubscribe(self, window: int, queue: asyncio.Queue) -> None:
+        self._groups[window].discard(queue)
+
+    def _snapshot(self, window: int) -> str:
+        return _encode({"type": "snapshot", "seq": self._seq, "rows": self._rows[:window]})
+
+    # --- ticking ---
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="leaderboard-feed")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.step()
+            except Exception:
+                logger.exception("Leaderboard feed tick failed")
+
+    async def step(self) -> None:
+        """One tick: refresh the rows if the index changed and broadcast diffs."""
+        if self.subscriber_count() and leaderboard_index.needs_load():
+            # Picks up votes handled by other workers
+            await run_in_threadpool(_reload_index)
+        version = leaderboard_index.version
+        if version == self._version:
+            return
+        rows = leaderboard_index.page(0, WINDOWS[-1])
+        old_rows, self._rows, self._version = self._rows, rows, version
+        self._seq += 1
+
+        for window, queues in self._groups.items():
+            if not queues:
+                continue
+            diff = diff_rows(old_rows[:window], rows[:window])
+            if diff is None:
+                continue
+            message = _encode({"type": "diff", "seq": self._seq, **diff})
+            snapshot = None
+            for queue in queues:
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Too far behind for diffs to be useful; start it over
+                    if snapshot is None:
+                        snapshot = self._snapshot(window)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(snapshot)
+
+
+leaderboard_feed = LeaderboardFeed(tick_ms=settings.LIVE_LEADERBOARD_TICK_MS)
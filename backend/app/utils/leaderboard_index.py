@@ -0,0 +1,206 @@
+"""
+In-memory leaderboard.
+Photos with at least one vote are kept in a list of (-elo_rating, id) keys
+in sorted order, so top-N and arbitrary pages are slices and the rank of a
+photo is one bisect. Votes move a photo by deleting and re-inserting its
+key instead of re-sorting the table. Photo metadata (image url, uploader
+name, counters) is kept alongside so pages are served without a query.
+
+Each worker keeps its own copy: it is loaded at startup, updated by the
+votes, uploads and deletes this worker handles, and reloaded every
+`refresh_seconds` to pick up the rest.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+DEFAULT_RATING = 1000.0
+
+
+class _Entry:
+    __slots__ = (
+        "id", "image_url", "uploader_username", "elo_rating", "wins", "losses", "total_votes", "rating_deviation",
+    )
+
+    def __init__(self, id, image_url, uploader_username, elo_rating, wins, losses, total_votes,
+                 rating_deviation=None):
+        self.id = id
+        self.image_url = image_url
+        self.uploader_username = uploader_username or "unknown"
+        self.elo_rating = DEFAULT_RATING if elo_rating is None else float(elo_rating)
+        self.wins = wins or 0
+        self.losses = losses or 0
+        self.total_votes = total_votes or 0
+        self.rating_deviation = rating_deviation
+
+    @property
+    def key(self) -> tuple[float, int]:
+        return (-self.elo_rating, self.id)
+
+    def as_dict(self, rank: int) -> dict:
+        return {
+            "rank": rank,
+            "id": self.id,
+            "image_url": self.image_url,
+            "elo_rating": self.elo_rating,
+            "wins": self.wins,
+            "losses": self.losses,
+            "total_votes": self.total_votes,
+            "rating_deviation": self.rating_deviation,
+            "uploader_username": self.uploader_username,
+        }
+
+
+class LeaderboardIndex:
+    def __init__(self, refresh_seconds: int = 60):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[int, _Entry] = {}
+        self._keys: list[tuple[float, int]] = []
+        self._loaded_at: Optional[float] = None
+        # Bumped on every change to the ranking; lets readers skip unchanged ticks
+        self.version = 0
+
+    def __len__(self) -> int:
+        """Number of ranked photos."""
+        return len(self._keys)
+
+    # --- loading ---
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Replace the contents with (id, image_url, uploader_username, elo_rating,
+        wins, losses, total_votes[, rating_deviation]) rows."""
+        entries = {r[0]: _Entry(*r) for r in rows}
+        keys = sorted(e.key for e in entries.values() if e.total_votes > 0)
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+            self.version += 1
+
+    def load_from_db(self, db: Session) -> None:
+        from app.models.photo import Photo
+        from app.models.user import User
+
+        rows = (
+            db.query(
+                Photo.id, Photo.image_url, User.username, Photo.elo_rating,
+                Photo.wins, Photo.losses, Photo.total_votes, Photo.rating_deviation,
+            )
+            .outerjoin(User, User.id == Photo.uploaded_by_user_id)
+            .filter(Photo.deleted_at.is_(None))
+            .all()
+        )
+        self.load(rows)
+
+    def needs_load(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or (
+            self.refresh_seconds > 0 and time.monotonic() - loaded_at > self.refresh_seconds
+        )
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self.needs_load():
+            self.load_from_db(db)
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    # --- incremental updates ---
+
+    def _unrank(self, entry: _Entry) -> None:
+        if entry.total_votes > 0:
+            i = bisect_left(self._keys, entry.key)
+            if i < len(self._keys) and self._keys[i] == entry.key:
+                del self._keys[i]
+
+    def _rank(self, entry: _Entry) -> None:
+        if entry.total_votes > 0:
+            insort(self._keys, entry.key)
+
+    def add_photo(self, photo_id: int, image_url: str, uploader_username: Optional[str],
+                  elo_rating: Optional[float] = None) -> None:
+        with self._lock:
+            if self._loaded_at is None or photo_id in self._entries:
+                return
+            self._entries[photo_id] = _Entry(photo_id, image_url, uploader_username, elo_rating, 0, 0, 0)
+
+    def remove(self, photo_id: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(photo_id, None)
+            if entry is not None:
+                self._unrank(entry)
+                self.version += 1
+
+    def update(self, photo_id: int, elo_rating: float, wins: int, losses: int, total_votes: int) -> None:
+        """Set a photo's rating and counters to absolute values."""
+        with self._lock:
+            entry = self._entries.get(photo_id)
+            if entry is None:
+                # Uploaded through another worker; pick it up on the next load.
+                self._loaded_at = None
+                return
+            self._unrank(entry)
+            entry.elo_rating = float(elo_rating)
+            entry.wins, entry.losses, entry.total_votes = wins, losses, total_votes
+            self._rank(entry)
+            self.version += 1
+
+    def set_rating(self, photo_id: int, elo_rating: float, rating_deviation: Optional[float]) -> None:
+        """Set a photo's rating and deviation, leaving the counters (a closed rating period)."""
+        with self._lock:
+            entry = self._entries.get(photo_id)
+            if entry is None:
+                self._loaded_at = None
+                return
+            self._unrank(entry)
+            entry.elo_rating = float(elo_rating)
+            entry.rating_deviation = rating_deviation
+            self._rank(entry)
+            self.version += 1
+
+    def record_result(self, photo_id: int, elo_rating: float, won: bool) -> None:
+        """Apply one vote: set the new rating and bump the counters."""
+        with self._lock:
+            entry = self._entries.get(photo_id)
+            if entry is None:
+                self._loaded_at = None
+                return
+            self._unrank(entry)
+            entry.elo_rating = float(elo_rating)
+            if won:
+                entry.wins += 1
+            else:
+                entry.losses += 1
+            entry.total_votes += 1
+            self._rank(entry)
+            self.version += 1
+
+    # --- queries ---
+
+    def page(self, offset: int, limit: int) -> list[dict]:
+        with self._lock:
+            keys = self._keys[offset:offset + limit]
+            return [self._entries[k[1]].as_dict(rank) for rank, k in enumerate(keys, start=offset + 1)]
+
+    def page_after(self, elo_rating: float, photo_id: int, rank: int, limit: int) -> list[dict]:
+        """Rows ranked after the (elo_rating, photo_id) key; `rank` is that row's rank."""
+        with self._lock:
+            start = bisect_left(self._keys, (-elo_rating, photo_id + 1))
+            keys = self._keys[start:start + limit]
+            return [self._entries[k[1]].as_dict(r) for r, k in enumerate(keys, start=rank + 1)]
+
+    def rank_of(self, photo_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(photo_id)
+            if entry is None or entry.total_votes == 0:
+                return None
+            return entry.as_dict(bisect_left(self._keys, entry.key) + 1)
+
+
+leaderboard_index = LeaderboardIndex(refresh_seconds=settings.LEADERBOARD_REFRESH_SECONDS)
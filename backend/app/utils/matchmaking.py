@@ -0,0 +1,183 @@
+"""
+Matchmaking index for /photos/random-pair.
+Keeps photo ids and ratings in flat arrays so a pair can be drawn without
+asking Postgres to sort the whole photos table on every swipe.
+
+random mode: two uniform picks from a dense id array, O(1).
+nearby mode: the first photo is uniform, the opponent is drawn from the
+`window` photos on either side of it in rating order, O(log n).
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+DEFAULT_RATING = 1000.0
+
+
+class MatchmakingIndex:
+    def __init__(self, mode: str = "random", window: int = 10, refresh_seconds: int = 300):
+        self.mode = mode
+        self.window = max(1, window)
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # Dense array for uniform sampling; removal swaps the last slot in.
+        self._ids = array("q")
+        self._slot: dict[int, int] = {}
+        self._rating: dict[int, float] = {}
+        # Parallel arrays ordered by (rating, id) for nearby sampling.
+        self._sorted_ratings = array("d")
+        self._sorted_ids = array("q")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, photo_id: int) -> bool:
+        return photo_id in self._slot
+
+    # --- loading ---
+
+    def load(self, rows: Iterable[tuple[int, Optional[float]]]) -> None:
+        """Replace the index contents with (photo_id, elo_rating) rows."""
+        with self._lock:
+            self._reset()
+            pairs = sorted(
+                ((DEFAULT_RATING if r is None else float(r)), int(pid)) for pid, r in rows
+            )
+            for rating, pid in pairs:
+                self._slot[pid] = len(self._ids)
+                self._ids.append(pid)
+                self._rating[pid] = rating
+                self._sorted_ratings.append(rating)
+                self._sorted_ids.append(pid)
+            self._loaded_at = time.monotonic()
+
+    def load_from_db(self, db: Session) -> None:
+        from app.models.photo import Photo
+
+        self.load(
+            db.query(Photo.id, Photo.elo_rating)
+            .filter(Photo.duplicate_of_id.is_(None), Photo.deleted_at.is_(None))
+            .all()
+        )
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Load on first use and reload once the snapshot is older than refresh_seconds.
+
+        Each worker keeps its own index, so the periodic reload is what picks up
+        uploads, deletes and rating changes made by other workers.
+        """
+        if self.needs_load():
+            self.load_from_db(db)
+
+    def needs_load(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or (
+            self.refresh_seconds > 0 and time.monotonic() - loaded_at > self.refresh_seconds
+        )
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    # --- incremental updates ---
+
+    def _tie_block(self, rating: float) -> tuple[int, int]:
+        """Bounds of the run of entries with this rating; ties are ordered by id."""
+        return bisect_left(self._sorted_ratings, rating), bisect_right(self._sorted_ratings, rating)
+
+    def _sorted_pos(self, photo_id: int, rating: float) -> Optional[int]:
+        # Unvoted photos all sit at DEFAULT_RATING, so the tie block can be
+        # most of the catalog: bisect on id inside it rather than scanning
+        lo, hi = self._tie_block(rating)
+        i = bisect_left(self._sorted_ids, photo_id, lo, hi)
+        if i < hi and self._sorted_ids[i] == photo_id:
+            return i
+        return None
+
+    def _sorted_insert(self, photo_id: int, rating: float) -> None:
+        lo, hi = self._tie_block(rating)
+        i = bisect_left(self._sorted_ids, photo_id, lo, hi)
+        self._sorted_ratings.insert(i, rating)
+        self._sorted_ids.insert(i, photo_id)
+
+    def _sorted_remove(self, photo_id: int, rating: float) -> None:
+        i = self._sorted_pos(photo_id, rating)
+        if i is not None:
+            del self._sorted_ratings[i]
+            del self._sorted_ids[i]
+
+    def add(self, photo_id: int, rating: Optional[float] = None) -> None:
+        rating = DEFAULT_RATING if rating is None else float(rating)
+        with self._lock:
+            if self._loaded_at is None or photo_id in self._slot:
+                return
+            self._slot[photo_id] = len(self._ids)
+            self._ids.append(photo_id)
+            self._rating[photo_id] = rating
+            self._sorted_insert(photo_id, rating)
+
+    def remove(self, photo_id: int) -> None:
+        with self._lock:
+            slot = self._slot.pop(photo_id, None)
+            if slot is None:
+                return
+            last = self._ids.pop()
+            if last != photo_id:
+                self._ids[slot] = last
+                self._slot[last] = slot
+            self._sorted_remove(photo_id, self._rating.pop(photo_id))
+
+    def update(self, photo_id: int, rating: float) -> None:
+        rating = float(rating)
+        with self._lock:
+            old = self._rating.get(photo_id)
+            if old is None or old == rating:
+                return
+            self._sorted_remove(photo_id, old)
+            self._rating[photo_id] = rating
+            self._sorted_insert(photo_id, rating)
+
+    # --- sampling ---
+
+    def sample_pair(self, mode: Optional[str] = None) -> Optional[tuple[int, int]]:
+        """Return two distinct photo ids, or None if fewer than two are indexed."""
+        mode = mode or self.mode
+        with self._lock:
+            n = len(self._ids)
+            if n < 2:
+                return None
+            if mode == "nearby":
+                first = self._ids[random.randrange(n)]
+                i = self._sorted_pos(first, self._rating[first])
+                if i is None:
+                    # Out of step with the dense array; fall back to a uniform pick
+                    i = random.randrange(n)
+                lo = max(0, i - self.window)
+                hi = min(n - 1, i + self.window)
+                j = random.randint(lo, hi - 1)
+                if j >= i:
+                    j += 1
+                return first, self._sorted_ids[j]
+
+            a = random.randrange(n)
+            b = random.randrange(n - 1)
+            if b >= a:
+                b += 1
+            return self._ids[a], self._ids[b]
+
+
+matchmaking = MatchmakingIndex(
+    mode=settings.MATCHMAKING_MODE,
+    window=settings.MATCHMAKING_WINDOW,
+    refresh_seconds=settings.MATCHMAKING_REFRESH_SECONDS,
+)
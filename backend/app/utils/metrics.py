@@ -0,0 +1,243 @@
+"""
+Request instrumentation and the Prometheus exposition behind /metrics.
+
+RequestMetricsMiddleware times every HTTP request. Each request is
+labelled with its route template, e.g. "/leaderboard/rank/{photo_id}", so
+label values stay bounded; requests that match no route are labelled
+"unmatched". While a request runs, a contextvar holds its stats. The
+engine hooks installed by instrument_engine count every query and its DB
+time against that request. The contextvar follows the request into
+threadpool calls and AsyncSession greenlets. Queries from background
+threads (the vote writer, the purger) are labelled with the thread name.
+
+A query slower than SLOW_QUERY_MS is logged with its route and statement.
+
+Metrics are kept per worker process, like the other in-memory state, so
+scrape each worker's port.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in items:
+            running = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                running += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {running}")
+        return lines
+
+
+def format_metric(name: str, help: str, kind: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """Exposition lines for a metric read at scrape time."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """Add a callable returning ready-made exposition lines, read at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", LATENCY_BUCKETS, ("method", "route"),
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "SQL queries run per HTTP request.", QUERY_COUNT_BUCKETS, ("method", "route"),
+))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL queries per HTTP request.", LATENCY_BUCKETS, ("method", "route"),
+))
+QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL query latency by route or background thread.", LATENCY_BUCKETS, ("route",),
+))
+SLOW_QUERIES = registry.register(Counter(
+    "db_slow_queries_total", "Queries slower than SLOW_QUERY_MS.", ("route",),
+))
+
+
+@dataclass
+class RequestStats:
+    scope: Scope
+    queries: int = 0
+    db_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def route_of(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# --- SQLAlchemy hooks ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        route = route_of(stats.scope)
+    else:
+        route = threading.current_thread().name
+    QUERY_SECONDS.observe((route,), elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc((route,))
+        logger.warning(
+            "Slow query (%.0f ms) on %s: %s", elapsed * 1000, route, " ".join(statement.split())[:1000]
+        )
+
+
+def _handle_error(context) -> None:
+    # A failed statement never reaches after_cursor_execute
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every query run through this (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# --- middleware ---
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            labels = (scope["method"], route_of(scope))
+            REQUESTS.inc((*labels, str(status)))
+            REQUEST_SECONDS.observe(labels, time.perf_counter() - stats.started)
+            REQUEST_QUERIES.observe(labels, stats.queries)
+            REQUEST_DB_SECONDS.observe(labels, stats.db_seconds)
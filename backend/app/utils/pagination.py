@@ -0,0 +1,27 @@
+"""
+Opaque keyset cursors for the leaderboard.
+A cursor carries the (elo_rating, id) of the last row on a page plus that
+row's rank, so the next page is "rows after this key" instead of an OFFSET
+and ranks keep counting without a COUNT(*).
+"""
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+def encode_cursor(elo_rating: float, photo_id: int, rank: int) -> str:
+    raw = json.dumps([elo_rating, photo_id, rank], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[float, int, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        elo_rating, photo_id, rank = json.loads(raw)
+        return float(elo_rating), int(photo_id), int(rank)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
@@ -0,0 +1,106 @@
+"""
+Password hashing off the request threads.
+bcrypt runs in a dedicated process pool of HASH_POOL_WORKERS processes, so a
+burst of logins uses those cores instead of every FastAPI worker thread.
+At most HASH_MAX_PENDING hash/verify jobs may be queued or running; past
+that, callers get a 503 with Retry-After instead of waiting.
+
+The bcrypt cost is BCRYPT_ROUNDS. Hashes made with any other cost report
+needs_rehash, and login re-hashes them with the password it just verified.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.config import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+class PasswordPool:
+    def __init__(self, workers: int = 2, max_pending: int = 16, retry_after: int = 1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: the app process runs threads, which fork does not copy safely
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Authentication is busy, try again shortly",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password, hashed)
+
+    @staticmethod
+    def needs_rehash(hashed: str) -> bool:
+        return pwd_context.needs_update(hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_pool = PasswordPool(
+    workers=settings.HASH_POOL_WORKERS,
+    max_pending=settings.HASH_MAX_PENDING,
+)
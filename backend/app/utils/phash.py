@@ -0,0 +1,168 @@
+"""
+Perceptual hashing and near-duplicate lookup for uploads.
+
+dhash: the image is reduced to 9x8 grayscale and each bit records whether a
+pixel is brighter than its right neighbour, giving a 64-bit hash that
+survives re-encoding, resizing and small edits. Two photos are treated as
+duplicates when their hashes differ in at most PHASH_MAX_DISTANCE bits.
+
+Lookups use multi-index hashing: the hash is split into four 16-bit
+chunks, each with its own table. If two hashes are within distance r, at
+least one chunk is within r // 4 (pigeonhole principle), so probing each
+table with every chunk value at that distance finds all candidates. Each
+candidate is then checked with a full popcount.
+"""
+import io
+import threading
+import time
+from itertools import combinations
+from typing import BinaryIO, Optional, Union
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def dhash(data: Union[bytes, BinaryIO]) -> int:
+    """64-bit difference hash of an encoded image. Raises ValueError if it cannot be decoded."""
+    if isinstance(data, bytes):
+        data = io.BytesIO(data)
+    try:
+        with Image.open(data) as img:
+            img.draft("L", (64, 64))  # let JPEG decode at reduced size
+            small = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    except Exception as e:
+        raise ValueError("Could not decode image") from e
+    px = small.tobytes()
+    value = 0
+    for row in range(8):
+        base = row * 9
+        for col in range(8):
+            value = (value << 1) | (px[base + col] > px[base + col + 1])
+    return value
+
+
+def to_signed(value: int) -> int:
+    """Unsigned 64-bit hash to the signed value stored in a BIGINT column."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _neighbours(chunk: int, radius: int):
+    """All 16-bit values within `radius` bits of chunk."""
+    yield chunk
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            flipped = chunk
+            for b in bits:
+                flipped ^= 1 << b
+            yield flipped
+
+
+class PhashIndex:
+    def __init__(self, max_distance: int = 6, refresh_seconds: int = 300):
+        self.max_distance = max_distance
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._hashes: dict[int, int] = {}
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(CHUNKS)]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @staticmethod
+    def _chunks(value: int):
+        for i in range(CHUNKS):
+            yield i, (value >> (i * CHUNK_BITS)) & CHUNK_MASK
+
+    def _add(self, photo_id: int, value: int) -> None:
+        self._hashes[photo_id] = value
+        for i, chunk in self._chunks(value):
+            self._tables[i].setdefault(chunk, set()).add(photo_id)
+
+    def load(self, rows) -> None:
+        """Replace the index with (photo_id, signed phash) rows."""
+        with self._lock:
+            self._reset()
+            for photo_id, value in rows:
+                if value is not None:
+                    self._add(photo_id, to_unsigned(value))
+            self._loaded_at = time.monotonic()
+
+    def load_from_db(self, db: Session) -> None:
+        from app.models.photo import Photo
+
+        self.load(
+            db.query(Photo.id, Photo.phash)
+            .filter(
+                Photo.phash.isnot(None),
+                Photo.duplicate_of_id.is_(None),
+                Photo.deleted_at.is_(None),
+            )
+            .all()
+        )
+
+    def ensure_loaded(self, db: Session) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is None or (
+            self.refresh_seconds > 0 and time.monotonic() - loaded_at > self.refresh_seconds
+        ):
+            self.load_from_db(db)
+
+    def add(self, photo_id: int, value: int) -> None:
+        with self._lock:
+            if self._loaded_at is not None:
+                self._add(photo_id, to_unsigned(value))
+
+    def remove(self, photo_id: int) -> None:
+        with self._lock:
+            value = self._hashes.pop(photo_id, None)
+            if value is None:
+                return
+            for i, chunk in self._chunks(value):
+                bucket = self._tables[i].get(chunk)
+                if bucket is not None:
+                    bucket.discard(photo_id)
+                    if not bucket:
+                        del self._tables[i][chunk]
+
+    def nearest(self, value: int, max_distance: Optional[int] = None) -> Optional[tuple[int, int]]:
+        """Closest indexed photo within max_distance as (photo_id, distance), or None."""
+        value = to_unsigned(value)
+        radius = self.max_distance if max_distance is None else max_distance
+        best: Optional[tuple[int, int]] = None
+        with self._lock:
+            seen: set[int] = set()
+            for i, chunk in self._chunks(value):
+                table = self._tables[i]
+                for probe in _neighbours(chunk, radius // CHUNKS):
+                    for photo_id in table.get(probe, ()):
+                        if photo_id in seen:
+                            continue
+                        seen.add(photo_id)
+                        d = hamming(value, self._hashes[photo_id])
+                        if d <= radius and (best is None or d < best[1]):
+                            best = (photo_id, d)
+        return best
+
+
+phash_index = PhashIndex(
+    max_distance=settings.PHASH_MAX_DISTANCE,
+    refresh_seconds=settings.PHASH_REFRESH_SECONDS,
+)
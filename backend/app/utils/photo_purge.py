@@ -0,0 +1,173 @@
+"""
+Background purge of soft-deleted photos.
+Deleting a photo only sets deleted_at, which hides it from pairing, voting
+and the leaderboard straight away. This worker then removes the photo's
+votes and their idempotency keys in bounded batches, one short transaction each, so no request waits
+on a scan of the votes table and no transaction stays open for long. The
+stored file and the photo row go last, in one transaction, so a failed
+storage call leaves the row for the next pass to retry.
+
+Every worker process runs a purger. Each of those transactions first
+claims the photo row with FOR UPDATE SKIP LOCKED, and a purger that finds
+the row claimed moves on to the next photo. That way two processes never
+delete the same batch or file. SQLite ignores the clause and serialises
+the writers instead.
+"""
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import delete, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.vote import Vote
+from app.models.vote_idempotency_key import VoteIdempotencyKey
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.phash import phash_index
+from app.utils.storage import storage
+from app.utils.versions import versions
+
+logger = logging.getLogger(__name__)
+
+
+def soft_delete_photo(db: Session, photo: Photo) -> None:
+    """Hide a photo everywhere now and leave the cleanup to the purge worker."""
+    photo_id, owner_id = photo.id, photo.uploaded_by_user_id
+    photo.deleted_at = func.now()
+    db.commit()
+    matchmaking.remove(photo_id)
+    leaderboard_index.remove(photo_id)
+    phash_index.remove(photo_id)
+    versions.bump("leaderboard", f"photos:{owner_id}")
+    versions.forget_photo(photo_id)
+
+
+def claim(db: Session, photo_id: int) -> bool:
+    """Lock the soft-deleted photo row for this transaction. False if another purger has it or it is gone."""
+    return db.execute(
+        select(Photo.id)
+        .where(Photo.id == photo_id, Photo.deleted_at.isnot(None))
+        .with_for_update(skip_locked=True)
+    ).first() is not None
+
+
+def purge_votes(db: Session, photo_id: int, batch_size: int) -> Optional[int]:
+    """Delete one batch of the photo's votes and commit. Returns rows deleted, or None if not claimed."""
+    if not claim(db, photo_id):
+        db.rollback()
+        return None
+    batch = (
+        select(Vote.id)
+        .where(or_(Vote.winner_photo_id == photo_id, Vote.loser_photo_id == photo_id))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    deleted = db.execute(delete(Vote).where(Vote.id.in_(batch))).rowcount
+    db.commit()
+    return deleted
+
+
+def purge_idempotency_keys(db: Session, photo_id: int, batch_size: int) -> Optional[int]:
+    """Delete one batch of the idempotency keys of the photo's votes, as purge_votes does for the votes."""
+    if not claim(db, photo_id):
+        db.rollback()
+        return None
+    key = VoteIdempotencyKey
+    keys = db.execute(
+        select(key.voter_user_id, key.idempotency_key)
+        .where(or_(key.winner_photo_id == photo_id, key.loser_photo_id == photo_id))
+        .limit(batch_size)
+    ).all()
+    if keys:
+        db.execute(delete(key).where(tuple_(key.voter_user_id, key.idempotency_key).in_(keys)))
+    db.commit()
+    return len(keys)
+
+
+class PhotoPurger:
+    def __init__(self, interval_seconds: int = 30, batch_size: int = 5000, photos_per_pass: int = 50):
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.photos_per_pass = photos_per_pass
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="photo-purger", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.purge_pending()
+            except Exception:
+                logger.exception("Photo purge pass failed")
+
+    def purge_pending(self) -> int:
+        """Purge up to photos_per_pass soft-deleted photos. Returns how many were removed."""
+        db = SessionLocal()
+        try:
+            pending = db.execute(
+                select(Photo.id, Photo.cloudinary_public_id)
+                .where(Photo.deleted_at.isnot(None))
+                .order_by(Photo.deleted_at)
+                .limit(self.photos_per_pass)
+            ).all()
+            db.rollback()  # end the read transaction before any network call
+
+            purged = 0
+            for photo_id, public_id in pending:
+                if self._stop.is_set():
+                    break
+                if self.purge_photo(db, photo_id, public_id):
+                    purged += 1
+            return purged
+        finally:
+            db.close()
+
+    def purge_photo(self, db: Session, photo_id: int, public_id: str) -> bool:
+        for purge in (purge_votes, purge_idempotency_keys):
+            while True:
+                deleted = purge(db, photo_id, self.batch_size)
+                if deleted is None or self._stop.is_set():
+                    return False
+                if deleted < self.batch_size:
+                    break
+
+        # Another purger may have finished the photo in between
+        if not claim(db, photo_id):
+            db.rollback()
+            return False
+        try:
+            storage.delete(public_id)
+        except Exception:
+            db.rollback()
+            logger.exception("Could not delete stored file for photo %d, will retry", photo_id)
+            return False
+
+        db.execute(delete(Photo).where(Photo.id == photo_id))
+        db.commit()
+        return True
+
+
+photo_purger = PhotoPurger(
+    interval_seconds=settings.PURGE_INTERVAL_SECONDS,
+    batch_size=settings.PURGE_BATCH_SIZE,
+)
@@ -0,0 +1,68 @@
+"""
+Opt-in sampling profiler for single requests.
+With PROFILE_TOKEN set, a request that sends "X-Profile: <PROFILE_TOKEN>"
+runs under pyinstrument, sampling every PROFILE_INTERVAL_MS. The HTML
+report is rendered and written to PROFILE_DIR on the threadpool, and its
+file name is returned in the X-Profile-Report header. Other requests pass
+straight through and pyinstrument is only imported when a profile is taken.
+
+pyinstrument follows the request's own task across awaits. Work handed to
+the threadpool (sync routes, run_db) shows up as the await that ran it.
+"""
+import hmac
+import logging
+import os
+import re
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, token: str, directory: str, interval_ms: float = 1.0):
+        self.app = app
+        self.token = token.encode()
+        self.directory = directory
+        self.interval = interval_ms / 1000
+
+    def _requested(self, scope: Scope) -> bool:
+        if not self.token or scope["type"] != "http":
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        report = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{slug}-{time.monotonic_ns() % 10**6}.html"
+
+        async def send_with_report(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-report", report.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_report)
+        finally:
+            profiler.stop()
+            path = os.path.join(self.directory, report)
+            # Rendering and writing the report would otherwise stall the event loop
+            await run_in_threadpool(self._write_report, profiler, path)
+            logger.info("Profiled %s %s to %s", scope["method"], scope["path"], path)
+
+    def _write_report(self, profiler, path: str) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
@@ -0,0 +1,254 @@
+"""
+Per-user token buckets shared by every worker.
+
+A budget such as "60/minute" is a bucket holding up to 60 tokens that
+refills at one token per second; each request takes one (a vote batch
+takes one per vote). Buckets are
+keyed on "<scope>:<user id>" (or client address for the unauthenticated
+auth routes), so votes and uploads draw from separate budgets and
+students behind the same campus NAT do not throttle one another.
+
+Stores:
+  sqlite  one UPSERT ... RETURNING per check against a file shared by the
+          workers on one host (the default)
+  redis   one EVALSHA of a Lua script, for multi-host deployments
+  memory  per-process dict; only correct with a single worker, and a
+          warning is logged when WEB_CONCURRENCY says there are more
+
+Every check is a single atomic operation on one key. The store is opened
+on the first check, so nothing is created while rate limiting is off.
+Buckets that have refilled to their burst are the same as no bucket, and
+the memory and SQLite stores drop them every PRUNE_SECONDS; Redis keys
+expire on their own.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.utils.auth import get_current_user
+from app.utils.user_cache import Principal
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+PRUNE_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class Budget:
+    rate: float  # tokens per second
+    burst: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Budget":
+        """Parse "<count>/<second|minute|hour|day>"."""
+        count, _, period = spec.partition("/")
+        seconds = PERIODS.get(period.strip().rstrip("s"))
+        if seconds is None or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid rate limit {spec!r}")
+        return cls(rate=int(count) / seconds, burst=int(count))
+
+
+class MemoryStore:
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (tokens, ts, time the bucket is full again)
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._pruned_at = 0.0
+
+    def take(self, key: str, budget: Budget, now: float, cost: int = 1) -> tuple[bool, float]:
+        """Take `cost` tokens; returns (allowed, tokens left)."""
+        with self._lock:
+            if now - self._pruned_at >= PRUNE_SECONDS:
+                self._prune(now)
+            tokens, ts, _ = self._buckets.get(key, (budget.burst, now, now))
+            tokens = min(budget.burst, tokens + max(0.0, now - ts) * budget.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (budget.burst - tokens) / budget.rate)
+            return allowed, tokens
+
+    def _prune(self, now: float) -> None:
+        self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+        self._pruned_at = now
+
+
+class SQLiteStore:
+    blocking = True
+
+    # SET expressions all see the row as it was before the update, so the
+    # refill is computed from the old tokens and ts. full_at is when the
+    # bucket is back at its burst and the row can be pruned.
+    REFILLED = "min(:burst, tokens + max(0, :now - ts) * :rate)"
+    TAKEN = f"{REFILLED} - :cost * ({REFILLED} >= :cost)"
+    TAKE_SQL = f"""
+        INSERT INTO buckets (key, tokens, ts, allowed, full_at)
+        VALUES (:key, :burst - :cost * (:burst >= :cost), :now, :burst >= :cost,
+                :now + :cost * (:burst >= :cost) / :rate)
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = {REFILLED} >= :cost,
+            tokens = {TAKEN},
+            full_at = :now + (:burst - ({TAKEN})) / :rate,
+            ts = :now
+        RETURNING allowed, tokens
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self._pruned_at = 0.0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL, allowed INTEGER NOT NULL, "
+            "full_at REAL"
+            ") WITHOUT ROWID"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(buckets)")]
+        if "full_at" not in columns:
+            # Files from before pruning; their rows get full_at on the next take
+            conn.execute("ALTER TABLE buckets ADD COLUMN full_at REAL")
+        logger.info("Rate limit buckets in %s", self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: each UPSERT is its own transaction
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, budget: Budget, now: float, cost: int = 1) -> tuple[bool, float]:
+        conn = self._connect()
+        if now - self._pruned_at >= PRUNE_SECONDS:
+            # Every worker prunes; a row deleted under another worker's take
+            # was a full bucket, which the INSERT branch recreates as one
+            self._pruned_at = now
+            conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+        allowed, tokens = conn.execute(
+            self.TAKE_SQL,
+            {"key": key, "burst": budget.burst, "rate": budget.rate, "now": now, "cost": cost},
+        ).fetchone()
+        return bool(allowed), tokens
+
+
+class RedisStore:
+    blocking = True
+
+    TAKE_LUA = """
+        local rate = tonumber(ARGV[1])
+        local burst = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local cost = tonumber(ARGV[4])
+        local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(b[1]) or burst
+        local ts = tonumber(b[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._script = self._client.register_script(self.TAKE_LUA)
+
+    def take(self, key: str, budget: Budget, now: float, cost: int = 1) -> tuple[bool, float]:
+        allowed, tokens = self._script(
+            keys=[self.prefix + key], args=[budget.rate, budget.burst, now, cost]
+        )
+        return bool(allowed), float(tokens)
+
+
+def get_store():
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteStore(settings.RATE_LIMIT_SQLITE_PATH)
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisStore(settings.RATE_LIMIT_REDIS_URL)
+    workers = os.environ.get("WEB_CONCURRENCY", "1")
+    if settings.RATE_LIMIT_ENABLED and workers.isdigit() and int(workers) > 1:
+        logger.warning(
+            "RATE_LIMIT_BACKEND=memory with %s workers: each worker keeps its own buckets, "
+            "so clients get %sx the configured limits", workers, workers,
+        )
+    return MemoryStore()
+
+
+class RateLimiter:
+    def __init__(self, store_factory: Callable = get_store, enabled: bool = True):
+        self.store_factory = store_factory
+        self.enabled = enabled
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = self.store_factory()
+        return self._store
+
+    async def check(self, key: str, budget: Budget, cost: int = 1) -> None:
+        """Take `cost` tokens for key or raise 429 with Retry-After."""
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            store = self.store
+            if store.blocking:
+                allowed, tokens = await run_in_threadpool(store.take, key, budget, now, cost)
+            else:
+                allowed, tokens = store.take(key, budget, now, cost)
+        except Exception:
+            # An unreachable store should not take the API down with it
+            logger.exception("Rate limit store failed, allowing %s", key)
+            return
+        if not allowed:
+            retry_after = max(1, math.ceil((min(cost, budget.burst) - tokens) / budget.rate))
+            raise HTTPException(
+                429, "Rate limit exceeded, slow down", headers={"Retry-After": str(retry_after)}
+            )
+
+
+rate_limiter = RateLimiter(get_store, enabled=settings.RATE_LIMIT_ENABLED)
+
+
+def user_rate_limit(scope: str, spec: Optional[str] = None):
+    """Route dependency charging the authenticated user's `scope` bucket."""
+    budget = Budget.parse(spec or settings.RATE_LIMIT_DEFAULT)
+
+    async def dependency(current_user: Principal = Depends(get_current_user)) -> None:
+        await rate_limiter.check(f"{scope}:{current_user.id}", budget)
+
+    return dependency
+
+
+def ip_rate_limit(scope: str, spec: Optional[str] = None):
+    """Route dependency for unauthenticated routes, keyed on the client address."""
+    budget = Budget.parse(spec or settings.RATE_LIMIT_DEFAULT)
+
+    async def dependency(request: Request) -> None:
+        host = request.client.host if request.client else "unknown"
+        await rate_limiter.check(f"{scope}:ip:{host}", budget)
+
+    return dependency
@@ -0,0 +1,161 @@
+"""
+Rating engines.
+RATING_ENGINE picks how votes move photo ratings:
+
+  elo      both photos move on every vote (K = 32), in the vote's own
+           transaction
+  glicko2  a vote only records the result and the win/loss counters; the
+           rating period worker (app/utils/rating_periods.py) rates all
+           votes since the previous period at once
+
+Both engines write the rating to photos.elo_rating, so the leaderboard,
+its keyset index and nearby matchmaking work unchanged. Glicko-2 also
+keeps a rating deviation and a volatility per photo. A new photo starts
+with a deviation of GLICKO_INITIAL_RD and moves a long way on its first
+few periods; as evidence builds up the deviation shrinks and so do the
+moves. Elo leaves those columns NULL.
+
+Glicko-2 ratings use Glickman's internal scale: mu = (r - 1000) / 173.7178,
+phi = RD / 173.7178. The center is this app's starting rating, 1000,
+instead of 1500. A period is rated with array operations over every photo
+that played in it, including the iterative volatility solve.
+"""
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+from app.utils.elo import K_FACTOR, calculate_elo
+
+RATING_CENTER = 1000.0
+GLICKO_SCALE = 173.7178
+VOLATILITY_EPSILON = 1e-6
+MAX_ITERATIONS = 100
+
+
+class EloEngine:
+    name = "elo"
+    # Ratings move per vote; no rating periods
+    periodic = False
+    vote_k_factor = K_FACTOR
+
+    def rate_pair(self, winner_rating: float, loser_rating: float) -> tuple[float, float]:
+        return calculate_elo(winner_rating, loser_rating)
+
+
+def _g(phi: np.ndarray) -> np.ndarray:
+    return 1 / np.sqrt(1 + 3 * phi ** 2 / np.pi ** 2)
+
+
+class Glicko2Engine:
+    name = "glicko2"
+    periodic = True
+    # The per-vote update is the identity: ratings only move per period
+    vote_k_factor = 0.0
+
+    def __init__(self, tau: float = 0.5, initial_rd: float = 350.0, initial_volatility: float = 0.06):
+        self.tau = tau
+        self.initial_rd = initial_rd
+        self.initial_volatility = initial_volatility
+
+    def rate_pair(self, winner_rating: float, loser_rating: float) -> tuple[float, float]:
+        return winner_rating, loser_rating
+
+    def _new_volatility(self, phi2: np.ndarray, v: np.ndarray, delta: np.ndarray, sigma: np.ndarray) -> np.ndarray:
+        """Step 5 of Glickman's algorithm: the Illinois solve, run for every photo at once."""
+        tau2 = self.tau ** 2
+        a = np.log(sigma ** 2)
+        d2 = delta ** 2
+
+        def f(x: np.ndarray) -> np.ndarray:
+            ex = np.exp(x)
+            return ex * (d2 - phi2 - v - ex) / (2 * (phi2 + v + ex) ** 2) - (x - a) / tau2
+
+        A = a.copy()
+        big = d2 > phi2 + v
+        B = np.where(big, np.log(np.where(big, d2 - phi2 - v, 1.0)), a - self.tau)
+        # Where delta is small, step B down until f(B) >= 0
+        pending = ~big & (f(B) < 0)
+        for _ in range(MAX_ITERATIONS):
+            if not pending.any():
+                break
+            B = np.where(pending, B - self.tau, B)
+            pending &= f(B) < 0
+
+        fA, fB = f(A), f(B)
+        active = np.abs(B - A) > VOLATILITY_EPSILON
+        for _ in range(MAX_ITERATIONS):
+            if not active.any():
+                break
+            C = A + (A - B) * fA / (fB - fA)
+            fC = f(C)
+            flip = active & (fC * fB <= 0)
+            A = np.where(flip, B, A)
+            fA = np.where(flip, fB, np.where(active, fA / 2, fA))
+            B = np.where(active, C, B)
+            fB = np.where(active, fC, fB)
+            active &= np.abs(B - A) > VOLATILITY_EPSILON
+        return np.exp(A / 2)
+
+    def rate_period(
+        self,
+        rating: np.ndarray,
+        rd: np.ndarray,
+        volatility: np.ndarray,
+        winners: np.ndarray,
+        losers: np.ndarray,
+        idle_periods: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rate one period. Photos are array slots; winners/losers index them, one entry per vote.
+
+        idle_periods counts the periods each photo sat out since it was last
+        rated; its deviation grows by one volatility step per idle period,
+        capped at the initial deviation. Returns new (rating, rd, volatility).
+        """
+        n = len(rating)
+        mu = (rating - RATING_CENTER) / GLICKO_SCALE
+        phi = rd / GLICKO_SCALE
+        if idle_periods is not None:
+            phi = np.minimum(np.sqrt(phi ** 2 + idle_periods * volatility ** 2), self.initial_rd / GLICKO_SCALE)
+
+        # Every vote is a game for both photos: a 1 for the winner, a 0 for the loser
+        player = np.concatenate([winners, losers])
+        opponent = np.concatenate([losers, winners])
+        score = np.concatenate([np.ones(len(winners)), np.zeros(len(losers))])
+
+        g = _g(phi[opponent])
+        expected = 1 / (1 + np.exp(-g * (mu[player] - mu[opponent])))
+        info = np.bincount(player, weights=g ** 2 * expected * (1 - expected), minlength=n)
+        improvement = np.bincount(player, weights=g * (score - expected), minlength=n)
+
+        # Photos without a game this period keep rating and volatility; only phi grows
+        played = info > 0
+        new_volatility = volatility.copy()
+        if played.any():
+            v = 1 / info[played]
+            new_volatility[played] = self._new_volatility(
+                phi[played] ** 2, v, v * improvement[played], volatility[played]
+            )
+        phi_star = np.sqrt(phi ** 2 + new_volatility ** 2)
+        new_phi = 1 / np.sqrt(1 / phi_star ** 2 + info)
+        new_mu = np.where(played, mu + new_phi ** 2 * improvement, mu)
+        return (
+            np.round(new_mu * GLICKO_SCALE + RATING_CENTER, 2),
+            new_phi * GLICKO_SCALE,
+            new_volatility,
+        )
+
+
+def get_engine(name: str):
+    if name == "elo":
+        return EloEngine()
+    if name == "glicko2":
+        return Glicko2Engine(
+            tau=settings.GLICKO_TAU,
+            initial_rd=settings.GLICKO_INITIAL_RD,
+            initial_volatility=settings.GLICKO_INITIAL_VOLATILITY,
+        )
+    raise ValueError(f"Unknown RATING_ENGINE {name!r}, expected 'elo' or 'glicko2'")
+
+
+rating_engine = get_engine(settings.RATING_ENGINE)
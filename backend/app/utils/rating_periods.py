@@ -0,0 +1,205 @@
+"""
+Glicko-2 rating periods.
+With RATING_ENGINE=glicko2 votes only move the win/loss counters. Every
+GLICKO_PERIOD_SECONDS this worker closes a period: it takes the votes
+cast since the previous period, rates every photo that played in them at
+once (app/utils/rating_engine.py) and writes the new rating, deviation
+and volatility back in one bulk update.
+
+A period's votes end at the highest vote id seen on the worker's previous
+tick, not the current one. Vote ids are assigned before the vote commits,
+so a lower id can still be in flight when a higher one is visible; one
+tick of grace lets those land before the range is closed.
+
+Periods are numbered rows in rating_periods, and a worker claims the next
+period by inserting its row in the same transaction that writes the
+ratings. With several workers running, the one that loses the insert rolls
+back and waits for its next tick. The first period after switching engines
+only records a baseline: votes before it are already in the Elo ratings,
+which become the starting ratings with the initial deviation.
+"""
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.rating_period import RatingPeriod
+from app.models.vote import Vote
+from app.utils.leaderboard_index import DEFAULT_RATING, leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.rating_engine import rating_engine
+from app.utils.versions import versions
+
+logger = logging.getLogger(__name__)
+
+# Photo ids per IN list when loading and locking photo rows
+PHOTO_BATCH_SIZE = 5000
+
+
+def _claim(db: Session, period: RatingPeriod) -> bool:
+    db.add(period)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Another worker closed this period first
+        db.rollback()
+        return False
+    return True
+
+
+def _load_photos(db: Session, photo_ids: np.ndarray) -> list[tuple]:
+    """Lock and read the rating state of live photos, in id order like the vote paths."""
+    rows = []
+    for start in range(0, len(photo_ids), PHOTO_BATCH_SIZE):
+        part = photo_ids[start:start + PHOTO_BATCH_SIZE].tolist()
+        rows += db.execute(
+            select(Photo.id, Photo.elo_rating, Photo.rating_deviation, Photo.volatility, Photo.rating_period)
+            .where(Photo.id.in_(part), Photo.deleted_at.is_(None))
+            .order_by(Photo.id)
+            .with_for_update()
+        ).all()
+    return rows
+
+
+def process_period(db: Session, horizon: int, max_votes: int) -> int:
+    """Close one period over votes up to id `horizon`. Returns the number of votes rated."""
+    latest = db.execute(
+        select(RatingPeriod.id, RatingPeriod.last_vote_id).order_by(RatingPeriod.id.desc()).limit(1)
+    ).first()
+    if latest is None:
+        if _claim(db, RatingPeriod(id=0, last_vote_id=horizon, votes=0, photos=0)):
+            db.commit()
+        return 0
+
+    votes = db.execute(
+        select(Vote.id, Vote.winner_photo_id, Vote.loser_photo_id)
+        .where(Vote.id > latest.last_vote_id, Vote.id <= horizon)
+        .order_by(Vote.id)
+        .limit(max_votes)
+    ).all()
+    if not votes:
+        db.rollback()
+        return 0
+
+    period_id = latest.id + 1
+    games = np.array(votes, dtype=np.int64)
+    period = RatingPeriod(id=period_id, last_vote_id=int(games[-1, 0]), votes=len(games), photos=0)
+    if not _claim(db, period):
+        return 0
+
+    rows = _load_photos(db, np.unique(games[:, 1:]))
+    photo_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    n = len(photo_ids)
+    if n:
+        w = np.searchsorted(photo_ids, games[:, 1])
+        l = np.searchsorted(photo_ids, games[:, 2])
+        # Drop votes whose photo was deleted in the meantime
+        keep = (
+            (w < n) & (photo_ids[np.minimum(w, n - 1)] == games[:, 1])
+            & (l < n) & (photo_ids[np.minimum(l, n - 1)] == games[:, 2])
+        )
+        w, l = w[keep], l[keep]
+    else:
+        w = l = np.zeros(0, dtype=np.int64)
+
+    rated = []
+    if len(w):
+        rating = np.array([DEFAULT_RATING if r[1] is None else r[1] for r in rows], dtype=np.float64)
+        rd = np.array([rating_engine.initial_rd if r[2] is None else r[2] for r in rows], dtype=np.float64)
+        volatility = np.array(
+            [rating_engine.initial_volatility if r[3] is None else r[3] for r in rows], dtype=np.float64
+        )
+        idle = np.array([0 if r[4] is None else max(0, period_id - r[4] - 1) for r in rows], dtype=np.float64)
+        new_rating, new_rd, new_volatility = rating_engine.rate_period(rating, rd, volatility, w, l, idle)
+
+        played = np.flatnonzero(np.bincount(np.concatenate([w, l]), minlength=n))
+        rated = [
+            {
+                "id": int(photo_ids[i]),
+                "elo_rating": float(new_rating[i]),
+                "rating_deviation": float(new_rd[i]),
+                "volatility": float(new_volatility[i]),
+                "rating_period": period_id,
+            }
+            for i in played
+        ]
+        db.execute(update(Photo), rated)
+    period.photos = len(rated)
+    db.commit()
+
+    for r in rated:
+        matchmaking.update(r["id"], r["elo_rating"])
+        leaderboard_index.set_rating(r["id"], r["elo_rating"], r["rating_deviation"])
+    if rated:
+        versions.bump("leaderboard")
+        versions.bump_photos(r["id"] for r in rated)
+    logger.info("Rating period %d: %d votes, %d photos", period_id, len(games), len(rated))
+    return len(games)
+
+
+class RatingPeriodWorker:
+    def __init__(self, interval_seconds: int = 300, max_votes: int = 200000):
+        self.interval = interval_seconds
+        self.max_votes = max_votes
+        self._horizon: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rating-periods", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Rating period failed")
+            if self._stop.wait(self.interval):
+                return
+
+    def tick(self) -> int:
+        """Close the periods due on this tick. Returns the number of votes rated."""
+        db = SessionLocal()
+        try:
+            horizon = self._horizon
+            self._horizon = db.execute(select(func.max(Vote.id))).scalar() or 0
+            db.rollback()
+            if horizon is None:
+                return 0
+            rated = 0
+            # A backlog larger than max_votes is closed as several periods
+            while not self._stop.is_set():
+                count = process_period(db, horizon, self.max_votes)
+                rated += count
+                if count < self.max_votes:
+                    break
+            return rated
+        finally:
+            db.close()
+
+
+rating_period_worker = RatingPeriodWorker(
+    interval_seconds=settings.GLICKO_PERIOD_SECONDS,
+    max_votes=settings.GLICKO_PERIOD_MAX_VOTES,
+)
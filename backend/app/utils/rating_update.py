@@ -0,0 +1,162 @@
+"""
+Atomic vote application.
+On Postgres a vote is one statement: a CTE locks both photo rows in id
+order (so opposite-order pairs cannot deadlock), computes the ELO update
+from the freshly locked ratings, updates both rows with their win/loss
+counters and inserts the vote. Locks are held only for the duration of
+that statement, never across a client round trip, so concurrent votes on
+the same photos cannot overwrite each other.
+Other dialects (SQLite in local runs) fall back to the ORM path, which
+relies on the database serializing writers.
+A vote sent with an idempotency key also records the key in
+vote_idempotency_keys; a key already there fails the whole statement with
+an IntegrityError, which the batch route turns into "duplicate".
+Under the Glicko-2 engine K is 0: the vote only moves the counters and
+the rating period worker rates it later.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.photo import Photo
+from app.models.vote import Vote
+from app.models.vote_idempotency_key import VoteIdempotencyKey
+from app.utils.rating_engine import rating_engine
+
+APPLY_VOTE_SQL = text("""
+WITH locked AS (
+    SELECT id, COALESCE(elo_rating, 1000.0) AS elo_rating
+    FROM photos
+    WHERE id IN (:winner_id, :loser_id) AND deleted_at IS NULL
+    ORDER BY id
+    FOR UPDATE
+), pair AS (
+    SELECT
+        w.elo_rating AS winner_elo,
+        l.elo_rating AS loser_elo,
+        1 / (1 + power(10, (l.elo_rating - w.elo_rating) / 400)) AS winner_expected,
+        1 / (1 + power(10, (w.elo_rating - l.elo_rating) / 400)) AS loser_expected
+    FROM locked w, locked l
+    WHERE w.id = :winner_id AND l.id = :loser_id
+), upd AS (
+    UPDATE photos p SET
+        elo_rating = CASE WHEN p.id = :winner_id
+            THEN round((pair.winner_elo + :k * (1 - pair.winner_expected))::numeric, 2)
+            ELSE round((pair.loser_elo + :k * (0 - pair.loser_expected))::numeric, 2)
+        END,
+        wins = COALESCE(p.wins, 0) + (p.id = :winner_id)::int,
+        losses = COALESCE(p.losses, 0) + (p.id = :loser_id)::int,
+        total_votes = COALESCE(p.total_votes, 0) + 1
+    FROM pair
+    WHERE p.id IN (:winner_id, :loser_id)
+    RETURNING p.id, p.elo_rating
+), ins AS (
+    INSERT INTO votes (voter_user_id, winner_photo_id, loser_photo_id, idempotency_key)
+    SELECT :voter_id, :winner_id, :loser_id, :idempotency_key
+    WHERE EXISTS (SELECT 1 FROM pair)
+    RETURNING id, created_at
+), idempotency AS (
+    INSERT INTO vote_idempotency_keys
+        (voter_user_id, idempotency_key, vote_id, winner_photo_id, loser_photo_id, created_at)
+    SELECT :voter_id, :idempotency_key, ins.id, :winner_id, :loser_id, ins.created_at
+    FROM ins
+    WHERE CAST(:idempotency_key AS varchar) IS NOT NULL
+)
+SELECT
+    ins.id,
+    ins.created_at,
+    (SELECT elo_rating FROM upd WHERE id = :winner_id) AS winner_elo,
+    (SELECT elo_rating FROM upd WHERE id = :loser_id) AS loser_elo
+FROM ins
+""")
+
+
+@dataclass
+class AppliedVote:
+    id: int
+    winner_photo_id: int
+    loser_photo_id: int
+    created_at: datetime
+    winner_elo: float
+    loser_elo: float
+
+
+def apply_vote(
+    db: Session, voter_id: int, winner_id: int, loser_id: int, idempotency_key: Optional[str] = None
+) -> Optional[AppliedVote]:
+    """
+    Record a vote and update both photos. Returns None if either photo is
+    missing or deleted. The caller commits.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        row = db.execute(
+            APPLY_VOTE_SQL,
+            {
+                "voter_id": voter_id,
+                "winner_id": winner_id,
+                "loser_id": loser_id,
+                "idempotency_key": idempotency_key,
+                "k": rating_engine.vote_k_factor,
+            },
+        ).first()
+        if row is None:
+            return None
+        return AppliedVote(
+            id=row.id,
+            winner_photo_id=winner_id,
+            loser_photo_id=loser_id,
+            created_at=row.created_at,
+            winner_elo=float(row.winner_elo),
+            loser_elo=float(row.loser_elo),
+        )
+    return _apply_vote_orm(db, voter_id, winner_id, loser_id, idempotency_key)
+
+
+def _apply_vote_orm(
+    db: Session, voter_id: int, winner_id: int, loser_id: int, idempotency_key: Optional[str]
+) -> Optional[AppliedVote]:
+    winner = db.query(Photo).filter(Photo.id == winner_id, Photo.deleted_at.is_(None)).first()
+    loser = db.query(Photo).filter(Photo.id == loser_id, Photo.deleted_at.is_(None)).first()
+    if not winner or not loser:
+        return None
+
+    new_winner_elo, new_loser_elo = rating_engine.rate_pair(winner.elo_rating, loser.elo_rating)
+
+    winner.elo_rating = new_winner_elo
+    winner.wins += 1
+    winner.total_votes += 1
+
+    loser.elo_rating = new_loser_elo
+    loser.losses += 1
+    loser.total_votes += 1
+
+    vote = Vote(
+        voter_user_id=voter_id,
+        winner_photo_id=winner_id,
+        loser_photo_id=loser_id,
+        idempotency_key=idempotency_key,
+    )
+    db.add(vote)
+    db.flush()
+    db.refresh(vote, ["created_at"])
+    if idempotency_key is not None:
+        db.add(VoteIdempotencyKey(
+            voter_user_id=voter_id,
+            idempotency_key=idempotency_key,
+            vote_id=vote.id,
+            winner_photo_id=winner_id,
+            loser_photo_id=loser_id,
+            created_at=vote.created_at,
+        ))
+        db.flush()
+    return AppliedVote(
+        id=vote.id,
+        winner_photo_id=winner_id,
+        loser_photo_id=loser_id,
+        created_at=vote.created_at,
+        winner_elo=new_winner_elo,
+        loser_elo=new_loser_elo,
+    )
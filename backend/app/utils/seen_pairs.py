@@ -0,0 +1,168 @@
+"""
+Per-user "already seen" pair filter.
+Each voter gets a small bloom filter over unordered photo-id pairs, so
+pair selection can skip matchups the user has already voted on without
+querying the votes table.
+
+A filter holds two generations of `bits` bits. When the current one has
+taken `bits // 8` pairs (about 2% false positives at 4 hashes) it becomes
+the previous generation and a fresh one starts, so old matchups slowly
+become eligible again instead of the filter saturating.
+Users are kept in an LRU capped at `max_users` and dropped after
+`idle_seconds` without activity. Nothing is loaded at startup: a user's
+filter is built from their latest votes the first time they ask for a
+pair (ensure_user), and votes by users not in memory are not recorded,
+since that load will read them back from the votes table.
+
+A worker only records the votes it handles itself, so a filter is
+reloaded from the votes table once it is `ttl_seconds` old. That picks up
+the votes the user cast through other workers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+NUM_HASHES = 4
+_MASK64 = (1 << 64) - 1
+
+
+def pair_key(photo_a: int, photo_b: int) -> int:
+    """64-bit key for an unordered pair."""
+    lo, hi = (photo_a, photo_b) if photo_a < photo_b else (photo_b, photo_a)
+    return ((lo & 0xFFFFFFFF) << 32) | (hi & 0xFFFFFFFF)
+
+
+def _hashes(key: int) -> tuple[int, int]:
+    h1 = (key * 0x9E3779B97F4A7C15) & _MASK64
+    h1 ^= h1 >> 31
+    h2 = ((key ^ 0xD6E8FEB86659FD93) * 0xBF58476D1CE4E5B9) & _MASK64
+    h2 ^= h2 >> 29
+    return h1, h2 | 1
+
+
+class _UserFilter:
+    __slots__ = ("current", "previous", "count", "touched", "loaded_at")
+
+    def __init__(self, nbytes: int):
+        self.current = bytearray(nbytes)
+        self.previous: Optional[bytearray] = None
+        self.count = 0
+        self.touched = self.loaded_at = time.monotonic()
+
+
+class SeenPairs:
+    def __init__(self, max_users: int = 20000, bits: int = 4096, idle_seconds: int = 3600, ttl_seconds: int = 300):
+        self.max_users = max_users
+        self.bits = max(64, bits - bits % 8)
+        self.idle_seconds = idle_seconds
+        self.ttl_seconds = ttl_seconds
+        self._capacity = self.bits // 8
+        self._users: OrderedDict[int, _UserFilter] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _positions(self, key: int):
+        h1, h2 = _hashes(key)
+        for i in range(NUM_HASHES):
+            yield ((h1 + i * h2) & _MASK64) % self.bits
+
+    @staticmethod
+    def _test(bits: bytearray, positions) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def _get(self, user_id: int) -> Optional[_UserFilter]:
+        f = self._users.get(user_id)
+        if f is None:
+            return None
+        now = time.monotonic()
+        idle = self.idle_seconds > 0 and now - f.touched > self.idle_seconds
+        stale = self.ttl_seconds > 0 and now - f.loaded_at > self.ttl_seconds
+        if idle or stale:
+            del self._users[user_id]
+            return None
+        f.touched = now
+        self._users.move_to_end(user_id)
+        return f
+
+    def _create(self, user_id: int) -> _UserFilter:
+        f = _UserFilter(self.bits // 8)
+        self._users[user_id] = f
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return f
+
+    def _add(self, f: _UserFilter, key: int) -> None:
+        if f.count >= self._capacity:
+            f.previous = f.current
+            f.current = bytearray(self.bits // 8)
+            f.count = 0
+        for p in self._positions(key):
+            f.current[p >> 3] |= 1 << (p & 7)
+        f.count += 1
+
+    # --- public API ---
+
+    def is_loaded(self, user_id: int) -> bool:
+        with self._lock:
+            return self._get(user_id) is not None
+
+    def seen(self, user_id: int, photo_a: int, photo_b: int) -> bool:
+        with self._lock:
+            f = self._get(user_id)
+            if f is None:
+                return False
+            positions = list(self._positions(pair_key(photo_a, photo_b)))
+            if self._test(f.current, positions):
+                return True
+            return f.previous is not None and self._test(f.previous, positions)
+
+    def add(self, user_id: int, photo_a: int, photo_b: int) -> None:
+        with self._lock:
+            f = self._get(user_id)
+            # An empty filter created here would pass for loaded history
+            if f is not None:
+                self._add(f, pair_key(photo_a, photo_b))
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    # --- loading from the votes table ---
+
+    def ensure_user(self, db: Session, user_id: int) -> None:
+        """Load a user's voting history if it is not in memory or is past the TTL."""
+        if self.is_loaded(user_id):
+            return
+        from app.models.vote import Vote
+
+        rows = (
+            db.query(Vote.winner_photo_id, Vote.loser_photo_id)
+            .filter(Vote.voter_user_id == user_id)
+            .order_by(Vote.id.desc())
+            .limit(self._capacity * 2)
+            .all()
+        )
+        with self._lock:
+            f = self._create(user_id)
+            # Oldest first so the newest pairs land in the current generation.
+            for winner_id, loser_id in reversed(rows):
+                self._add(f, pair_key(winner_id, loser_id))
+
+
+seen_pairs = SeenPairs(
+    max_users=settings.SEEN_PAIRS_MAX_USERS,
+    bits=settings.SEEN_PAIRS_BITS,
+    idle_seconds=settings.SEEN_PAIRS_IDLE_SECONDS,
+    ttl_seconds=settings.SEEN_PAIRS_TTL_SECONDS,
+)
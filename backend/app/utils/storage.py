@@ -0,0 +1,112 @@
+"""
+Photo storage backends.
+STORAGE_BACKEND selects where uploads go:
+- "cloudinary": the Cloudinary account from settings (default)
+- "local": files under LOCAL_STORAGE_DIR, served at /media by the app
+
+Backends are synchronous; async callers use asave/adelete, which run them
+in the threadpool so a slow upload never blocks the event loop.
+"""
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def save(self, fileobj: BinaryIO, name: str, content_type: str) -> dict:
+        """Store the file and return {"public_id": ..., "url": ...}."""
+
+    @abstractmethod
+    def delete(self, public_id: str) -> None:
+        """Remove a stored file."""
+
+    @abstractmethod
+    def read(self, public_id: str, url: str) -> bytes:
+        """Fetch a stored file's bytes."""
+
+    async def asave(self, fileobj: BinaryIO, name: str, content_type: str) -> dict:
+        return await run_in_threadpool(self.save, fileobj, name, content_type)
+
+    async def adelete(self, public_id: str) -> None:
+        await run_in_threadpool(self.delete, public_id)
+
+
+class CloudinaryStorage(StorageBackend):
+    def save(self, fileobj: BinaryIO, name: str, content_type: str) -> dict:
+        from app.utils.cloudinary_helper import upload_image
+
+        return upload_image(fileobj, name)
+
+    def delete(self, public_id: str) -> None:
+        from app.utils.cloudinary_helper import delete_image
+
+        delete_image(public_id)
+
+    def read(self, public_id: str, url: str) -> bytes:
+        import httpx
+
+        response = httpx.get(url, timeout=30, follow_redirects=True)
+        response.raise_for_status()
+        return response.content
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str, base_url: str):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, public_id: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, public_id))
+        if os.path.dirname(path) != self.root:
+            raise ValueError(f"Invalid public_id: {public_id}")
+        return path
+
+    def save(self, fileobj: BinaryIO, name: str, content_type: str) -> dict:
+        public_id = name + EXTENSIONS.get(content_type, "")
+        path = self.path(public_id)
+        # Write to a temp file first so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return {"public_id": public_id, "url": f"{self.base_url}/{public_id}"}
+
+    def delete(self, public_id: str) -> None:
+        try:
+            os.unlink(self.path(public_id))
+        except FileNotFoundError:
+            pass
+
+    def read(self, public_id: str, url: str) -> bytes:
+        with open(self.path(public_id), "rb") as f:
+            return f.read()
+
+
+def get_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_URL)
+    return CloudinaryStorage()
+
+
+storage = get_storage()
@@ -0,0 +1,116 @@
+"""
+Token-to-user cache for get_current_user.
+Holds the minimal principal an authenticated request needs, keyed by user
+id, in an LRU bounded by `max_size` with a `ttl_seconds` expiry.
+ban/unban invalidate the entry in the worker that handled them and bump
+the shared ban version (app/utils/ban_version.py). Every other worker
+compares that version on lookups, at most every `check_seconds`, and clears
+its cache when it has moved. A principal loaded before the move is not
+cached after it.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+from app.utils.ban_version import ban_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    is_admin: bool
+    is_banned: bool
+
+
+class UserCache:
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 30, versions=None, check_seconds: float = 1.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.versions = versions
+        self.check_seconds = check_seconds
+        self.version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._data: OrderedDict[int, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        self._check_version()
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[user_id]
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return item[1]
+
+    def _check_version(self) -> None:
+        """Re-read the shared ban version if due; clear the cache if it moved."""
+        now = time.monotonic()
+        if self.versions is None or now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            version = self.versions.current()
+        except Exception:
+            # Fall back to the TTL rather than failing authentication
+            logger.exception("Could not read the shared ban version")
+            return
+        if version != self.version:
+            with self._lock:
+                self.version = version
+                self._data.clear()
+
+    def put(self, principal: Principal, version: Optional[int] = None) -> None:
+        """Cache `principal`, unless the ban version has moved past `version` since it was loaded."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._data[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._data.move_to_end(principal.id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    versions=ban_version,
+    check_seconds=settings.USER_CACHE_BAN_CHECK_SECONDS,
+)
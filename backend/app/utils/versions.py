@@ -0,0 +1,100 @@
+"""
+Version counters for conditional GETs.
+Each cacheable resource has a key ("leaderboard", "photos:<user id>",
+"user:<user id>") whose version is bumped by the writes that change it:
+votes, uploads, deletes and bans. A GET sends the version as its ETag and
+answers a matching If-None-Match with 304 before running any query.
+
+Versions come from one process-wide counter and the ETag carries a
+per-process epoch, so a tag issued by another worker, or before a key was
+evicted, never matches. Writes are only seen by the worker that handled
+them; other workers expire a key's version after `ttl_seconds` and issue a
+new one, so as with the user cache, keep the TTL short.
+
+A vote changes the ratings shown in its photos' owners' /photos/my. Owners
+are learned when /photos/my is served, which is the only way a client can
+hold a tag for that list from this worker.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+
+class VersionCounters:
+    def __init__(self, max_keys: int = 100000, ttl_seconds: int = 30):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.epoch = f"{os.getpid():x}.{time.time_ns():x}"
+        self._counter = itertools.count(1)
+        self._versions: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self._owners: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def current(self, key: str) -> int:
+        with self._lock:
+            item = self._versions.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                self._versions.move_to_end(key)
+                return item[1]
+            return self._issue(key)
+
+    def bump(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._issue(key)
+
+    def _issue(self, key: str) -> int:
+        version = next(self._counter)
+        self._versions[key] = (time.monotonic() + self.ttl_seconds, version)
+        self._versions.move_to_end(key)
+        while len(self._versions) > self.max_keys:
+            self._versions.popitem(last=False)
+        return version
+
+    # --- photo owners ---
+
+    def track_photos(self, user_id: int, photo_ids: Iterable[int]) -> None:
+        with self._lock:
+            for photo_id in photo_ids:
+                self._owners[photo_id] = user_id
+
+    def forget_photo(self, photo_id: int) -> None:
+        with self._lock:
+            self._owners.pop(photo_id, None)
+
+    def bump_photos(self, photo_ids: Iterable[int]) -> None:
+        """Bump the /photos/my version of each known owner of these photos."""
+        with self._lock:
+            owners = {self._owners.get(pid) for pid in photo_ids}
+            owners.discard(None)
+            for user_id in owners:
+                self._issue(f"photos:{user_id}")
+
+    def etag(self, *versions: int) -> str:
+        return 'W/"%s-%s"' % (self.epoch, "-".join(map(str, versions)))
+
+
+versions = VersionCounters(
+    max_keys=settings.ETAG_MAX_KEYS,
+    ttl_seconds=settings.ETAG_TTL_SECONDS,
+)
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the validators on `response`; return a 304 if the client's copy is current."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,232 @@
+"""
+Streaming vote-abuse detector.
+POST /vote and /vote/batch feed every vote through observe() once its
+photos are known to exist and before it is committed; identical or
+missing pairs never reach the detector. Each voter keeps a ring buffer of
+their last `window` votes, together with counts of the winners and of the
+unordered pairs in it. Adding a vote evicts the oldest one and adjusts the
+counts, so a vote costs O(1) and a voter O(window) memory. Three signals
+come out of the window:
+
+  rate           votes per minute across the window
+  winner share   fraction of the window won by the photo this vote picks
+  repeat share   fraction of the window that repeats a pair already in it
+
+Each signal is divided by its limit (ABUSE_MAX_VOTES_PER_MINUTE and so
+on), and the voter's score is the largest of the three, so 1.0 means one
+limit is reached. Nothing is judged before `min_votes` votes. At a score
+of 1.0 a vote is flagged: it is counted and the voter shows up in
+GET /admin/suspicious-voters. With ABUSE_DETECTION=throttle, a score of
+ABUSE_THROTTLE_SCORE or more also rejects the vote with 429. Rejected
+attempts stay in the window, so a bot stays throttled until it slows down.
+
+Voters are kept in an LRU capped at `max_voters` and dropped after
+`idle_seconds` without a vote. State is per worker, like seen_pairs, and
+nothing is persisted.
+"""
+import heapq
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.utils.seen_pairs import pair_key
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+FLAG = "flag"
+THROTTLE = "throttle"
+
+# Floor on the window's time span, so a handful of votes in the same
+# instant does not read as an infinite rate
+MIN_SPAN_SECONDS = 1.0
+
+
+def _decrement(counts: dict[int, int], key: int) -> None:
+    left = counts[key] - 1
+    if left:
+        counts[key] = left
+    else:
+        del counts[key]
+
+
+class _VoterWindow:
+    __slots__ = (
+        "times", "winners", "pairs", "head", "size", "winner_counts", "pair_counts",
+        "flagged", "throttled", "suspicious", "last_vote_at",
+    )
+
+    def __init__(self, window: int):
+        self.times = array("d", bytes(8 * window))
+        self.winners = array("q", bytes(8 * window))
+        self.pairs = array("q", bytes(8 * window))
+        self.head = 0
+        self.size = 0
+        self.winner_counts: dict[int, int] = {}
+        self.pair_counts: dict[int, int] = {}
+        self.flagged = 0
+        self.throttled = 0
+        self.suspicious = False
+        self.last_vote_at = 0.0
+
+    def push(self, now: float, winner: int, pair: int) -> None:
+        capacity = len(self.times)
+        if self.size == capacity:
+            _decrement(self.winner_counts, self.winners[self.head])
+            _decrement(self.pair_counts, self.pairs[self.head])
+        else:
+            self.size += 1
+        self.times[self.head] = now
+        self.winners[self.head] = winner
+        self.pairs[self.head] = pair
+        self.head = (self.head + 1) % capacity
+        self.winner_counts[winner] = self.winner_counts.get(winner, 0) + 1
+        self.pair_counts[pair] = self.pair_counts.get(pair, 0) + 1
+
+    def rate(self) -> float:
+        """Votes per minute from the oldest to the newest vote in the window."""
+        capacity = len(self.times)
+        newest = self.times[(self.head - 1) % capacity]
+        oldest = self.times[(self.head - self.size) % capacity]
+        return self.size * 60 / max(newest - oldest, MIN_SPAN_SECONDS)
+
+    def repeat_share(self) -> float:
+        return 1 - len(self.pair_counts) / self.size
+
+
+class VoteAbuseDetector:
+    def __init__(
+        self,
+        mode: str = "flag",
+        window: int = 50,
+        min_votes: int = 20,
+        max_votes_per_minute: float = 40.0,
+        max_winner_share: float = 0.3,
+        max_repeat_share: float = 0.2,
+        throttle_score: float = 2.0,
+        max_voters: int = 50000,
+        idle_seconds: int = 3600,
+    ):
+        self.mode = mode
+        self.window = max(2, window)
+        self.min_votes = min(max(1, min_votes), self.window)
+        self.max_rate = max_votes_per_minute
+        self.max_winner_share = max_winner_share
+        self.max_repeat_share = max_repeat_share
+        self.throttle_score = throttle_score
+        self.max_voters = max_voters
+        self.idle_seconds = idle_seconds
+        self._voters: OrderedDict[int, _VoterWindow] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flagged_total = 0
+        self._throttled_total = 0
+
+    def __len__(self) -> int:
+        return len(self._voters)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in (FLAG, THROTTLE)
+
+    def _get(self, voter_id: int, now: float) -> _VoterWindow:
+        v = self._voters.get(voter_id)
+        if v is not None and self.idle_seconds > 0 and now - v.times[(v.head - 1) % self.window] > self.idle_seconds:
+            v = None
+        if v is None:
+            v = self._voters[voter_id] = _VoterWindow(self.window)
+            while len(self._voters) > self.max_voters:
+                self._voters.popitem(last=False)
+        else:
+            self._voters.move_to_end(voter_id)
+        return v
+
+    def _score(self, v: _VoterWindow, winner_share: float) -> float:
+        if v.size < self.min_votes:
+            return 0.0
+        return max(
+            v.rate() / self.max_rate,
+            winner_share / self.max_winner_share,
+            v.repeat_share() / self.max_repeat_share,
+        )
+
+    def observe(self, voter_id: int, winner_id: int, loser_id: int) -> str:
+        """Record a vote attempt and return OK, FLAG or THROTTLE for it."""
+        if not self.enabled:
+            return OK
+        now = time.monotonic()
+        with self._lock:
+            v = self._get(voter_id, now)
+            v.push(now, winner_id, pair_key(winner_id, loser_id))
+            v.last_vote_at = time.time()
+            score = self._score(v, v.winner_counts[winner_id] / v.size)
+            if score < 1:
+                v.suspicious = False
+                return OK
+            if not v.suspicious:
+                v.suspicious = True
+                logger.warning("Suspicious voting by user %d (score %.2f)", voter_id, score)
+            if self.mode == THROTTLE and score >= self.throttle_score:
+                v.throttled += 1
+                self._throttled_total += 1
+                return THROTTLE
+            v.flagged += 1
+            self._flagged_total += 1
+            return FLAG
+
+    def forget(self, voter_id: int) -> None:
+        with self._lock:
+            self._voters.pop(voter_id, None)
+
+    def suspicious(self, limit: int = 50, min_score: float = 1.0) -> list[dict]:
+        """Voters by score, highest first, judged on their current window.
+
+        The winner share here is the top winner's, not the last vote's.
+        """
+        with self._lock:
+            scored = []
+            for voter_id, v in self._voters.items():
+                if v.size < self.min_votes:
+                    continue
+                top_share = max(v.winner_counts.values()) / v.size
+                score = self._score(v, top_share)
+                if score >= min_score:
+                    scored.append((score, voter_id, v, top_share))
+            top = heapq.nlargest(limit, scored, key=lambda s: s[0])
+            return [
+                {
+                    "user_id": voter_id,
+                    "score": round(score, 3),
+                    "votes_in_window": v.size,
+                    "votes_per_minute": round(v.rate(), 1),
+                    "top_winner_share": round(top_share, 3),
+                    "repeat_share": round(v.repeat_share(), 3),
+                    "flagged": v.flagged,
+                    "throttled": v.throttled,
+                    "last_vote_at": datetime.fromtimestamp(v.last_vote_at, timezone.utc),
+                }
+                for score, voter_id, v, top_share in top
+            ]
+
+    def stats(self) -> dict:
+        return {
+            "voters": len(self._voters),
+            "flagged": self._flagged_total,
+            "throttled": self._throttled_total,
+        }
+
+
+abuse_detector = VoteAbuseDetector(
+    mode=settings.ABUSE_DETECTION,
+    window=settings.ABUSE_WINDOW,
+    min_votes=settings.ABUSE_MIN_VOTES,
+    max_votes_per_minute=settings.ABUSE_MAX_VOTES_PER_MINUTE,
+    max_winner_share=settings.ABUSE_MAX_WINNER_SHARE,
+    max_repeat_share=settings.ABUSE_MAX_REPEAT_SHARE,
+    throttle_score=settings.ABUSE_THROTTLE_SCORE,
+    max_voters=settings.ABUSE_MAX_VOTERS,
+    idle_seconds=settings.ABUSE_IDLE_SECONDS,
+)
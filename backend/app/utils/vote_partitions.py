@@ -0,0 +1,100 @@
+"""
+Monthly partitions of the votes table.
+On Postgres, migration 0008 turns votes into a table range-partitioned by
+created_at. There is one partition per calendar month (UTC), named
+votes_yYYYYmMM, plus votes_default, which catches anything outside them.
+A query bounded on created_at only reads the months it covers, and a whole
+month can be archived and dropped without a long DELETE.
+
+Partitions are created ahead of time by `python -m app.jobs.vote_partitions
+ensure` (run it from cron, e.g. daily). If that lapses, new votes still
+land in votes_default. The next ensure moves them into their month's
+partition before attaching it.
+
+Postgres cannot enforce a unique index that leaves out the partition key,
+so per-voter idempotency keys are enforced by the plain
+vote_idempotency_keys table instead (migration 0010).
+
+On other databases (SQLite locally) votes stays a plain table, and the
+archive job deletes a month's rows in batches instead.
+"""
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+DEFAULT_PARTITION = "votes_default"
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"votes_y{month.year}m{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> date:
+    return date(int(name[7:11]), int(name[12:14]), 1)
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end_month = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('votes')")).scalar()
+    return kind == "p"
+
+
+def list_partitions(conn: Connection) -> list[date]:
+    """Months that have a partition, oldest first."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'votes'::regclass"
+    )).scalars().all()
+    return sorted(parse_partition_name(n) for n in names if n != DEFAULT_PARTITION)
+
+
+def create_partition(conn: Connection, month: date) -> str:
+    """Create and attach one month's partition, moving its rows out of votes_default first.
+
+    The caller commits. Attaching takes a short exclusive lock on votes.
+    """
+    name = partition_name(month)
+    start, end = (b.isoformat() for b in month_bounds(month))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE votes INCLUDING DEFAULTS)"))
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE created_at >= :start AND created_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": start, "end": end},
+    )
+    conn.execute(text(f"ALTER TABLE votes ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    return name
+
+
+def ensure_partitions(conn: Connection, months_ahead: int, today: Optional[date] = None) -> list[str]:
+    """Create missing partitions from the current month to `months_ahead` months out."""
+    if not is_partitioned(conn):
+        return []
+    current = month_start(today or datetime.now(timezone.utc).date())
+    existing = set(list_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(conn, month))
+    return created
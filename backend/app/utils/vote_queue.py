@@ -0,0 +1,219 @@
+"""
+Write-behind vote ingestion.
+With VOTE_INGEST_MODE=queued, POST /vote only validates the vote and puts
+it on an in-process queue. A single writer thread drains the queue in
+batches: it replays the rating engine's per-vote update in arrival order,
+bulk-inserts the votes and bulk-updates the touched photos in one
+transaction, so a batch costs one commit instead of one per swipe. The
+photo rows are locked in id order for the batch, so writers in several
+workers cannot lose each other's updates.
+
+Queued votes have already been acknowledged with 202, so a failed flush
+must not lose them. Transient database errors (connection loss, deadlocks,
+pool timeouts) retry the same batch with exponential backoff, up to
+VOTE_FLUSH_MAX_RETRIES times. Any other error splits the batch in halves
+until the vote that cannot be written is isolated; only that vote is
+logged and dropped. On shutdown stop() waits until the queue is drained.
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.photo import Photo
+from app.models.vote import Vote
+from app.utils.leaderboard_index import leaderboard_index
+from app.utils.matchmaking import matchmaking
+from app.utils.rating_engine import rating_engine
+from app.utils.versions import versions
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying unchanged; anything else is taken to be the batch's fault
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+MAX_BACKOFF_SECONDS = 30.0
+
+
+@dataclass
+class PendingVote:
+    voter_user_id: int
+    winner_photo_id: int
+    loser_photo_id: int
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class VoteWriter:
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        flush_interval_ms: int = 50,
+        batch_size: int = 1000,
+        max_retries: int = 8,
+        retry_ms: int = 100,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_ms / 1000
+        self._queue: queue.Queue[PendingVote] = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, vote: PendingVote) -> None:
+        """Enqueue a vote. Raises queue.Full when the queue is at capacity."""
+        self._queue.put_nowait(vote)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the writer after draining whatever is still queued.
+
+        With no timeout this waits for the drain however long it takes;
+        retries are bounded, so it ends even with the database down.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _next_batch(self) -> list[PendingVote]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            self.write(batch)
+
+    def write(self, batch: list[PendingVote]) -> None:
+        """Flush a batch, retrying transient errors and isolating votes that cannot be written."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.flush(batch)
+                return
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    logger.exception("Vote writer gave up on %d votes after %d attempts", len(batch), attempt + 1)
+                    return
+                delay = min(self.retry_delay * 2 ** attempt, MAX_BACKOFF_SECONDS)
+                logger.warning(
+                    "Vote writer flush failed, retrying %d votes in %.2fs", len(batch), delay, exc_info=True
+                )
+                time.sleep(delay)
+            except Exception:
+                if len(batch) == 1:
+                    logger.exception("Vote writer dropped a vote it could not write: %s", batch[0])
+                    return
+                mid = len(batch) // 2
+                self.write(batch[:mid])
+                self.write(batch[mid:])
+                return
+
+    def flush(self, batch: list[PendingVote]) -> None:
+        photo_ids = {v.winner_photo_id for v in batch} | {v.loser_photo_id for v in batch}
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Photo.id, Photo.elo_rating, Photo.wins, Photo.losses, Photo.total_votes)
+                .filter(Photo.id.in_(photo_ids), Photo.deleted_at.is_(None))
+                .order_by(Photo.id)
+                .with_for_update()
+                .all()
+            )
+            state = {
+                r.id: {
+                    "id": r.id,
+                    "elo_rating": r.elo_rating,
+                    "wins": r.wins or 0,
+                    "losses": r.losses or 0,
+                    "total_votes": r.total_votes or 0,
+                }
+                for r in rows
+            }
+
+            accepted = []
+            for v in batch:
+                winner = state.get(v.winner_photo_id)
+                loser = state.get(v.loser_photo_id)
+                if winner is None or loser is None:
+                    # Photo was deleted after the vote was acknowledged
+                    continue
+                winner["elo_rating"], loser["elo_rating"] = rating_engine.rate_pair(
+                    winner["elo_rating"], loser["elo_rating"]
+                )
+                winner["wins"] += 1
+                winner["total_votes"] += 1
+                loser["losses"] += 1
+                loser["total_votes"] += 1
+                accepted.append({
+                    "voter_user_id": v.voter_user_id,
+                    "winner_photo_id": v.winner_photo_id,
+                    "loser_photo_id": v.loser_photo_id,
+                    "created_at": v.created_at,
+                })
+
+            if not accepted:
+                return
+            touched = {a["winner_photo_id"] for a in accepted} | {a["loser_photo_id"] for a in accepted}
+            db.execute(insert(Vote), accepted)
+            db.execute(update(Photo), [state[pid] for pid in touched])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Committed: a failure from here on must not make write() retry the batch
+        try:
+            for pid in touched:
+                s = state[pid]
+                matchmaking.update(pid, s["elo_rating"])
+                leaderboard_index.update(pid, s["elo_rating"], s["wins"], s["losses"], s["total_votes"])
+            versions.bump("leaderboard")
+            versions.bump_photos(touched)
+        except Exception:
+            logger.exception("Vote writer failed to update the in-memory indexes")
+
+
+vote_writer = VoteWriter(
+    max_queue=settings.VOTE_QUEUE_MAX,
+    flush_interval_ms=settings.VOTE_FLUSH_INTERVAL_MS,
+    batch_size=settings.VOTE_BATCH_SIZE,
+    max_retries=settings.VOTE_FLUSH_MAX_RETRIES,
+    retry_ms=settings.VOTE_FLUSH_RETRY_MS,
+)
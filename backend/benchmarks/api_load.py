@@ -0,0 +1,369 @@
+"""
+Mixed swipe/vote/leaderboard load against the ASGI app, fully offline.
+
+    python benchmarks/api_load.py --concurrency 32 --duration 30 --output benchmarks/results/base.json
+    python benchmarks/api_load.py --concurrency 32 --duration 30 --output benchmarks/results/new.json \\
+        --compare benchmarks/results/base.json
+
+Seeds a throwaway SQLite database, or --database-url, with the synthetic
+population from seed.py. It replaces cloudinary_helper with an in-process
+stub; --upload-latency-ms simulates the Cloudinary round trip. It mints
+tokens directly instead of logging in, since login has its own benchmark,
+and turns the rate limiter off. The app runs in-process through httpx's
+ASGI transport with its lifespan, so indexes are warmed and the vote writer
+runs as in production. Latencies include the in-process client.
+
+Each of --concurrency virtual users loops over a weighted mix of actions
+(--mix), with no think time:
+
+  swipe        GET /photos/random-pair, then POST /vote on that pair
+  leaderboard  GET /leaderboard, then the next cursor page a third of the time
+  my           GET /photos/my
+  me           GET /auth/me
+  upload       POST /photos/upload with a freshly generated image
+
+Like a browser, a virtual user revalidates /leaderboard, /photos/my and
+/auth/me with the ETag it last saw. Pass --no-etag to always fetch in full.
+
+For each route the report gives throughput, p50/p95/p99 latency, status
+codes and SQL queries per request. A query is counted against the request
+whose context ran it. Queries run by background threads, such as the
+queued vote writer, are reported separately. Results are written as JSON,
+and --compare prints the change against an earlier results file.
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed import seed_population  # noqa: E402
+
+ACTIONS = ("swipe", "leaderboard", "my", "me", "upload")
+DEFAULT_MIX = "swipe=80,leaderboard=12,my=4,me=3,upload=1"
+
+_queries: contextvars.ContextVar = contextvars.ContextVar("bench_queries", default=None)
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise SystemExit(f"Unknown action {name!r} in --mix, expected one of {', '.join(ACTIONS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def install_cloudinary_stub(latency_ms: float) -> None:
+    """Stand in for app.utils.cloudinary_helper before the app imports it."""
+    stub = types.ModuleType("app.utils.cloudinary_helper")
+
+    def upload_image(file, filename: str) -> dict:
+        time.sleep(latency_ms / 1000)
+        public_id = f"srm-facerank/{filename}"
+        return {"public_id": public_id, "url": f"https://res.cloudinary.invalid/{public_id}.jpg"}
+
+    def delete_image(public_id: str) -> None:
+        time.sleep(latency_ms / 1000)
+
+    stub.upload_image = upload_image
+    stub.delete_image = delete_image
+    sys.modules[stub.__name__] = stub
+
+
+class QueryCounter:
+    """ASGI wrapper that reports each request's query count in a response header."""
+
+    def __init__(self, app):
+        self.app = app
+        self.background = 0
+
+    def on_execute(self, *_args) -> None:
+        counter = _queries.get()
+        if counter is None:
+            self.background += 1
+        else:
+            counter[0] += 1
+
+    async def __call__(self, scope, receive, send):
+        counter = [0]
+        token = _queries.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-bench-queries", str(counter[0]).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _queries.reset(token)
+
+
+def random_jpeg(rng: random.Random) -> bytes:
+    from PIL import Image
+
+    image = Image.frombytes("RGB", (64, 64), rng.randbytes(64 * 64 * 3))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class Recorder:
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.samples: dict[str, list[tuple[float, int, int]]] = defaultdict(list)
+
+    async def call(self, route: str, request):
+        started = time.perf_counter()
+        response = await request
+        if started >= self.measure_from:
+            queries = int(response.headers.get("x-bench-queries", 0))
+            self.samples[route].append((time.perf_counter() - started, response.status_code, queries))
+        return response
+
+
+async def virtual_user(client, headers: dict, rng: random.Random, mix: dict, deadline: float,
+                       recorder: Recorder, use_etags: bool) -> None:
+    actions, weights = list(mix), list(mix.values())
+    etags: dict[str, str] = {}
+
+    async def get(route: str, url: str):
+        h = dict(headers)
+        if use_etags and url in etags:
+            h["If-None-Match"] = etags[url]
+        response = await recorder.call(route, client.get(url, headers=h))
+        if "etag" in response.headers:
+            etags[url] = response.headers["etag"]
+        return response
+
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, weights)[0]
+        if action == "swipe":
+            r = await recorder.call("GET /photos/random-pair", client.get("/photos/random-pair", headers=headers))
+            if r.status_code != 200:
+                continue
+            pair = r.json()
+            a, b = pair["photo_a"], pair["photo_b"]
+            # Mostly agree with the current ratings, as real voters mostly do
+            if (a["elo_rating"] >= b["elo_rating"]) == (rng.random() < 0.7):
+                winner, loser = a["id"], b["id"]
+            else:
+                winner, loser = b["id"], a["id"]
+            await recorder.call(
+                "POST /vote",
+                client.post("/vote", json={"winner_photo_id": winner, "loser_photo_id": loser}, headers=headers),
+            )
+        elif action == "leaderboard":
+            r = await get("GET /leaderboard", "/leaderboard?limit=20")
+            cursor = r.headers.get("x-next-cursor")
+            if cursor and rng.random() < 1 / 3:
+                await get("GET /leaderboard", f"/leaderboard?limit=20&cursor={cursor}")
+        elif action == "my":
+            await get("GET /photos/my", "/photos/my")
+        elif action == "me":
+            await get("GET /auth/me", "/auth/me")
+        elif action == "upload":
+            files = {"file": ("bench.jpg", random_jpeg(rng), "image/jpeg")}
+            await recorder.call("POST /photos/upload", client.post("/photos/upload", files=files, headers=headers))
+
+
+def quantiles(latencies: list[float]) -> tuple[float, float, float]:
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value
+    q = statistics.quantiles(latencies, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+
+def summarize(samples: list[tuple[float, int, int]], elapsed: float) -> dict:
+    latencies = [s[0] for s in samples]
+    statuses: dict[str, int] = defaultdict(int)
+    for _, status, _ in samples:
+        statuses[str(status)] += 1
+    p50, p95, p99 = quantiles(latencies)
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+        "queries_per_request": round(statistics.fmean(s[2] for s in samples), 2) if samples else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event, select
+
+    from app.config import settings
+    from app.database import async_engine, engine
+    from app.main import app
+    from app.models.photo import Photo
+    from app.models.user import User
+    from app.utils.auth import create_access_token
+
+    started = time.perf_counter()
+    seeded = seed_population(args.users, args.photos, args.votes, args.alpha, args.days, args.seed)
+    print(("seeded" if seeded else "reusing existing data") + f" in {time.perf_counter() - started:.1f}s")
+
+    with engine.connect() as conn:
+        uploaders = conn.scalars(select(Photo.uploaded_by_user_id).distinct()).all()
+        users = conn.scalars(select(User.id).where(User.is_banned.is_(False))).all()
+    rng = random.Random(args.seed)
+    # Half the virtual users have photos of their own, so /photos/my returns something
+    people = rng.sample(uploaders, min(len(uploaders), args.concurrency // 2))
+    people += rng.sample(users, min(len(users), args.concurrency - len(people)))
+
+    counter = QueryCounter(app)
+    event.listen(engine, "before_cursor_execute", counter.on_execute)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", counter.on_execute)
+
+    mix = parse_mix(args.mix)
+    transport = httpx.ASGITransport(app=counter)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            begin = time.perf_counter()
+            recorder = Recorder(measure_from=begin + args.warmup)
+            deadline = begin + args.warmup + args.duration
+            await asyncio.gather(*(
+                virtual_user(
+                    client,
+                    {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"},
+                    random.Random(args.seed * 1000 + i),
+                    mix,
+                    deadline,
+                    recorder,
+                    not args.no_etag,
+                )
+                for i, user_id in enumerate(people)
+            ))
+            elapsed = time.perf_counter() - recorder.measure_from
+
+    everything = [s for samples in recorder.samples.values() for s in samples]
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "dialect": engine.dialect.name,
+            "settings": {
+                name: getattr(settings, name)
+                for name in ("ASYNC_DB", "VOTE_INGEST_MODE", "LEADERBOARD_IN_MEMORY", "MATCHMAKING_MODE",
+                             "DB_POOL_SIZE", "DB_MAX_OVERFLOW")
+            },
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "database_url")},
+            "measured_seconds": round(elapsed, 2),
+        },
+        "routes": {route: summarize(samples, elapsed) for route, samples in sorted(recorder.samples.items())},
+        "total": summarize(everything, elapsed),
+        "background_queries": counter.background,
+    }
+
+
+def print_report(result: dict, baseline: dict | None = None) -> None:
+    def change(route: str, key: str, value: float) -> str:
+        if baseline is None:
+            return ""
+        before = (baseline["total"] if route == "total" else baseline["routes"].get(route, {})).get(key)
+        if not before:
+            return "        "
+        return f" ({(value - before) / before * 100:+5.0f}%)"
+
+    meta = result["meta"]
+    print(f"{meta['dialect']}  {meta['git_revision']}  {meta['measured_seconds']}s measured  "
+          f"concurrency {meta['args']['concurrency']}  {meta['settings']}")
+    print(f"{'route':24} {'req':>7} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'q/req':>6}  statuses")
+    rows = list(result["routes"].items()) + [("total", result["total"])]
+    for route, s in rows:
+        print(
+            f"{route:24} {s['requests']:7d} "
+            f"{s['throughput_rps']:8.1f}{change(route, 'throughput_rps', s['throughput_rps']):>8} "
+            f"{s['p50_ms']:8.2f}{change(route, 'p50_ms', s['p50_ms']):>8} "
+            f"{s['p95_ms']:8.2f}{change(route, 'p95_ms', s['p95_ms']):>8} "
+            f"{s['p99_ms']:8.2f}{change(route, 'p99_ms', s['p99_ms']):>8} "
+            f"{s['queries_per_request']:6.2f}  {s['statuses']}"
+        )
+    print(f"background queries: {result['background_queries']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--votes", type=int, default=50000, help="size of the seeded vote history")
+    parser.add_argument("--alpha", type=float, default=1.1, help="power-law exponent of voter activity")
+    parser.add_argument("--days", type=int, default=30, help="days the seeded history spans")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--no-etag", action="store_true", help="never send If-None-Match")
+    parser.add_argument("--upload-latency-ms", type=float, default=150, help="simulated Cloudinary round trip")
+    parser.add_argument("--database-url", default=None, help="use this database instead of a temp SQLite file")
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+        tmp.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    # python-multipart warns about the CRLF httpx puts after the last boundary
+    logging.getLogger("python_multipart").setLevel(logging.ERROR)
+    os.environ["STORAGE_BACKEND"] = "cloudinary"
+    install_cloudinary_stub(args.upload_latency_ms)
+
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Login throughput under concurrent load.
+
+    python benchmarks/login_throughput.py --users 20 --logins 400 --concurrency 64
+
+Runs the ASGI app in-process against a throwaway SQLite database, fires
+`--logins` logins with `--concurrency` in flight, and at the same time
+polls /health to show whether light requests stay responsive while bcrypt
+is busy. Prints logins/s, login latency percentiles, the number of 503s
+from the hashing pool, and /health latency during the burst.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def run(args) -> None:
+    import httpx
+
+    from app.database import Base, engine
+    from app.main import app
+    from app.utils.password_pool import password_pool
+
+    Base.metadata.create_all(engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(args.users):
+            await client.post(
+                "/auth/register",
+                json={"username": f"bench{i}", "email": f"bench{i}@example.com", "password": "pw"},
+            )
+
+        login_latency: list[float] = []
+        health_latency: list[float] = []
+        statuses: dict[int, int] = {}
+        sem = asyncio.Semaphore(args.concurrency)
+        done = asyncio.Event()
+
+        async def one_login(i: int) -> None:
+            async with sem:
+                started = time.perf_counter()
+                r = await client.post(
+                    "/auth/login", json={"username": f"bench{i % args.users}", "password": "pw"}
+                )
+                login_latency.append(time.perf_counter() - started)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        async def probe() -> None:
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latency.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    password_pool.shutdown()
+    ok = statuses.get(200, 0)
+    print(f"logins: {args.logins}  concurrency: {args.concurrency}  elapsed: {elapsed:.2f}s")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print(f"successful logins/s: {ok / elapsed:.1f}")
+    print(
+        "login latency ms: p50={:.1f} p95={:.1f} p99={:.1f}".format(
+            *(percentile(login_latency, p) * 1000 for p in (50, 95, 99))
+        )
+    )
+    if health_latency:
+        print(
+            "/health latency ms during burst: median={:.2f} p99={:.2f} max={:.2f}".format(
+                statistics.median(health_latency) * 1000,
+                percentile(health_latency, 99) * 1000,
+                max(health_latency) * 1000,
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    tmp = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+    tmp.close()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+    # Every request comes from one client address; measure hashing, not the limiter
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    try:
+        asyncio.run(run(args))
+    finally:
+        os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
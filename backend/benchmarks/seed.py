@@ -0,0 +1,141 @@
+"""
+Synthetic population for benchmarks.
+
+    python benchmarks/seed.py --database-url postgresql://... --users 5000 --photos 2000 --votes 1000000
+
+Creates the tables if needed and adds users, photos and a vote history:
+
+- a third of the users upload; each photo has a hidden attractiveness
+  drawn from a normal distribution
+- voter activity follows a power law: the user at activity rank r casts
+  votes in proportion to r ** -alpha, so a few heavy swipers dominate and
+  most users vote a handful of times
+- pairs are uniform (what random matchmaking serves) and the winner is a
+  Bradley-Terry draw on the two attractiveness values
+- timestamps spread evenly over the last --days days, in id order
+
+Ratings, wins, losses and total_votes are replayed through the ELO update,
+so the photos table agrees with the votes. Everything is drawn from
+--seed, so the same arguments give the same population. Users are named
+bench<i>; a database that already has photos is left alone.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_CHUNK = 10000
+
+
+def seed_population(
+    users: int = 1000,
+    photos: int = 500,
+    votes: int = 50000,
+    alpha: float = 1.1,
+    days: int = 30,
+    seed: int = 42,
+) -> bool:
+    """Seed the configured database. Returns False if it already had photos."""
+    import numpy as np
+    from sqlalchemy import func, insert, select, update
+    from sqlalchemy.orm import Session
+
+    from app.database import Base, engine
+    from app.models.photo import Photo
+    from app.models.user import User
+    from app.models.vote import Vote
+    from app.utils.elo import calculate_elo
+    from app.utils.matchmaking import DEFAULT_RATING
+
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        if db.scalar(select(func.count()).select_from(Photo)):
+            return False
+
+        rng = np.random.default_rng(seed)
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=days)
+
+        db.execute(insert(User), [
+            {"username": f"bench{i}", "email": f"bench{i}@example.com", "hashed_password": "!"}
+            for i in range(users)
+        ])
+        user_ids = np.array(db.scalars(select(User.id).where(User.username.like("bench%")).order_by(User.id)).all())
+
+        uploaders = rng.choice(user_ids, size=max(1, len(user_ids) // 3), replace=False)
+        photo_times = np.sort(rng.uniform(0, days * 86400, size=photos))
+        db.execute(insert(Photo), [
+            {
+                "uploaded_by_user_id": int(rng.choice(uploaders)),
+                "image_url": f"https://res.cloudinary.invalid/srm-facerank/bench_{i}.jpg",
+                "cloudinary_public_id": f"srm-facerank/bench_{i}",
+                "phash": int(rng.integers(-2**63, 2**63 - 1, dtype=np.int64)),
+                "created_at": start + timedelta(seconds=float(photo_times[i])),
+            }
+            for i in range(photos)
+        ])
+        photo_ids = db.scalars(select(Photo.id).order_by(Photo.id)).all()
+        quality = rng.normal(0, 1, size=len(photo_ids))
+
+        # Power-law activity over a random ordering of the users
+        weights = np.arange(1, len(user_ids) + 1, dtype=float) ** -alpha
+        voters = rng.permutation(user_ids)[rng.choice(len(user_ids), size=votes, p=weights / weights.sum())]
+        a = rng.integers(0, len(photo_ids), size=votes)
+        b = (a + rng.integers(1, len(photo_ids), size=votes)) % len(photo_ids)
+        a_wins = rng.random(votes) < 1 / (1 + np.exp(quality[b] - quality[a]))
+        winners = np.where(a_wins, a, b)
+        losers = np.where(a_wins, b, a)
+        vote_times = np.sort(rng.uniform(0, days * 86400, size=votes))
+
+        state = {pid: [DEFAULT_RATING, 0, 0] for pid in photo_ids}
+        rows = []
+        for i in range(votes):
+            w, l = photo_ids[winners[i]], photo_ids[losers[i]]
+            state[w][0], state[l][0] = calculate_elo(state[w][0], state[l][0])
+            state[w][1] += 1
+            state[l][2] += 1
+            rows.append({
+                "voter_user_id": int(voters[i]),
+                "winner_photo_id": w,
+                "loser_photo_id": l,
+                "created_at": start + timedelta(seconds=float(vote_times[i])),
+            })
+            if len(rows) == INSERT_CHUNK:
+                db.execute(insert(Vote), rows)
+                rows = []
+        if rows:
+            db.execute(insert(Vote), rows)
+
+        db.execute(update(Photo), [
+            {"id": pid, "elo_rating": r, "wins": wins, "losses": losses, "total_votes": wins + losses}
+            for pid, (r, wins, losses) in state.items()
+        ])
+        db.commit()
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--votes", type=int, default=50000)
+    parser.add_argument("--alpha", type=float, default=1.1, help="power-law exponent of voter activity")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    started = time.perf_counter()
+    if seed_population(args.users, args.photos, args.votes, args.alpha, args.days, args.seed):
+        print(f"seeded {args.users} users, {args.photos} photos, {args.votes} votes "
+              f"in {time.perf_counter() - started:.1f}s")
+    else:
+        print("database already has photos, left unchanged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Listing serialization: the pydantic/jsonable_encoder path against row tuples
+straight to orjson bytes.
+
+    python benchmarks/serialization.py --rows 100 --repeat 2000
+
+Seeds a throwaway SQLite database (or uses --database-url) and times, per
+page of --rows:
+
+  /photos/my         ORM objects -> photo_to_out -> response_model validate
+                     and dump -> json.dumps, against column tuples ->
+                     rows_to_dicts -> orjson
+  /leaderboard       leaderboard dicts -> jsonable_encoder -> json.dumps,
+                     against the same dicts -> orjson
+
+Both paths include the query, so the ORM hydration that the fast path
+skips is counted. Checks that both produce the same JSON before timing.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def render_json(content) -> bytes:
+    # What starlette's JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def run(args) -> None:
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    from app.database import Base, SessionLocal, engine
+    from app.models.photo import Photo
+    from app.models.user import User
+    from app.routes.leaderboard import leaderboard_page_from_db
+    from app.routes.photos import PHOTO_OUT_COLUMNS, PHOTO_OUT_NAMES, photo_to_out
+    from app.schemas import PhotoOut
+    from app.utils.fast_json import dumps, rows_to_dicts
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    user = db.query(User).filter(User.username == "bench").first()
+    if user is None:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add_all(
+            Photo(
+                uploaded_by_user_id=user.id,
+                image_url=f"https://example.com/bench/{i}.jpg",
+                cloudinary_public_id=f"bench_{i}",
+                elo_rating=1000 + (i * 7919) % 400 + 0.25,
+                wins=i % 13,
+                losses=i % 7,
+                total_votes=i % 13 + i % 7 + 1,
+            )
+            for i in range(args.rows)
+        )
+        db.commit()
+    user_id, username = user.id, user.username
+    adapter = TypeAdapter(list[PhotoOut])
+
+    def my_current() -> bytes:
+        photos = db.query(Photo).filter(Photo.uploaded_by_user_id == user_id).limit(args.rows).all()
+        out = [photo_to_out(p, username) for p in photos]
+        # FastAPI's response_model handling: validate, then dump in JSON mode
+        body = render_json(adapter.dump_python(adapter.validate_python(out), mode="json"))
+        db.expunge_all()  # a request would start from a fresh session
+        return body
+
+    def my_fast() -> bytes:
+        rows = db.query(*PHOTO_OUT_COLUMNS).filter(Photo.uploaded_by_user_id == user_id).limit(args.rows).all()
+        return dumps(rows_to_dicts(PHOTO_OUT_NAMES, rows, {"uploader_username": username}))
+
+    def leaderboard_current() -> bytes:
+        return render_json(jsonable_encoder(leaderboard_page_from_db(db, None, 0, args.rows)))
+
+    def leaderboard_fast() -> bytes:
+        return dumps(leaderboard_page_from_db(db, None, 0, args.rows))
+
+    cases = [("/photos/my", my_current, my_fast), ("/leaderboard", leaderboard_current, leaderboard_fast)]
+    print(f"rows per page: {args.rows}  repeat: {args.repeat}  dialect: {engine.dialect.name}")
+    for name, current, fast in cases:
+        assert json.loads(current()) == json.loads(fast()), f"{name}: outputs differ"
+        results = {}
+        for label, fn in (("current", current), ("orjson", fast)):
+            timed(fn, max(1, args.repeat // 10))  # warm up
+            results[label] = statistics.median(timed(fn, args.repeat))
+        print(
+            f"{name:14} current {results['current'] * 1e6:8.0f}us   "
+            f"orjson {results['orjson'] * 1e6:8.0f}us   "
+            f"x{results['current'] / results['orjson']:.1f}"
+        )
+    db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help='use this database instead of a temp SQLite file; adds a "bench" user with --rows photos',
+    )
+    args = parser.parse_args()
+
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+        tmp.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}"
+    try:
+        run(args)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from app.jobs.bradley_terry import ELO_SCALE, RATING_CENTER, fit, ranked_order
+
+
+def _wins(n: int, votes: list[tuple[int, int]]) -> sparse.csr_matrix:
+    w, l = zip(*votes) if votes else ((), ())
+    return sparse.csr_matrix((np.ones(len(votes)), (w, l)), shape=(n, n))
+
+
+def _plain_mm(wins: sparse.csr_matrix, prior: float) -> np.ndarray:
+    """Unaccelerated dense MM, the reference the SQUAREM fit must agree with."""
+    dense = wins.toarray()
+    games = dense + dense.T
+    won = dense.sum(axis=1)
+    p = np.ones(len(dense))
+    for _ in range(100_000):
+        new = (won + prior) / ((games / (p[:, None] + p[None, :])).sum(axis=1) + 2 * prior / (p + 1))
+        if np.max(np.abs(np.log(new / p))) < 1e-12:
+            break
+        p = new
+    return RATING_CENTER + ELO_SCALE * np.log(p)
+
+
+def test_fit_matches_plain_mm():
+    rng = np.random.default_rng(11)
+    n = 60
+    strength = rng.normal(0, 1.5, n)
+    votes = []
+    for _ in range(3000):
+        a, b = rng.choice(n, 2, replace=False)
+        won = rng.random() < 1 / (1 + np.exp(strength[b] - strength[a]))
+        votes.append((a, b) if won else (b, a))
+    wins = _wins(n, votes)
+
+    result = fit(wins, prior=1.0, tol=1e-10)
+
+    assert result["converged"]
+    np.testing.assert_allclose(result["score"], _plain_mm(wins, 1.0), atol=1e-4)
+    assert result["wins"].sum() == result["losses"].sum() == len(votes)
+    assert np.all(result["ci_low"] < result["score"]) and np.all(result["score"] < result["ci_high"])
+
+
+def test_even_records_score_at_the_centre():
+    result = fit(_wins(3, [(0, 1), (1, 0), (1, 2), (2, 1), (2, 0), (0, 2)]))
+    np.testing.assert_allclose(result["score"], RATING_CENTER, atol=1e-3)
+
+
+def test_prior_keeps_unbeaten_and_winless_photos_finite():
+    result = fit(_wins(3, [(0, 1)] * 20 + [(0, 2)] * 5))
+    score = result["score"]
+    assert np.all(np.isfinite(score))
+    assert score[0] > RATING_CENTER > score[2] > score[1]
+    # More evidence, narrower interval
+    width = result["ci_high"] - result["ci_low"]
+    assert width[1] < width[2]
+
+
+def test_empty_fit():
+    result = fit(_wins(0, []))
+    assert len(result["score"]) == 0 and result["iterations"] == 0
+
+
+def test_ranked_order_skips_thin_photos_and_breaks_ties_by_slot():
+    result = {
+        "score": np.array([1010.0, 1050.0, 1010.0, 1200.0]),
+        "wins": np.array([3, 4, 2, 1]),
+        "losses": np.array([1, 0, 2, 0]),
+    }
+    assert ranked_order(result, min_votes=2).tolist() == [1, 0, 2]
+    assert ranked_order(result, min_votes=0).tolist() == [3, 1, 0, 2]
+
+
+@pytest.mark.parametrize("prior", [0.5, 2.0])
+def test_prior_strength(prior):
+    wins = _wins(2, [(0, 1)] * 3 + [(1, 0)])
+    np.testing.assert_allclose(fit(wins, prior=prior, tol=1e-12)["score"], _plain_mm(wins, prior), atol=1e-6)
@@ -0,0 +1,29 @@
+import pytest
+
+from app.database import _pool_options, async_database_url, database_url
+from app.utils.db_metrics import InstrumentedQueuePool
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("postgresql://u:p@db:5432/app", "postgresql+asyncpg://u:p@db:5432/app"),
+    ("postgres://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+    ("postgresql+psycopg2://u@/app?host=/tmp", "postgresql+asyncpg://u@/app?host=/tmp"),
+    ("sqlite:///./facerank.db", "sqlite+aiosqlite:///./facerank.db"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+    ("postgresql+asyncpg://u@db/app", "postgresql+asyncpg://u@db/app"),
+    ("mysql://u@db/app", "mysql://u@db/app"),
+])
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_database_url_accepts_postgres_scheme():
+    assert database_url("postgres://u:p%40ss@db/app") == "postgresql://u:p%40ss@db/app"
+    assert database_url("sqlite:///x.db") == "sqlite:///x.db"
+
+
+def test_file_sqlite_gets_the_instrumented_pool():
+    assert _pool_options("sqlite:///./facerank.db", InstrumentedQueuePool)["poolclass"] is InstrumentedQueuePool
+    assert _pool_options("postgresql://db/app", InstrumentedQueuePool)["poolclass"] is InstrumentedQueuePool
+    for url in ("sqlite://", "sqlite:///:memory:", "sqlite:///file:x?mode=memory&uri=true"):
+        assert _pool_options(url, InstrumentedQueuePool) == {}
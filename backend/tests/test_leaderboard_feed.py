@@ -0,0 +1,60 @@
+import random
+
+from app.utils.leaderboard_feed import LeaderboardFeed, diff_rows
+
+
+def _row(photo_id: int, rating: float, wins: int = 0, losses: int = 0) -> dict:
+    return {
+        "id": photo_id, "elo_rating": rating, "rating_deviation": None,
+        "wins": wins, "losses": losses, "total_votes": wins + losses, "image_url": f"/media/{photo_id}",
+    }
+
+
+def _apply(old: list[dict], diff) -> list[dict]:
+    """What a client does with a diff message."""
+    if diff is None:
+        return old
+    rows = {r["id"]: r for r in old}
+    rows.update({r["id"]: r for r in diff.get("rows", [])})
+    return [rows[i] for i in diff.get("order", [r["id"] for r in old])]
+
+
+def test_unchanged_window_sends_nothing():
+    rows = [_row(1, 1100.0), _row(2, 1050.0)]
+    assert diff_rows(rows, [dict(r) for r in rows]) is None
+
+
+def test_rating_change_without_reorder_sends_only_that_row():
+    old = [_row(1, 1100.0, 3), _row(2, 1050.0), _row(3, 1000.0)]
+    new = [old[0], _row(2, 1060.0, 1), old[2]]
+    assert diff_rows(old, new) == {"rows": [new[1]]}
+
+
+def test_climb_sends_order_and_the_moved_rows():
+    old = [_row(1, 1100.0), _row(2, 1050.0), _row(3, 1000.0)]
+    new = [_row(3, 1120.0, 5), old[0], old[1]]
+    assert diff_rows(old, new) == {"order": [3, 1, 2], "rows": [new[0]]}
+
+
+def test_entry_and_exit():
+    old = [_row(1, 1100.0), _row(2, 1050.0)]
+    new = [old[0], _row(9, 1075.0, 2)]
+    assert diff_rows(old, new) == {"order": [1, 9], "rows": [new[1]]}
+    # A photo leaving with the rest unchanged is an order change only
+    assert diff_rows(old, old[:1]) == {"order": [1]}
+
+
+def test_applying_diffs_reproduces_every_window():
+    rng = random.Random(3)
+    pool = [_row(i, 1000.0 + rng.uniform(-200, 200)) for i in range(40)]
+    window = sorted(pool, key=lambda r: -r["elo_rating"])[:10]
+    for _ in range(200):
+        i = rng.randrange(len(pool))
+        pool[i] = _row(pool[i]["id"], pool[i]["elo_rating"] + rng.uniform(-30, 30), pool[i]["wins"] + 1)
+        new = sorted(pool, key=lambda r: -r["elo_rating"])[:10]
+        window = _apply(window, diff_rows(window, new))
+        assert window == new
+
+
+def test_window_for_rounds_up_to_a_shared_size():
+    assert [LeaderboardFeed.window_for(n) for n in (1, 10, 11, 26, 100)] == [10, 10, 25, 50, 100]
@@ -0,0 +1,51 @@
+from app.utils.matchmaking import DEFAULT_RATING, MatchmakingIndex
+
+
+def _ordered(index: MatchmakingIndex) -> list[tuple[float, int]]:
+    return list(zip(index._sorted_ratings, index._sorted_ids))
+
+
+def _loaded(n: int) -> MatchmakingIndex:
+    index = MatchmakingIndex(mode="nearby", window=3)
+    # Every photo starts in one tie block at the default rating
+    index.load([(pid, None) for pid in range(1, n + 1)])
+    return index
+
+
+def test_updates_inside_the_tie_block_keep_rating_id_order():
+    index = _loaded(1000)
+    for pid, rating in ((500, 1016.0), (3, 984.0), (999, 1016.0), (500, DEFAULT_RATING), (42, 1016.0)):
+        index.update(pid, rating)
+    assert _ordered(index) == sorted(_ordered(index))
+    assert index._rating[500] == DEFAULT_RATING
+    assert len(index._sorted_ids) == len(index) == 1000
+
+
+def test_remove_and_add_within_ties():
+    index = _loaded(100)
+    for pid in (1, 50, 100):
+        index.remove(pid)
+    index.add(150)
+    index.add(50, DEFAULT_RATING)
+    ids = list(index._sorted_ids)
+    assert ids == sorted(ids)
+    assert set(ids) == set(range(2, 100)) | {150}
+    assert len(index) == len(ids)
+
+
+def test_missing_id_in_the_sorted_arrays_is_tolerated():
+    index = _loaded(10)
+    assert index._sorted_pos(99, DEFAULT_RATING) is None
+    # Drop a photo from the sorted arrays only, as if the two had drifted apart
+    index._sorted_remove(5, DEFAULT_RATING)
+    index.update(5, 1010.0)
+    index.remove(5)
+    assert 5 not in index._sorted_ids
+    assert 5 not in index
+
+
+def test_nearby_pair_is_two_distinct_indexed_photos():
+    index = _loaded(50)
+    for _ in range(200):
+        a, b = index.sample_pair()
+        assert a != b and a in index and b in index
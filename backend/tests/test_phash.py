@@ -0,0 +1,78 @@
+import io
+import random
+
+import pytest
+from PIL import Image
+
+from app.utils.phash import CHUNK_BITS, PhashIndex, dhash, hamming, to_signed, to_unsigned
+
+
+def _flip(value: int, bits) -> int:
+    for b in bits:
+        value ^= 1 << b
+    return value
+
+
+def _brute_force(hashes: dict[int, int], value: int, radius: int):
+    matches = [(d, pid) for pid, h in hashes.items() if (d := hamming(value, h)) <= radius]
+    return min(matches)[0] if matches else None
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    hashes = {pid: rng.getrandbits(64) for pid in range(1, 501)}
+    # Near-duplicates of the first photos, up to the radius and just past it
+    for pid in range(501, 510):
+        hashes[pid] = _flip(hashes[pid - 500], rng.sample(range(64), pid - 501))
+    index = PhashIndex(max_distance=6)
+    index.load((pid, to_signed(h)) for pid, h in hashes.items())
+
+    for pid in range(1, 30):
+        for distance in range(0, 9):
+            probe = _flip(hashes[pid], rng.sample(range(64), distance))
+            best = index.nearest(to_signed(probe))
+            expected = _brute_force(hashes, probe, 6)
+            assert (best[1] if best else None) == expected
+
+
+def test_pigeonhole_worst_case_is_found():
+    # Six differing bits spread as 2/2/1/1 over the four chunks: only the
+    # chunks with one flipped bit are within radius // 4 of the probe
+    index = PhashIndex(max_distance=6)
+    index.load([(1, 0)])
+    bits = [0, 1, CHUNK_BITS, CHUNK_BITS + 1, 2 * CHUNK_BITS, 3 * CHUNK_BITS]
+    assert index.nearest(_flip(0, bits)) == (1, 6)
+    # Seven bits is past the radius even though one chunk still matches closely
+    assert index.nearest(_flip(0, bits + [4])) is None
+
+
+def test_add_remove_and_signed_round_trip():
+    index = PhashIndex(max_distance=4)
+    index.add(1, 5)
+    assert len(index) == 0  # not loaded yet, so the next load picks it up
+    index.load([])
+    top = (1 << 63) | 1
+    index.add(1, to_signed(top))
+    index.add(2, to_signed(top ^ 0b11))
+    assert index.nearest(to_signed(top)) == (1, 0)
+    index.remove(1)
+    index.remove(1)
+    assert index.nearest(to_signed(top)) == (2, 2)
+    assert to_unsigned(to_signed(top)) == top and to_signed(top) < 0
+
+
+def _encoded(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **kwargs)
+    return buf.getvalue()
+
+
+def test_dhash_survives_reencoding_and_resizing():
+    img = Image.new("RGB", (256, 192))
+    for x in range(256):
+        for y in range(192):
+            img.putpixel((x, y), ((x * 7 + y * 3) % 256, (x * y) % 256, (255 - x) % 256))
+    original = dhash(_encoded(img, "PNG"))
+    assert hamming(original, dhash(_encoded(img.resize((128, 96)), "JPEG", quality=70))) <= 6
+    with pytest.raises(ValueError):
+        dhash(b"not an image")
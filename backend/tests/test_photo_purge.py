@@ -0,0 +1,137 @@
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.photo import Photo
+from app.models.user import User
+from app.models.vote import Vote
+from app.models.vote_idempotency_key import VoteIdempotencyKey
+from app.utils import photo_purge
+from app.utils.photo_purge import PhotoPurger, claim
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+
+
+class FakeStorage:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.deleted: list[str] = []
+
+    def delete(self, public_id: str) -> None:
+        if self.fail:
+            raise OSError("storage unavailable")
+        self.deleted.append(public_id)
+
+
+def _seed(db, tag: str = "t") -> tuple[int, int, int]:
+    """A voter and three photos; photo 0 is in 7 votes, the others only play each other twice."""
+    user = User(username=f"purge-{tag}", email=f"{tag}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    photos = [
+        Photo(uploaded_by_user_id=user.id, image_url=f"test://{tag}/{i}", cloudinary_public_id=f"{tag}-{i}",
+              elo_rating=1000.0, wins=0, losses=0, total_votes=0)
+        for i in range(3)
+    ]
+    db.add_all(photos)
+    db.flush()
+    a, b, c = (p.id for p in photos)
+    pairs = [(a, b)] * 4 + [(c, a)] * 3 + [(b, c)] * 2
+    votes = [Vote(voter_user_id=user.id, winner_photo_id=w, loser_photo_id=l) for w, l in pairs]
+    db.add_all(votes)
+    db.flush()
+    # Every vote went through POST /vote/batch with a key
+    db.add_all(
+        VoteIdempotencyKey(voter_user_id=user.id, idempotency_key=f"k{v.id}", vote_id=v.id,
+                           winner_photo_id=v.winner_photo_id, loser_photo_id=v.loser_photo_id,
+                           created_at=datetime.now(timezone.utc))
+        for v in votes
+    )
+    photos[0].deleted_at = func.now()
+    db.commit()
+    return a, b, c
+
+
+def _votes_on(db, photo_id: int) -> int:
+    return db.execute(
+        select(func.count()).select_from(Vote)
+        .where((Vote.winner_photo_id == photo_id) | (Vote.loser_photo_id == photo_id))
+    ).scalar()
+
+
+def _keys_on(db, photo_id: int) -> int:
+    return db.execute(
+        select(func.count()).select_from(VoteIdempotencyKey)
+        .where((VoteIdempotencyKey.winner_photo_id == photo_id) | (VoteIdempotencyKey.loser_photo_id == photo_id))
+    ).scalar()
+
+
+def test_purge_removes_votes_keys_file_and_row(sqlite_db, monkeypatch):
+    fake = FakeStorage()
+    monkeypatch.setattr(photo_purge, "storage", fake)
+    a, b, c = _seed(sqlite_db)
+
+    assert PhotoPurger(batch_size=3).purge_photo(sqlite_db, a, "t-0")
+
+    assert sqlite_db.get(Photo, a) is None
+    assert _votes_on(sqlite_db, a) == _keys_on(sqlite_db, a) == 0
+    assert _votes_on(sqlite_db, b) == _keys_on(sqlite_db, b) == 2
+    assert fake.deleted == ["t-0"]
+
+
+def test_failed_storage_call_leaves_the_row_for_a_retry(sqlite_db, monkeypatch):
+    monkeypatch.setattr(photo_purge, "storage", FakeStorage(fail=True))
+    a, _, _ = _seed(sqlite_db)
+    purger = PhotoPurger(batch_size=3)
+
+    assert not purger.purge_photo(sqlite_db, a, "t-0")
+    assert sqlite_db.get(Photo, a) is not None
+    assert _votes_on(sqlite_db, a) == 0
+
+    monkeypatch.setattr(photo_purge, "storage", FakeStorage())
+    assert purger.purge_photo(sqlite_db, a, "t-0")
+    assert sqlite_db.get(Photo, a) is None
+
+
+def test_live_photos_are_never_claimed(sqlite_db):
+    a, b, _ = _seed(sqlite_db)
+    assert claim(sqlite_db, a)
+    assert not claim(sqlite_db, b)
+    assert not claim(sqlite_db, 10_000)
+
+
+@pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith("postgresql"), reason="set TEST_DATABASE_URL to a Postgres database"
+)
+def test_a_claimed_photo_is_skipped_by_other_purgers(monkeypatch):
+    engine = create_engine(TEST_DATABASE_URL)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    fake = FakeStorage()
+    monkeypatch.setattr(photo_purge, "storage", fake)
+    tag = uuid.uuid4().hex[:12]
+    first, second = Session(), Session()
+    try:
+        a, b, c = _seed(first, tag)
+        assert claim(first, a)
+        # The other process skips the locked row instead of waiting on it
+        assert not PhotoPurger(batch_size=3).purge_photo(second, a, f"{tag}-0")
+        assert fake.deleted == []
+        first.rollback()
+        assert PhotoPurger(batch_size=3).purge_photo(second, a, f"{tag}-0")
+        assert fake.deleted == [f"{tag}-0"]
+    finally:
+        first.rollback()
+        second.rollback()
+        voter = first.execute(select(User.id).where(User.username == f"purge-{tag}")).scalar()
+        first.execute(delete(VoteIdempotencyKey).where(VoteIdempotencyKey.voter_user_id == voter))
+        first.execute(delete(Vote).where(Vote.voter_user_id == voter))
+        first.execute(delete(Photo).where(Photo.uploaded_by_user_id == voter))
+        first.execute(delete(User).where(User.id == voter))
+        first.commit()
+        first.close()
+        second.close()
+        engine.dispose()
@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.rate_limit import PRUNE_SECONDS, Budget, MemoryStore, RateLimiter, SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SQLiteStore(str(tmp_path / "buckets.sqlite3"))
+
+
+def test_budget_parse():
+    assert Budget.parse("60/minute") == Budget(rate=1.0, burst=60)
+    assert Budget.parse("20/hours") == Budget(rate=20 / 3600, burst=20)
+    for spec in ("0/minute", "ten/minute", "5/fortnight"):
+        with pytest.raises(ValueError):
+            Budget.parse(spec)
+
+
+def test_burst_then_refill(store):
+    budget = Budget(rate=1.0, burst=3)
+    assert [store.take("k", budget, 100.0)[0] for _ in range(4)] == [True, True, True, False]
+    # Half a token back is not enough; one full token is
+    assert store.take("k", budget, 100.5) == (False, pytest.approx(0.5))
+    allowed, tokens = store.take("k", budget, 101.0)
+    assert allowed and tokens == pytest.approx(0.0)
+    # Never refills past the burst
+    assert store.take("k", budget, 1000.0) == (True, pytest.approx(2.0))
+
+
+def test_cost_is_taken_whole_or_not_at_all(store):
+    budget = Budget(rate=1.0, burst=5)
+    assert store.take("k", budget, 0.0, cost=4) == (True, pytest.approx(1.0))
+    assert store.take("k", budget, 0.0, cost=2) == (False, pytest.approx(1.0))
+    assert store.take("other", budget, 0.0, cost=6) == (False, pytest.approx(5.0))
+
+
+def test_full_buckets_are_pruned(store):
+    budget = Budget(rate=1.0, burst=10)
+    store.take("idle", budget, 1000.0)
+    # idle is full again a second later, busy only 10s after emptying
+    store.take("busy", budget, 1000.0 + PRUNE_SECONDS - 5, cost=10)
+    store.take("other", budget, 1000.0 + PRUNE_SECONDS + 2)
+    if isinstance(store, MemoryStore):
+        keys = set(store._buckets)
+    else:
+        keys = {row[0] for row in sqlite3.connect(store.path).execute("SELECT key FROM buckets")}
+    assert keys == {"busy", "other"}
+
+
+def test_sqlite_store_upgrades_old_files(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL, "
+        "allowed INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    conn.execute("INSERT INTO buckets VALUES ('k', 0, 0, 0)")
+    conn.commit()
+    store = SQLiteStore(path)
+    # The old row has no full_at, so the first prune leaves it alone
+    assert store.take("k", Budget(rate=1.0, burst=5), 2.0) == (True, pytest.approx(1.0))
+
+
+def test_limiter_opens_the_store_lazily_and_not_when_disabled(tmp_path):
+    opened = []
+
+    def factory():
+        opened.append(1)
+        return MemoryStore()
+
+    disabled = RateLimiter(factory, enabled=False)
+    asyncio.run(disabled.check("k", Budget(rate=1.0, burst=1)))
+    assert opened == []
+
+    limiter = RateLimiter(factory)
+    assert opened == []
+    budget = Budget(rate=1.0, burst=1)
+    asyncio.run(limiter.check("k", budget))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(limiter.check("k", budget))
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "1"
+    assert opened == [1]
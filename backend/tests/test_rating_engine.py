@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.utils.elo import calculate_elo
+from app.utils.rating_engine import RATING_CENTER, EloEngine, Glicko2Engine
+
+
+def test_glickman_worked_example():
+    # Glickman, "Example of the Glicko-2 system": a 1500 player with RD 200
+    # beats a 1400 (RD 30) and loses to a 1550 (RD 100) and a 1700 (RD 300).
+    # Ratings here are centred on 1000 instead of 1500.
+    engine = Glicko2Engine(tau=0.5)
+    offset = RATING_CENTER - 1500
+    rating = np.array([1500.0, 1400.0, 1550.0, 1700.0]) + offset
+    rd = np.array([200.0, 30.0, 100.0, 300.0])
+    volatility = np.full(4, 0.06)
+    winners, losers = np.array([0, 2, 3]), np.array([1, 0, 0])
+
+    new_rating, new_rd, new_volatility = engine.rate_period(rating, rd, volatility, winners, losers)
+
+    assert new_rating[0] == pytest.approx(1464.05 + offset, abs=0.01)
+    assert new_rd[0] == pytest.approx(151.52, abs=0.01)
+    assert new_volatility[0] == pytest.approx(0.05999, abs=1e-5)
+
+
+def test_idle_photos_keep_rating_and_widen_rd():
+    engine = Glicko2Engine(tau=0.5, initial_rd=350.0)
+    rating = np.array([1000.0, 1000.0, 1100.0])
+    rd = np.array([50.0, 50.0, 340.0])
+    volatility = np.full(3, 0.06)
+
+    new_rating, new_rd, new_volatility = engine.rate_period(
+        rating, rd, volatility, np.array([0]), np.array([1]), idle_periods=np.array([0, 0, 1000])
+    )
+
+    assert new_rating[0] > 1000.0 > new_rating[1]
+    assert new_rating[2] == 1100.0
+    assert new_volatility[2] == 0.06
+    # Idle periods grow the deviation up to the initial one, then the period adds its own step
+    assert new_rd[2] == pytest.approx(np.sqrt(350.0 ** 2 + (0.06 * 173.7178) ** 2), abs=1e-6)
+
+
+def test_glicko2_votes_do_not_move_ratings():
+    assert Glicko2Engine().rate_pair(1010.0, 990.0) == (1010.0, 990.0)
+
+
+def test_elo_engine_is_calculate_elo():
+    assert EloEngine().rate_pair(1000.0, 1100.0) == calculate_elo(1000.0, 1100.0)
+    winner, loser = calculate_elo(1000.0, 1000.0)
+    assert (winner, loser) == (1016.0, 984.0)
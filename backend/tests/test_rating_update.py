@@ -0,0 +1,82 @@
+"""
+The ORM vote path (_apply_vote_orm) that apply_vote takes on SQLite, run
+against an in-memory database so the default test run covers it.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models.photo import Photo
+from app.models.user import User
+from app.models.vote import Vote
+from app.models.vote_idempotency_key import VoteIdempotencyKey
+from app.utils.elo import calculate_elo
+from app.utils.rating_engine import rating_engine
+from app.utils.rating_update import apply_vote
+
+pytestmark = pytest.mark.skipif(rating_engine.name != "elo", reason="ratings only move per vote under Elo")
+
+
+@pytest.fixture
+def db(sqlite_db):
+    session = sqlite_db
+    user = User(username="voter", email="voter@example.com", hashed_password="x")
+    session.add(user)
+    session.flush()
+    session.add_all([
+        Photo(
+            uploaded_by_user_id=user.id, image_url=f"test://{i}", cloudinary_public_id=f"p{i}",
+            elo_rating=rating, wins=0, losses=0, total_votes=0,
+        )
+        for i, rating in enumerate((1000.0, 1100.0, 1000.0))
+    ])
+    session.commit()
+    return session
+
+
+def test_vote_moves_ratings_and_counters(db):
+    applied = apply_vote(db, 1, 1, 2)
+    db.commit()
+
+    expected = calculate_elo(1000.0, 1100.0)
+    assert (applied.winner_elo, applied.loser_elo) == expected
+    winner, loser = db.get(Photo, 1), db.get(Photo, 2)
+    assert (winner.elo_rating, loser.elo_rating) == expected
+    assert (winner.wins, winner.losses, winner.total_votes) == (1, 0, 1)
+    assert (loser.wins, loser.losses, loser.total_votes) == (0, 1, 1)
+    vote = db.execute(select(Vote)).scalar_one()
+    assert (vote.id, vote.voter_user_id, vote.winner_photo_id, vote.loser_photo_id) == (applied.id, 1, 1, 2)
+    assert applied.created_at is not None
+
+
+def test_sequence_of_votes_matches_calculate_elo(db):
+    ratings = {1: 1000.0, 2: 1100.0, 3: 1000.0}
+    for winner, loser in [(1, 2), (2, 3), (3, 1), (2, 1), (1, 3)]:
+        apply_vote(db, 1, winner, loser)
+        ratings[winner], ratings[loser] = calculate_elo(ratings[winner], ratings[loser])
+    db.commit()
+    assert {p.id: p.elo_rating for p in db.execute(select(Photo)).scalars()} == ratings
+
+
+def test_deleted_or_missing_photo_is_not_voted(db):
+    db.get(Photo, 3).deleted_at = datetime.now(timezone.utc)
+    db.commit()
+    assert apply_vote(db, 1, 1, 3) is None
+    assert apply_vote(db, 1, 99, 1) is None
+    assert db.get(Photo, 1).total_votes == 0
+    assert db.execute(select(Vote)).first() is None
+
+
+def test_idempotency_key_is_recorded_once(db):
+    applied = apply_vote(db, 1, 1, 2, idempotency_key="k1")
+    db.commit()
+    key = db.get(VoteIdempotencyKey, (1, "k1"))
+    assert (key.vote_id, key.winner_photo_id, key.loser_photo_id) == (applied.id, 1, 2)
+    db.expunge(key)
+
+    with pytest.raises(IntegrityError):
+        apply_vote(db, 1, 2, 1, idempotency_key="k1")
+    db.rollback()
+    assert db.get(Photo, 1).total_votes == 1
@@ -0,0 +1,77 @@
+import pytest
+
+from app.utils import seen_pairs as seen_pairs_module
+from app.utils.seen_pairs import SeenPairs, pair_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(seen_pairs_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _loaded(pairs: SeenPairs, user_id: int) -> None:
+    """What ensure_user does for a user without votes."""
+    with pairs._lock:
+        pairs._create(user_id)
+
+
+def test_pair_key_is_unordered():
+    assert pair_key(3, 9) == pair_key(9, 3) != pair_key(3, 10)
+
+
+def test_seen_after_add_only_for_loaded_users(clock):
+    pairs = SeenPairs(bits=1024)
+    pairs.add(1, 3, 9)
+    assert not pairs.is_loaded(1) and not pairs.seen(1, 3, 9)
+    _loaded(pairs, 1)
+    pairs.add(1, 3, 9)
+    assert pairs.seen(1, 9, 3)
+    assert not pairs.seen(2, 3, 9)
+
+
+def test_generations_roll_over(clock):
+    pairs = SeenPairs(bits=1024)
+    _loaded(pairs, 1)
+    capacity = 1024 // 8
+    for i in range(capacity):
+        pairs.add(1, i, i + 10_000)
+    pairs.add(1, 50_000, 50_001)  # starts a new generation
+    assert pairs.seen(1, 0, 10_000) and pairs.seen(1, 50_000, 50_001)
+    for i in range(capacity):
+        pairs.add(1, 60_000 + i, 70_000 + i)
+    # Two generations later the first pair has been forgotten, barring a false positive
+    forgotten = sum(not pairs.seen(1, i, i + 10_000) for i in range(capacity))
+    assert forgotten > capacity * 0.9
+
+
+def test_false_positive_rate_at_capacity(clock):
+    pairs = SeenPairs(bits=4096)
+    _loaded(pairs, 1)
+    for i in range(4096 // 8):
+        pairs.add(1, i, i + 1_000_000)
+    false_positives = sum(pairs.seen(1, i, i + 2_000_000) for i in range(10_000))
+    assert false_positives / 10_000 < 0.04
+
+
+def test_filters_expire_after_ttl_and_idle(clock):
+    pairs = SeenPairs(idle_seconds=600, ttl_seconds=300)
+    _loaded(pairs, 1)
+    clock[0] += 200
+    assert pairs.is_loaded(1)
+    clock[0] += 101
+    # Still active, but loaded over ttl_seconds ago: reload to see other workers' votes
+    assert not pairs.is_loaded(1)
+
+    pairs.ttl_seconds = 0
+    _loaded(pairs, 3)
+    clock[0] += 601
+    assert not pairs.is_loaded(3)
+
+
+def test_lru_cap(clock):
+    pairs = SeenPairs(max_users=2)
+    for user_id in (1, 2, 3):
+        _loaded(pairs, user_id)
+    assert len(pairs) == 2 and not pairs.is_loaded(1)
@@ -0,0 +1,52 @@
+from app.utils.ban_version import SQLiteCounter
+from app.utils.user_cache import Principal, UserCache
+
+
+def _principal(user_id: int, banned: bool = False) -> Principal:
+    return Principal(id=user_id, username=f"u{user_id}", is_admin=False, is_banned=banned)
+
+
+def test_ban_in_one_worker_clears_the_others(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    workers = [UserCache(versions=SQLiteCounter(path), check_seconds=0) for _ in range(2)]
+    for cache in workers:
+        cache.get(1)
+        cache.put(_principal(1), cache.version)
+        assert cache.get(1) == _principal(1)
+
+    workers[0].invalidate(1)
+    workers[0].versions.bump()
+
+    assert workers[1].get(1) is None
+    workers[1].put(_principal(1, banned=True), workers[1].version)
+    assert workers[1].get(1).is_banned
+
+
+def test_principal_loaded_before_a_ban_is_not_cached(tmp_path):
+    counter = SQLiteCounter(str(tmp_path / "shared.sqlite3"))
+    cache = UserCache(versions=counter, check_seconds=0)
+    assert cache.get(1) is None
+    version = cache.version
+    # Another worker bans while this one is still loading the old row
+    counter.bump()
+    cache.get(2)
+    cache.put(_principal(1), version)
+    assert len(cache) == 0
+
+
+def test_version_is_read_at_most_every_check_seconds(tmp_path):
+    counter = SQLiteCounter(str(tmp_path / "shared.sqlite3"))
+    cache = UserCache(versions=counter, check_seconds=3600)
+    cache.get(1)
+    cache.put(_principal(1), cache.version)
+    counter.bump()
+    assert cache.get(1) == _principal(1)
+
+
+def test_cache_without_versions_still_works():
+    cache = UserCache(max_size=1)
+    cache.put(_principal(1))
+    cache.put(_principal(2))
+    assert cache.get(1) is None
+    assert cache.get(2) == _principal(2)
+    assert cache.stats()["evictions"] == 1
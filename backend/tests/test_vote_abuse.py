@@ -0,0 +1,99 @@
+import pytest
+
+from app.utils import vote_abuse
+from app.utils.vote_abuse import FLAG, OK, THROTTLE, VoteAbuseDetector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable time.monotonic for the detector."""
+    now = [1000.0]
+    monkeypatch.setattr(vote_abuse.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _detector(**kwargs) -> VoteAbuseDetector:
+    options = dict(
+        mode="flag", window=10, min_votes=5, max_votes_per_minute=30.0,
+        max_winner_share=0.5, max_repeat_share=0.5, throttle_score=2.0,
+    )
+    options.update(kwargs)
+    return VoteAbuseDetector(**options)
+
+
+def _vote_slowly(detector, clock, voter: int, pairs) -> list[str]:
+    verdicts = []
+    for winner, loser in pairs:
+        clock[0] += 10
+        verdicts.append(detector.observe(voter, winner, loser))
+    return verdicts
+
+
+def test_varied_slow_voting_is_ok(clock):
+    detector = _detector()
+    pairs = [(i, i + 100) for i in range(30)]
+    assert set(_vote_slowly(detector, clock, 1, pairs)) == {OK}
+    assert detector.suspicious() == []
+
+
+def test_nothing_is_judged_before_min_votes(clock):
+    detector = _detector()
+    assert [detector.observe(1, 1, 2) for _ in range(4)] == [OK] * 4
+    assert detector.observe(1, 1, 2) == FLAG
+
+
+def test_always_picking_one_photo_is_flagged(clock):
+    detector = _detector()
+    verdicts = _vote_slowly(detector, clock, 1, [(7, loser) for loser in range(100, 110)])
+    assert verdicts[:4] == [OK] * 4 and verdicts[4:] == [FLAG] * 6
+    [entry] = detector.suspicious()
+    assert entry["user_id"] == 1 and entry["top_winner_share"] == 1.0 and entry["flagged"] == 6
+
+
+def test_repeated_pairs_are_flagged(clock):
+    detector = _detector(max_winner_share=1.0)
+    pairs = [(1, 2), (2, 1), (3, 4), (4, 3), (5, 6), (6, 5)]
+    assert _vote_slowly(detector, clock, 1, pairs)[-1] == FLAG
+    assert detector.suspicious()[0]["repeat_share"] == 0.5
+
+
+def test_fast_voting_is_throttled_in_throttle_mode(clock):
+    detector = _detector(mode="throttle")
+    verdicts = []
+    for i in range(10):
+        clock[0] += 0.5  # 120 votes a minute, four times the limit
+        verdicts.append(detector.observe(1, i, i + 100))
+    assert verdicts[4:] == [THROTTLE] * 6
+    assert detector.stats() == {"voters": 1, "flagged": 0, "throttled": 6}
+    # Slowing down lets the window recover
+    assert set(_vote_slowly(detector, clock, 1, [(i, i + 100) for i in range(20, 40)])[-5:]) == {OK}
+
+
+def test_window_slides_and_counts_stay_consistent(clock):
+    detector = _detector()
+    _vote_slowly(detector, clock, 1, [(7, loser) for loser in range(100, 110)])
+    _vote_slowly(detector, clock, 1, [(i + 300, i + 400) for i in range(10)])
+    window = detector._voters[1]
+    assert window.size == 10
+    assert 7 not in window.winner_counts
+    assert sum(window.winner_counts.values()) == sum(window.pair_counts.values()) == 10
+    assert detector.suspicious() == []
+
+
+def test_idle_voters_start_over_and_forget_drops_them(clock):
+    detector = _detector(idle_seconds=60)
+    _vote_slowly(detector, clock, 1, [(7, loser) for loser in range(100, 110)])
+    clock[0] += 61
+    assert detector.observe(1, 7, 200) == OK
+    assert detector._voters[1].size == 1
+    detector.forget(1)
+    assert len(detector) == 0
+
+
+def test_lru_cap_and_off_mode(clock):
+    detector = _detector(max_voters=2)
+    for voter in (1, 2, 3):
+        detector.observe(voter, 1, 2)
+    assert list(detector._voters) == [2, 3]
+    off = _detector(mode="off")
+    assert off.observe(1, 1, 2) == OK and len(off) == 0
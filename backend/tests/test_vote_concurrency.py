@@ -0,0 +1,122 @@
+"""
+Concurrency test for the single-statement vote path (app/utils/rating_update.py).
+
+Needs a migrated Postgres database and is skipped otherwise:
+
+    cd backend
+    TEST_DATABASE_URL=postgresql://postgres@localhost/facerank_test python -m pytest tests
+
+Many threads vote on the same pair at once, each on its own connection.
+With the locking CTE no update may be lost: the counters must match the
+number of votes exactly, and the final ratings must equal
+app.utils.elo.calculate_elo applied to the inserted votes in id order.
+The ORM path used on other dialects is covered by test_rating_update.py.
+"""
+import os
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import sessionmaker
+
+from app.jobs.recompute_ratings import INITIAL_RATING
+from app.models.photo import Photo
+from app.models.user import User
+from app.models.vote import Vote
+from app.utils.elo import calculate_elo
+from app.utils.rating_engine import rating_engine
+from app.utils.rating_update import apply_vote
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "")
+THREADS = 16
+VOTES_PER_THREAD = 25
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith("postgresql"), reason="set TEST_DATABASE_URL to a Postgres database"
+)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(TEST_DATABASE_URL, pool_size=THREADS, max_overflow=0)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+@pytest.fixture
+def pair(session_factory):
+    tag = uuid.uuid4().hex[:12]
+    db = session_factory()
+    user = User(username=f"concurrency-{tag}", email=f"{tag}@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    photos = [
+        Photo(
+            uploaded_by_user_id=user.id, image_url=f"test://{tag}/{i}", cloudinary_public_id=f"{tag}-{i}",
+            elo_rating=INITIAL_RATING, wins=0, losses=0, total_votes=0,
+        )
+        for i in range(2)
+    ]
+    db.add_all(photos)
+    db.commit()
+    ids = (user.id, photos[0].id, photos[1].id)
+    try:
+        yield ids
+    finally:
+        db.execute(delete(Vote).where(Vote.voter_user_id == ids[0]))
+        db.execute(delete(Photo).where(Photo.id.in_(ids[1:])))
+        db.execute(delete(User).where(User.id == ids[0]))
+        db.commit()
+        db.close()
+
+
+def test_concurrent_votes_on_one_pair(session_factory, pair):
+    voter_id, a, b = pair
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def vote(worker: int) -> None:
+        db = session_factory()
+        try:
+            barrier.wait()
+            for i in range(VOTES_PER_THREAD):
+                # Both directions, so opposite lock orders are exercised too
+                winner, loser = (a, b) if (worker + i) % 3 else (b, a)
+                assert apply_vote(db, voter_id, winner, loser) is not None
+                db.commit()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=vote, args=(w,)) for w in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+
+    db = session_factory()
+    try:
+        votes = db.execute(
+            select(Vote.winner_photo_id, Vote.loser_photo_id).where(Vote.voter_user_id == voter_id).order_by(Vote.id)
+        ).all()
+        photos = {p.id: p for p in db.execute(select(Photo).where(Photo.id.in_((a, b)))).scalars()}
+    finally:
+        db.close()
+
+    total = THREADS * VOTES_PER_THREAD
+    assert len(votes) == total
+    for photo_id in (a, b):
+        won = sum(1 for w, _ in votes if w == photo_id)
+        assert photos[photo_id].wins == won
+        assert photos[photo_id].losses == total - won
+        assert photos[photo_id].total_votes == total
+
+    ratings = {a: INITIAL_RATING, b: INITIAL_RATING}
+    if rating_engine.name == "elo":
+        for w, l in votes:
+            ratings[w], ratings[l] = calculate_elo(ratings[w], ratings[l])
+    assert photos[a].elo_rating == pytest.approx(ratings[a], abs=1e-6)
+    assert photos[b].elo_rating == pytest.approx(ratings[b], abs=1e-6)
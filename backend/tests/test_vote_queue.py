@@ -0,0 +1,63 @@
+import threading
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.utils.vote_queue import PendingVote, VoteWriter
+
+
+class RecordingWriter(VoteWriter):
+    """Writes nothing; fails as told and records the batches that got through."""
+
+    def __init__(self, transient_failures: int = 0, bad_voters: frozenset = frozenset(), **kwargs):
+        super().__init__(retry_ms=1, **kwargs)
+        self.transient_failures = transient_failures
+        self.bad_voters = bad_voters
+        self.attempts = 0
+        self.written: list[PendingVote] = []
+
+    def flush(self, batch):
+        self.attempts += 1
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise OperationalError("UPDATE photos", {}, Exception("connection lost"))
+        if any(v.voter_user_id in self.bad_voters for v in batch):
+            raise IntegrityError("INSERT INTO votes", {}, Exception("violates foreign key"))
+        self.written.extend(batch)
+
+
+def _votes(n: int) -> list[PendingVote]:
+    return [PendingVote(voter_user_id=i, winner_photo_id=1, loser_photo_id=2) for i in range(n)]
+
+
+def test_transient_failures_retry_the_whole_batch_in_order():
+    writer = RecordingWriter(transient_failures=3)
+    votes = _votes(10)
+    writer.write(votes)
+    assert writer.written == votes
+    assert writer.attempts == 4
+
+
+def test_retries_are_bounded():
+    writer = RecordingWriter(transient_failures=100, max_retries=2)
+    writer.write(_votes(3))
+    assert writer.written == []
+    assert writer.attempts == 3
+
+
+def test_a_bad_vote_is_isolated_and_the_rest_written():
+    writer = RecordingWriter(bad_voters=frozenset({5}))
+    votes = _votes(16)
+    writer.write(votes)
+    assert writer.written == [v for v in votes if v.voter_user_id != 5]
+
+
+def test_stop_drains_the_queue():
+    writer = RecordingWriter(batch_size=7, flush_interval_ms=1)
+    votes = _votes(50)
+    for v in votes:
+        writer.submit(v)
+    writer.start()
+    writer.stop()
+    assert writer.written == votes
+    assert writer.depth() == 0
+    assert not any(t.name == "vote-writer" for t in threading.enumerate())